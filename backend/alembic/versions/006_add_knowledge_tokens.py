@@ -0,0 +1,26 @@
+"""Add normalized tokens to knowledge_base
+
+Revision ID: 006
+Revises: 005
+Create Date: 2024-01-01
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '006'
+down_revision: Union[str, None] = '005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Заполняется при сохранении записи и командой переиндексации
+    op.add_column('knowledge_base', sa.Column('tokens', sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('knowledge_base', 'tokens')
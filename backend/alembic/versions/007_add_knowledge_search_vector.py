@@ -0,0 +1,37 @@
+"""Add full-text search vector to knowledge_base
+
+Revision ID: 007
+Revises: 006
+Create Date: 2024-01-01
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = '007'
+down_revision: Union[str, None] = '006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Нормализованные слова (tokens/keywords) — с весом A в конфигурации simple,
+    # исходный вопрос — с весом B в конфигурации russian
+    op.execute("""
+        ALTER TABLE knowledge_base ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple', coalesce(tokens, keywords, '')), 'A') ||
+            setweight(to_tsvector('russian', coalesce(question, '')), 'B')
+        ) STORED
+    """)
+    op.execute(
+        "CREATE INDEX ix_knowledge_base_search_vector "
+        "ON knowledge_base USING GIN (search_vector)"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_knowledge_base_search_vector")
+    op.execute("ALTER TABLE knowledge_base DROP COLUMN IF EXISTS search_vector")
@@ -0,0 +1,25 @@
+"""Add knowledge base corpus version sequence
+
+Revision ID: 008
+Revises: 007
+Create Date: 2024-01-01
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = '008'
+down_revision: Union[str, None] = '007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Номер версии корпуса базы знаний — увеличивается при каждом изменении
+    op.execute("CREATE SEQUENCE IF NOT EXISTS knowledge_base_version_seq")
+
+
+def downgrade() -> None:
+    op.execute("DROP SEQUENCE IF EXISTS knowledge_base_version_seq")
@@ -0,0 +1,27 @@
+"""Reset knowledge_base tokens after tokenizer update
+
+Revision ID: 009
+Revises: 008
+Create Date: 2024-01-01
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = '009'
+down_revision: Union[str, None] = '008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Английские слова теперь стеммятся иначе. Tokens пересчитает приложение
+    # при старте (reindex_missing_tokens) или python -m app.scripts.reindex_knowledge
+    op.execute("UPDATE knowledge_base SET tokens = NULL")
+
+
+def downgrade() -> None:
+    # Старые tokens не восстанавливаются — их заполнит переиндексация
+    pass
@@ -0,0 +1,34 @@
+"""Add knowledge_synonyms table
+
+Revision ID: 010
+Revises: 009
+Create Date: 2024-01-01
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '010'
+down_revision: Union[str, None] = '009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'knowledge_synonyms',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('term', sa.String(length=255), nullable=False),
+        sa.Column('aliases', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('term'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('knowledge_synonyms')
@@ -1,12 +1,23 @@
 # API для базы знаний
-from fastapi import APIRouter, Depends, HTTPException
+import csv
+import io
+import itertools
+import json
+import logging
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 
-from app.db.database import get_session
-from app.db.models.models import KnowledgeBase, Operator
+from app.db.database import async_session, get_session
+from app.db.models.models import KnowledgeBase, KnowledgeSynonym, Operator
 from app.core.auth import get_current_operator
+from app.services.knowledge_sync import on_entry_deleted, on_entry_saved
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/knowledge", tags=["knowledge"])
 
@@ -73,6 +84,124 @@ async def get_knowledge_entries(
     return response
 
 
+EXPORT_FIELDS = ["id", "question", "answer", "keywords", "is_active", "times_used", "created_at"]
+
+
+@router.get("/export")
+async def export_knowledge(
+    format: str = Query(default="ndjson", pattern="^(ndjson|csv)$"),
+    current_operator: Operator = Depends(get_current_operator),
+):
+    """Выгрузить базу знаний потоком (NDJSON или CSV)."""
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/csv"
+    return StreamingResponse(
+        _export_rows(format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="knowledge.{format}"'},
+    )
+
+
+async def _export_rows(format: str):
+    from app.services.knowledge import iter_knowledge_entries
+
+    # Своя сессия: зависимость get_session закрывается до отправки потока
+    async with async_session() as session:
+        if format == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(EXPORT_FIELDS)
+            yield buffer.getvalue()
+
+        async for entry in iter_knowledge_entries(session):
+            row = {
+                "id": entry.id,
+                "question": entry.question,
+                "answer": entry.answer,
+                "keywords": entry.keywords,
+                "is_active": entry.is_active,
+                "times_used": entry.times_used,
+                "created_at": entry.created_at.isoformat() if entry.created_at else "",
+            }
+            if format == "csv":
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerow([row[field] for field in EXPORT_FIELDS])
+                yield buffer.getvalue()
+            else:
+                yield json.dumps(row, ensure_ascii=False) + "\n"
+
+
+@router.post("/import")
+async def import_knowledge(
+    file: UploadFile,
+    format: str | None = Query(default=None, pattern="^(ndjson|csv)$"),
+    session: AsyncSession = Depends(get_session),
+    current_operator: Operator = Depends(get_current_operator),
+):
+    """Массовый импорт пар вопрос-ответ из NDJSON или CSV (колонки question, answer)."""
+    from app.services.knowledge import KnowledgeImportError, import_knowledge_entries
+
+    if format is None:
+        format = "csv" if (file.filename or "").lower().endswith(".csv") else "ndjson"
+
+    # Файл читается построчно, без загрузки целиком в память
+    text_stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    rows = csv.DictReader(text_stream) if format == "csv" else _ndjson_rows(text_stream)
+
+    try:
+        imported, errors = await import_knowledge_entries(
+            session, _read_in_threadpool(rows), operator_id=current_operator.id
+        )
+    except KnowledgeImportError as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Некорректный файл ({e}). Добавлено до ошибки: {e.imported}",
+        )
+    finally:
+        text_stream.detach()
+
+    return {"ok": True, "imported": imported, "skipped": len(errors), "errors": errors[:20]}
+
+
+# Сколько строк файла читать и разбирать за один заход в пул потоков
+IMPORT_READ_BATCH = 200
+
+
+async def _read_in_threadpool(rows):
+    """Строки загруженного файла пачками: чтение и разбор идут в пуле потоков,
+    а не в цикле событий. Ошибка чтения поднимается после уже прочитанных строк."""
+    while True:
+        batch, error = await run_in_threadpool(_read_batch, rows, IMPORT_READ_BATCH)
+        for row in batch:
+            yield row
+        if error:
+            raise error
+        if len(batch) < IMPORT_READ_BATCH:
+            return
+
+
+def _read_batch(rows, size: int):
+    batch = []
+    try:
+        for row in itertools.islice(rows, size):
+            batch.append(row)
+    except (ValueError, csv.Error) as e:
+        return batch, e
+    return batch, None
+
+
+def _ndjson_rows(stream):
+    """Объекты NDJSON по строкам; вместо битой строки — None (она пропускается)."""
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield None
+
+
 @router.post("", response_model=KnowledgeEntryOut)
 async def create_knowledge_entry(
     data: KnowledgeEntryCreate,
@@ -80,12 +209,14 @@ async def create_knowledge_entry(
     current_operator: Operator = Depends(get_current_operator),
 ):
     """Создать новую запись в базе знаний."""
-    from app.services.knowledge import extract_keywords
+    from app.services.knowledge import question_terms
 
+    keywords, tokens = await question_terms(session, data.question)
     entry = KnowledgeBase(
         question=data.question,
         answer=data.answer,
-        keywords=extract_keywords(data.question),
+        keywords=keywords,
+        tokens=tokens,
         added_by_id=current_operator.id,
         is_active=True,
         times_used=0,
@@ -93,6 +224,7 @@ async def create_knowledge_entry(
     session.add(entry)
     await session.commit()
     await session.refresh(entry)
+    await on_entry_saved(session, entry)
 
     return KnowledgeEntryOut(
         id=entry.id,
@@ -106,6 +238,301 @@ async def create_knowledge_entry(
     )
 
 
+@router.post("/reindex")
+async def reindex_knowledge(
+    background_tasks: BackgroundTasks,
+    current_operator: Operator = Depends(get_current_operator),
+):
+    """Переиндексировать базу знаний в фоне. Только для админов."""
+    if not current_operator.is_admin:
+        raise HTTPException(status_code=403, detail="Только для админов")
+
+    background_tasks.add_task(_run_reindex)
+    return {"ok": True, "message": "Переиндексация запущена"}
+
+
+async def _run_reindex():
+    from app.services.knowledge import reindex_knowledge_base
+
+    try:
+        async with async_session() as session:
+            total = await reindex_knowledge_base(session)
+        logger.info(f"Переиндексация базы знаний завершена: {total} записей")
+    except Exception as e:
+        logger.error(f"Ошибка переиндексации базы знаний: {e}")
+
+
+class DebugRequest(BaseModel):
+    question: str
+    threshold: float = 0.5
+    top_k: int = 10
+
+
+class DebugCandidateOut(BaseModel):
+    id: int
+    question: str
+    score: float
+    passes: bool  # оценка не ниже порога этапа
+
+
+class DebugOut(BaseModel):
+    question: str
+    keywords: list[str]
+    tokens: list[str]
+    engine: str | None
+    candidate_count: int
+    threshold: float
+    candidates: list[DebugCandidateOut]
+    semantic_threshold: float | None
+    semantic_candidates: list[DebugCandidateOut]
+    match_id: int | None
+    match_stage: str | None
+    timings_ms: dict[str, float]
+    total_ms: float
+
+
+@router.post("/debug", response_model=DebugOut)
+async def debug_knowledge_search(
+    data: DebugRequest,
+    session: AsyncSession = Depends(get_session),
+    current_operator: Operator = Depends(get_current_operator),
+):
+    """Разбор поиска по вопросу: слова, кандидаты с оценками и время этапов.
+
+    Поиск идёт через search_knowledge_base, но без кэша ответов
+    и без увеличения счётчика использования.
+    """
+    import time
+
+    from app.core.config import settings
+    from app.services.knowledge import search_knowledge_base
+    from app.services.knowledge_trace import SearchTrace
+
+    if not 1 <= data.top_k <= 100:
+        raise HTTPException(status_code=400, detail="top_k должен быть от 1 до 100")
+
+    trace = SearchTrace(top_k=data.top_k)
+    started = time.perf_counter()
+    await search_knowledge_base(session, data.question, data.threshold, trace=trace)
+    total_ms = (time.perf_counter() - started) * 1000
+
+    candidates = trace.data.get("candidates", [])
+    semantic_candidates = trace.data.get("semantic_candidates", [])
+    ids = {entry_id for entry_id, _ in candidates} | {entry_id for entry_id, _ in semantic_candidates}
+    questions = {}
+    if ids:
+        result = await session.execute(
+            select(KnowledgeBase.id, KnowledgeBase.question).where(KnowledgeBase.id.in_(ids))
+        )
+        questions = dict(result.all())
+
+    def candidates_out(ranked, threshold):
+        return [
+            DebugCandidateOut(
+                id=entry_id,
+                question=questions.get(entry_id, ""),
+                score=round(score, 4),
+                passes=score >= threshold,
+            )
+            for entry_id, score in ranked
+        ]
+
+    match = trace.data.get("match")
+    semantic_ran = "semantic_candidates" in trace.data
+    return DebugOut(
+        question=data.question,
+        keywords=trace.data.get("keywords", []),
+        tokens=trace.data.get("tokens", []),
+        engine=trace.data.get("engine"),
+        candidate_count=trace.data.get("candidate_count", 0),
+        threshold=data.threshold,
+        candidates=candidates_out(candidates, data.threshold),
+        semantic_threshold=settings.kb_semantic_threshold if semantic_ran else None,
+        semantic_candidates=candidates_out(semantic_candidates, settings.kb_semantic_threshold),
+        match_id=match[0] if match else None,
+        match_stage=match[2] if match else None,
+        timings_ms={stage: round(ms, 3) for stage, ms in trace.timings.items()},
+        total_ms=round(total_ms, 3),
+    )
+
+
+class DuplicateEntryOut(BaseModel):
+    id: int
+    question: str
+    answer: str
+    times_used: int
+
+
+class MergeRequest(BaseModel):
+    ids: list[int]
+
+
+@router.get("/duplicates", response_model=list[list[DuplicateEntryOut]])
+async def get_duplicates(
+    threshold: float | None = Query(default=None, ge=0.3, le=1.0),
+    session: AsyncSession = Depends(get_session),
+    current_operator: Operator = Depends(get_current_operator),
+):
+    """Группы почти одинаковых вопросов в базе знаний."""
+    from app.services.knowledge import find_duplicate_clusters
+
+    clusters = await find_duplicate_clusters(session, threshold)
+    return [
+        [
+            DuplicateEntryOut(
+                id=entry.id,
+                question=entry.question,
+                answer=entry.answer,
+                times_used=entry.times_used or 0,
+            )
+            for entry in cluster
+        ]
+        for cluster in clusters
+    ]
+
+
+@router.post("/duplicates/merge")
+async def merge_duplicates(
+    data: MergeRequest,
+    session: AsyncSession = Depends(get_session),
+    current_operator: Operator = Depends(get_current_operator),
+):
+    """Слить группу записей в одну (times_used суммируется). Только для админов."""
+    from app.services.knowledge import merge_knowledge_entries
+
+    if not current_operator.is_admin:
+        raise HTTPException(status_code=403, detail="Только для админов")
+
+    if len(set(data.ids)) < 2:
+        raise HTTPException(status_code=400, detail="Нужно минимум две записи")
+
+    keeper = await merge_knowledge_entries(session, data.ids)
+    if not keeper:
+        raise HTTPException(status_code=404, detail="Записи не найдены")
+
+    return {"ok": True, "id": keeper.id, "times_used": keeper.times_used}
+
+
+class SynonymOut(BaseModel):
+    id: int
+    term: str
+    aliases: list[str]
+
+
+class SynonymIn(BaseModel):
+    term: str
+    aliases: list[str]
+
+
+@router.get("/synonyms", response_model=list[SynonymOut])
+async def get_synonyms(
+    session: AsyncSession = Depends(get_session),
+    current_operator: Operator = Depends(get_current_operator),
+):
+    """Словарь синонимов для поиска по базе знаний."""
+    from app.services.knowledge_synonyms import parse_aliases
+
+    result = await session.execute(select(KnowledgeSynonym).order_by(KnowledgeSynonym.term))
+    return [
+        SynonymOut(id=item.id, term=item.term, aliases=parse_aliases(item.aliases))
+        for item in result.scalars().all()
+    ]
+
+
+@router.post("/synonyms", response_model=SynonymOut)
+async def create_synonym(
+    data: SynonymIn,
+    background_tasks: BackgroundTasks,
+    session: AsyncSession = Depends(get_session),
+    current_operator: Operator = Depends(get_current_operator),
+):
+    """Добавить термин с синонимами. Только для админов.
+
+    После изменения словаря база знаний переиндексируется в фоне.
+    """
+    if not current_operator.is_admin:
+        raise HTTPException(status_code=403, detail="Только для админов")
+
+    term, aliases = _validate_synonym(data)
+    existing = await session.execute(select(KnowledgeSynonym).where(KnowledgeSynonym.term == term))
+    if existing.scalar_one_or_none():
+        raise HTTPException(status_code=400, detail="Такой термин уже есть")
+
+    item = KnowledgeSynonym(term=term, aliases=", ".join(aliases))
+    session.add(item)
+    await session.commit()
+    await session.refresh(item)
+
+    background_tasks.add_task(_run_reindex)
+    return SynonymOut(id=item.id, term=item.term, aliases=aliases)
+
+
+@router.put("/synonyms/{synonym_id}", response_model=SynonymOut)
+async def update_synonym(
+    synonym_id: int,
+    data: SynonymIn,
+    background_tasks: BackgroundTasks,
+    session: AsyncSession = Depends(get_session),
+    current_operator: Operator = Depends(get_current_operator),
+):
+    """Изменить термин или его синонимы. Только для админов."""
+    if not current_operator.is_admin:
+        raise HTTPException(status_code=403, detail="Только для админов")
+
+    item = await session.get(KnowledgeSynonym, synonym_id)
+    if not item:
+        raise HTTPException(status_code=404, detail="Термин не найден")
+
+    term, aliases = _validate_synonym(data)
+    existing = await session.execute(
+        select(KnowledgeSynonym).where(KnowledgeSynonym.term == term, KnowledgeSynonym.id != synonym_id)
+    )
+    if existing.scalar_one_or_none():
+        raise HTTPException(status_code=400, detail="Такой термин уже есть")
+
+    item.term = term
+    item.aliases = ", ".join(aliases)
+    await session.commit()
+
+    background_tasks.add_task(_run_reindex)
+    return SynonymOut(id=item.id, term=item.term, aliases=aliases)
+
+
+@router.delete("/synonyms/{synonym_id}")
+async def delete_synonym(
+    synonym_id: int,
+    background_tasks: BackgroundTasks,
+    session: AsyncSession = Depends(get_session),
+    current_operator: Operator = Depends(get_current_operator),
+):
+    """Удалить термин со всеми синонимами. Только для админов."""
+    if not current_operator.is_admin:
+        raise HTTPException(status_code=403, detail="Только для админов")
+
+    item = await session.get(KnowledgeSynonym, synonym_id)
+    if not item:
+        raise HTTPException(status_code=404, detail="Термин не найден")
+
+    await session.delete(item)
+    await session.commit()
+
+    background_tasks.add_task(_run_reindex)
+    return {"ok": True}
+
+
+def _validate_synonym(data: SynonymIn) -> tuple[str, list[str]]:
+    from app.services.knowledge_synonyms import parse_aliases
+    from app.services.tokenizer import split_words
+
+    term = " ".join(split_words(data.term))
+    aliases = [alias for alias in parse_aliases(data.aliases) if alias != term]
+    if not term:
+        raise HTTPException(status_code=400, detail="Термин не может быть пустым")
+    if not aliases:
+        raise HTTPException(status_code=400, detail="Нужен хотя бы один синоним")
+    return term, aliases
+
+
 @router.put("/{entry_id}", response_model=KnowledgeEntryOut)
 async def update_knowledge_entry(
     entry_id: int,
@@ -114,7 +541,7 @@ async def update_knowledge_entry(
     current_operator: Operator = Depends(get_current_operator),
 ):
     """Обновить запись в базе знаний."""
-    from app.services.knowledge import extract_keywords
+    from app.services.knowledge import question_terms
 
     result = await session.execute(
         select(KnowledgeBase).where(KnowledgeBase.id == entry_id)
@@ -126,7 +553,7 @@ async def update_knowledge_entry(
 
     if data.question is not None:
         entry.question = data.question
-        entry.keywords = extract_keywords(data.question)
+        entry.keywords, entry.tokens = await question_terms(session, data.question)
     if data.answer is not None:
         entry.answer = data.answer
     if data.is_active is not None:
@@ -134,6 +561,7 @@ async def update_knowledge_entry(
 
     await session.commit()
     await session.refresh(entry)
+    await on_entry_saved(session, entry)
 
     # Получаем имя оператора
     added_by_name = None
@@ -174,5 +602,6 @@ async def delete_knowledge_entry(
 
     await session.delete(entry)
     await session.commit()
+    await on_entry_deleted(session, entry_id)
 
     return {"ok": True, "message": "Запись удалена"}
@@ -1,7 +1,11 @@
 import logging
+from typing import AsyncIterator
 
 from openai import AsyncOpenAI
 
+from app.bot.ai.budget import fit_messages, token_stats
+from app.bot.ai.gateway import get_llm_gateway
+from app.bot.ai.resilience import create_completion, stream_completion
 from app.core.config import settings
 from app.db.models.models import Message, MessageSender
 
@@ -110,25 +114,34 @@ SYSTEM_PROMPT = """Ты — тёплый и заботливый помощни
 
 
 def get_ai_client() -> AsyncOpenAI | None:
-    if not settings.openrouter_api_key:
-        return None
-    return AsyncOpenAI(
-        base_url="https://openrouter.ai/api/v1",
-        api_key=settings.openrouter_api_key,
-    )
+    """Клиент общего LLM шлюза (один пул соединений на процесс)."""
+    gateway = get_llm_gateway()
+    return gateway.client if gateway else None
 
 
-async def generate_response(history: list[Message]) -> str:
-    """Сгенерировать ответ на основе истории диалога."""
-    client = get_ai_client()
+# Ответ без ключа API (тестовый режим)
+STUB_RESPONSE = (
+    "Здравствуйте! Спасибо что написали в SKERAMOS. "
+    "Сейчас бот работает в тестовом режиме. "
+    "Менеджер свяжется с вами в ближайшее время."
+)
 
-    if not client:
-        return (
-            "Здравствуйте! Спасибо что написали в SKERAMOS. "
-            "Сейчас бот работает в тестовом режиме. "
-            "Менеджер свяжется с вами в ближайшее время."
-        )
+# Ответ при ошибке или пустом ответе модели — сразу зовём менеджера
+ERROR_RESPONSE = (
+    "Прошу прощения, сейчас я не могу ответить. "
+    "Менеджер скоро свяжется с вами! [НУЖЕН_МЕНЕДЖЕР]"
+)
+
+# Модель ответила одними служебными тегами
+HANDOFF_RESPONSE = "Передаю ваш вопрос менеджеру — он скоро свяжется с вами!"
+COMPLETED_RESPONSE = "Спасибо, что написали! Если появятся вопросы — пишите."
+
+# Служебные теги в ответах модели (гость их видеть не должен)
+SERVICE_TAGS = ("[НУЖЕН_МЕНЕДЖЕР]", "[ЗАВЕРШЕНО]")
 
+
+def build_messages(history: list[Message]) -> list[dict]:
+    """Сообщения для модели: системный промпт и история диалога в пределах бюджета токенов."""
     messages = [{"role": "system", "content": SYSTEM_PROMPT}]
     for msg in history:
         if msg.sender == MessageSender.client:
@@ -136,26 +149,134 @@ async def generate_response(history: list[Message]) -> str:
         elif msg.sender in (MessageSender.bot, MessageSender.operator):
             messages.append({"role": "assistant", "content": msg.text})
 
+    messages, usage = fit_messages(
+        messages, settings.ai_input_token_budget, settings.ai_message_token_limit
+    )
+    logger.info(
+        f"Промпт ~{usage.total} токенов: система {usage.system}, история {usage.history} "
+        f"({usage.kept} сообщ., отброшено {usage.dropped}, обрезано {usage.truncated})"
+    )
+    # Метку cache_control ставит resilience — отдельно для каждой модели цепочки
+    return messages
+
+
+def log_usage(usage) -> None:
+    """Фактический расход токенов по ответу API (если провайдер его вернул)."""
+    if usage:
+        cached = token_stats.add(usage)
+        logger.info(
+            f"Токены LLM: вход {usage.prompt_tokens} (из кэша {cached}), "
+            f"выход {usage.completion_tokens}"
+        )
+
+
+async def generate_response(history: list[Message]) -> str:
+    """Сгенерировать ответ на основе истории диалога."""
+    client = get_ai_client()
+
+    if not client:
+        return STUB_RESPONSE
+
     try:
-        response = await client.chat.completions.create(
-            model=settings.ai_model,
-            max_tokens=500,
-            messages=messages,
+        response = await create_completion(
+            client,
+            max_tokens=settings.ai_max_tokens,
+            messages=build_messages(history),
         )
+        log_usage(response.usage)
         content = response.choices[0].message.content
         if not content:
             logger.warning("AI вернул пустой ответ")
-            return (
-                "Прошу прощения, сейчас я не могу ответить. "
-                "Менеджер скоро свяжется с вами! [НУЖЕН_МЕНЕДЖЕР]"
-            )
+            return ERROR_RESPONSE
         return content
     except Exception as e:
         logger.error(f"Ошибка OpenRouter API: {e}")
-        return (
-            "Прошу прощения, сейчас я не могу ответить. "
-            "Менеджер скоро свяжется с вами! [НУЖЕН_МЕНЕДЖЕР]"
+        return ERROR_RESPONSE
+
+
+async def stream_response(history: list[Message]) -> AsyncIterator[str]:
+    """Ответ модели по частям (stream=True), по мере генерации.
+
+    Части склеиваются в тот же текст, что вернул бы generate_response,
+    вместе со служебными тегами (их убирает ServiceTagFilter).
+    """
+    client = get_ai_client()
+
+    if not client:
+        yield STUB_RESPONSE
+        return
+
+    has_content = False
+    try:
+        stream = stream_completion(
+            client,
+            max_tokens=settings.ai_max_tokens,
+            messages=build_messages(history),
+            stream_options={"include_usage": True},
         )
+        async for chunk in stream:
+            # Расход токенов приходит последним чанком, без choices
+            log_usage(chunk.usage)
+            if not chunk.choices:
+                continue
+            content = chunk.choices[0].delta.content
+            if content:
+                has_content = True
+                yield content
+    except Exception as e:
+        logger.error(f"Ошибка OpenRouter API (stream): {e}")
+        # Часть ответа гость уже видит — просто зовём менеджера
+        yield " [НУЖЕН_МЕНЕДЖЕР]" if has_content else ERROR_RESPONSE
+        return
+
+    if not has_content:
+        logger.warning("AI вернул пустой ответ")
+        yield ERROR_RESPONSE
+
+
+class ServiceTagFilter:
+    """Убирает служебные теги из потока частей ответа.
+
+    Тег может прийти разрезанным между частями («[НУЖ» + «ЕН_МЕНЕДЖЕР]»),
+    поэтому возможное начало тега придерживается до следующей части.
+
+        tag_filter = ServiceTagFilter()
+        visible = tag_filter.feed(chunk)  # текст, который можно показать
+        visible += tag_filter.flush()     # в конце потока
+    """
+
+    def __init__(self, tags: tuple[str, ...] = SERVICE_TAGS):
+        self.tags = tags
+        self.found: set[str] = set()
+        self._pending = ""
+
+    def feed(self, chunk: str) -> str:
+        text = self._pending + chunk
+        self._pending = ""
+        visible = []
+        start = 0
+        while True:
+            i = text.find("[", start)
+            if i < 0:
+                visible.append(text[start:])
+                break
+            visible.append(text[start:i])
+            rest = text[i:]
+            tag = next((t for t in self.tags if rest.startswith(t)), None)
+            if tag:
+                self.found.add(tag)
+                start = i + len(tag)
+            elif any(t.startswith(rest) for t in self.tags):
+                self._pending = rest
+                break
+            else:
+                visible.append("[")
+                start = i + 1
+        return "".join(visible)
+
+    def flush(self) -> str:
+        text, self._pending = self._pending, ""
+        return text
 
 
 def needs_operator(response_text: str) -> bool:
@@ -169,8 +290,17 @@ def bot_completed(response_text: str) -> bool:
 
 
 def clean_response(response_text: str) -> str:
-    """Убрать служебные теги из ответа перед отправкой клиенту."""
-    return response_text.replace("[НУЖЕН_МЕНЕДЖЕР]", "").replace("[ЗАВЕРШЕНО]", "").strip()
+    """Убрать служебные теги из ответа перед отправкой клиенту.
+
+    Если кроме тегов в ответе ничего нет, возвращается заготовка — пустое
+    сообщение гостю не отправляется и в историю не пишется.
+    """
+    text = response_text.replace("[НУЖЕН_МЕНЕДЖЕР]", "").replace("[ЗАВЕРШЕНО]", "").strip()
+    if text:
+        return text
+    if bot_completed(response_text) and not needs_operator(response_text):
+        return COMPLETED_RESPONSE
+    return HANDOFF_RESPONSE
 
 
 def format_knowledge_answer(answer: str) -> str:
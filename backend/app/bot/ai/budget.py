@@ -0,0 +1,165 @@
+# Бюджет промпта: локальный подсчёт токенов и обрезка истории диалога
+import math
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+
+# Служебные токены на каждое сообщение чата (роль, разделители)
+MESSAGE_OVERHEAD = 4
+
+# Знаков на токен у BPE-токенизаторов: латиница кодируется плотнее кириллицы
+LATIN_CHARS_PER_TOKEN = 4.0
+OTHER_CHARS_PER_TOKEN = 2.5
+
+TRUNCATION_MARK = "…"
+
+_piece_re = re.compile(r"\w+|[^\w\s]")
+
+
+@lru_cache(maxsize=4096)
+def count_tokens(text: str) -> int:
+    """Приблизительное число токенов текста (без сети и без токенизатора модели).
+
+    Слова делятся на части по средней длине токена, каждый знак препинания —
+    отдельный токен. Для русского текста оценка обычно чуть выше точной.
+    """
+    tokens = 0
+    for piece in _piece_re.findall(text):
+        if piece.isascii():
+            tokens += math.ceil(len(piece) / LATIN_CHARS_PER_TOKEN)
+        else:
+            tokens += math.ceil(len(piece) / OTHER_CHARS_PER_TOKEN)
+    return tokens
+
+
+def message_tokens(message: dict) -> int:
+    return count_tokens(message["content"]) + MESSAGE_OVERHEAD
+
+
+def truncate(text: str, max_tokens: int) -> str:
+    """Начало текста не длиннее max_tokens (по той же оценке) с многоточием."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    # Бинарный поиск по длине: оценка монотонна по префиксу
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(text[:middle]) + 1 <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low].rstrip() + TRUNCATION_MARK
+
+
+@dataclass
+class PromptUsage:
+    """Оценка токенов промпта после подгонки под бюджет."""
+    system: int = 0
+    history: int = 0
+    kept: int = 0
+    dropped: int = 0
+    truncated: int = 0
+
+    @property
+    def total(self) -> int:
+        return self.system + self.history
+
+
+def fit_messages(
+    messages: list[dict],
+    budget: int,
+    message_limit: int,
+) -> tuple[list[dict], PromptUsage]:
+    """Подогнать сообщения чата под бюджет входных токенов.
+
+    Системные сообщения сохраняются целиком. Каждое сообщение истории длиннее
+    message_limit обрезается. Последнее сообщение гостя (role=user) место
+    получает первым и остаётся всегда — если нужно, обрезанным до остатка
+    бюджета. Остальная история набирается с конца (самые свежие важнее),
+    пока помещается в бюджет.
+    """
+    usage = PromptUsage()
+    system = [m for m in messages if m["role"] == "system"]
+    history = [m for m in messages if m["role"] != "system"]
+    usage.system = sum(message_tokens(m) for m in system)
+
+    remaining = budget - usage.system
+    last_user = max((i for i, m in enumerate(history) if m["role"] == "user"), default=None)
+    last_user_content = None
+    if last_user is not None:
+        last_user_content = _limit(history[last_user]["content"], message_limit)
+        if count_tokens(last_user_content) + MESSAGE_OVERHEAD > remaining:
+            last_user_content = truncate(last_user_content, max(remaining - MESSAGE_OVERHEAD, 1))
+        remaining -= count_tokens(last_user_content) + MESSAGE_OVERHEAD
+
+    kept: list[dict] = []
+    full = False
+    for i in reversed(range(len(history))):
+        message = history[i]
+        if i == last_user:
+            content = last_user_content
+        elif full:
+            usage.dropped += 1
+            continue
+        else:
+            content = _limit(message["content"], message_limit)
+            tokens = count_tokens(content) + MESSAGE_OVERHEAD
+            if tokens > remaining:
+                # Дальше только более старые сообщения — история обрывается здесь
+                full = True
+                usage.dropped += 1
+                continue
+            remaining -= tokens
+
+        if content != message["content"]:
+            usage.truncated += 1
+            message = {**message, "content": content}
+        kept.append(message)
+        usage.history += count_tokens(content) + MESSAGE_OVERHEAD
+
+    kept.reverse()
+    usage.kept = len(kept)
+    return system + kept, usage
+
+
+def _limit(content: str, message_limit: int) -> str:
+    if count_tokens(content) > message_limit:
+        return truncate(content, message_limit)
+    return content
+
+
+class TokenStats:
+    """Фактический расход токенов по ответам API с начала работы процесса.
+
+    cached — входные токены, прочитанные из кэша промпта у провайдера
+    (usage.prompt_tokens_details.cached_tokens): они дешевле и быстрее.
+    """
+
+    def __init__(self):
+        self.responses = 0
+        self.prompt = 0
+        self.cached = 0
+        self.completion = 0
+
+    def add(self, usage) -> int:
+        """Учесть usage ответа; вернуть число входных токенов из кэша."""
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", None) or 0
+        self.responses += 1
+        self.prompt += usage.prompt_tokens or 0
+        self.cached += cached
+        self.completion += usage.completion_tokens or 0
+        return cached
+
+    def stats(self) -> dict:
+        return {
+            "responses": self.responses,
+            "prompt_tokens": self.prompt,
+            "cached_tokens": self.cached,
+            "uncached_tokens": self.prompt - self.cached,
+            "completion_tokens": self.completion,
+            "cache_ratio": round(self.cached / self.prompt, 3) if self.prompt else 0.0,
+        }
+
+
+token_stats = TokenStats()
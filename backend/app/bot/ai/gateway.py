@@ -0,0 +1,92 @@
+# Общий клиент LLM: один пул соединений к OpenRouter на процесс
+import logging
+
+import httpx
+from openai import AsyncOpenAI
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class LLMGateway:
+    """Клиент OpenAI-совместимого API поверх общего httpx.AsyncClient.
+
+    Соединения переиспользуются между ответами (keep-alive, HTTP/2), поэтому
+    TLS-рукопожатие с openrouter.ai происходит один раз, а не на каждое
+    сообщение. Для тестов можно передать свой http_client или base_url
+    локальной заглушки и подменить шлюз через set_llm_gateway().
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str | None = None,
+        http_client: httpx.AsyncClient | None = None,
+    ):
+        self.base_url = base_url or settings.ai_base_url
+        self.http_client = http_client or httpx.AsyncClient(
+            http2=settings.ai_http2 and _http2_available(),
+            limits=httpx.Limits(
+                max_connections=settings.ai_max_connections,
+                max_keepalive_connections=settings.ai_max_keepalive_connections,
+                keepalive_expiry=settings.ai_keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(settings.ai_timeout, connect=settings.ai_connect_timeout),
+        )
+        self.client = AsyncOpenAI(
+            base_url=self.base_url,
+            api_key=api_key,
+            http_client=self.http_client,
+            max_retries=settings.ai_max_retries,
+        )
+
+    async def close(self):
+        await self.client.close()
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        logger.warning("Пакет h2 не установлен — LLM работает по HTTP/1.1 (pip install httpx[http2])")
+        return False
+    return True
+
+
+gateway: LLMGateway | None = None
+
+
+def get_llm_gateway() -> LLMGateway | None:
+    """Общий шлюз процесса; создаётся при первом обращении (None без ключа API).
+
+    При AI_BACKEND=fake запросы идут в локальную заглушку, ключ не нужен.
+    """
+    global gateway
+    if gateway is None:
+        if settings.ai_backend == "fake":
+            gateway = LLMGateway("fake", base_url=settings.ai_fake_base_url)
+        elif settings.openrouter_api_key:
+            gateway = LLMGateway(settings.openrouter_api_key)
+    return gateway
+
+
+def set_llm_gateway(new_gateway: LLMGateway | None):
+    """Подменить шлюз (тесты, локальная заглушка API)."""
+    global gateway
+    gateway = new_gateway
+
+
+async def start_llm_gateway():
+    """Создать шлюз при старте сервера."""
+    if get_llm_gateway():
+        logger.info(f"LLM шлюз готов: {gateway.base_url}")
+
+
+async def stop_llm_gateway():
+    """Закрыть соединения при остановке сервера."""
+    global gateway
+    if gateway:
+        await gateway.close()
+        gateway = None
+        logger.info("LLM шлюз остановлен")
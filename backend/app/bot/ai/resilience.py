@@ -0,0 +1,231 @@
+# Устойчивость вызовов LLM: общий дедлайн ответа, автомат (circuit breaker) и запасные модели
+import asyncio
+import logging
+import time
+from typing import AsyncIterator
+
+from openai import AsyncOpenAI
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class LLMUnavailable(Exception):
+    """Ни одна модель не ответила: все автоматы разомкнуты или попытки не удались."""
+
+
+class CircuitBreaker:
+    """Автомат одной модели.
+
+    После failure_threshold неудач подряд (ошибка, таймаут или слишком
+    медленный ответ) размыкается: запросы к модели не идут reset_timeout
+    секунд и сразу уходят на запасную. Затем пропускается одна пробная
+    попытка — удачная замыкает автомат, неудачная снова размыкает.
+    """
+
+    def __init__(self, failure_threshold: int, slow_call: float, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.slow_call = slow_call
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            if self._probing:
+                return False
+            self._probing = True
+        return True
+
+    def record_success(self, elapsed: float):
+        if elapsed > self.slow_call:
+            # Ответ получен, но модель тормозит — считаем как неудачу
+            self.record_failure()
+            return
+        self.state = CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                logger.warning(f"Автомат LLM разомкнут после {self.failures} неудач подряд")
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        """Попытка отменена (гость дописал сообщение) — без влияния на состояние."""
+        self._probing = False
+
+    def stats(self) -> dict:
+        retry_in = 0.0
+        if self.state == OPEN:
+            retry_in = max(self.reset_timeout - (time.monotonic() - self.opened_at), 0.0)
+        return {"state": self.state, "failures": self.failures, "retry_in": round(retry_in, 1)}
+
+
+# Автоматы по моделям, общие на процесс
+breakers: dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(model: str) -> CircuitBreaker:
+    breaker = breakers.get(model)
+    if breaker is None:
+        breaker = breakers[model] = CircuitBreaker(
+            failure_threshold=settings.ai_breaker_failures,
+            slow_call=settings.ai_breaker_slow_seconds,
+            reset_timeout=settings.ai_breaker_reset_seconds,
+        )
+    return breaker
+
+
+def model_chain() -> list[str]:
+    """Основная модель и запасные по порядку (без повторов)."""
+    models = [settings.ai_model]
+    for model in settings.ai_fallback_models.split(","):
+        model = model.strip()
+        if model and model not in models:
+            models.append(model)
+    return models
+
+
+def breaker_stats() -> dict:
+    """Состояние автоматов для /api/status."""
+    return {model: get_breaker(model).stats() for model in model_chain()}
+
+
+def uses_cache_control(model: str) -> bool:
+    """Нужна ли модели явная метка cache_control для кэша промпта."""
+    if not settings.ai_prompt_cache:
+        return False
+    prefixes = [p.strip() for p in settings.ai_prompt_cache_models.split(",") if p.strip()]
+    return model.startswith(tuple(prefixes))
+
+
+def messages_for_model(model: str, messages: list[dict]) -> list[dict]:
+    """Сообщения для одной попытки: системный промпт с точкой кэширования, если она нужна модели.
+
+    Промпт — неизменное начало каждого запроса, поэтому провайдер кэширует
+    его один раз и дальше читает из кэша: быстрее первый токен и дешевле вход.
+    Решается по модели попытки, а не по основной: запасная модель может
+    не понимать метку (формат OpenRouter/Anthropic) или кэшировать сама.
+    """
+    if not messages or messages[0]["role"] != "system" or not uses_cache_control(model):
+        return messages
+    system = {
+        "role": "system",
+        "content": [
+            {"type": "text", "text": messages[0]["content"], "cache_control": {"type": "ephemeral"}},
+        ],
+    }
+    return [system, *messages[1:]]
+
+
+def _attempts(deadline: float):
+    """(модель, автомат, таймаут попытки) по цепочке, пока не вышел дедлайн."""
+    for model in model_chain():
+        breaker = get_breaker(model)
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        if not breaker.allow():
+            logger.info(f"LLM {model}: автомат разомкнут, пропускаем")
+            continue
+        yield model, breaker, min(remaining, settings.ai_attempt_timeout)
+
+
+async def create_completion(client: AsyncOpenAI, messages: list[dict], **kwargs):
+    """chat.completions.create по цепочке моделей в пределах ai_deadline.
+
+    Повторы внутри SDK отключены: вместо повтора той же медленной модели
+    сразу пробуется следующая. LLMUnavailable — если ответа нет ни от одной.
+    """
+    deadline = time.monotonic() + settings.ai_deadline
+    for model, breaker, timeout in _attempts(deadline):
+        started = time.monotonic()
+        try:
+            response = await asyncio.wait_for(
+                client.with_options(timeout=timeout, max_retries=0).chat.completions.create(
+                    model=model, messages=messages_for_model(model, messages), **kwargs
+                ),
+                timeout,
+            )
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        except Exception as e:
+            breaker.record_failure()
+            logger.warning(f"LLM {model} не ответил за {time.monotonic() - started:.1f} с: {e!r}")
+            continue
+        breaker.record_success(time.monotonic() - started)
+        return response
+    raise LLMUnavailable("LLM недоступен: все модели не ответили")
+
+
+async def _close_stream(stream):
+    try:
+        await stream.close()
+    except Exception as e:
+        logger.debug(f"Не удалось закрыть поток LLM: {e!r}")
+
+
+async def stream_completion(client: AsyncOpenAI, messages: list[dict], **kwargs) -> AsyncIterator:
+    """Потоковый вариант create_completion: чанки ответа первой успевшей модели.
+
+    Дедлайн и переключение на запасную модель действуют до первого текста;
+    после него гость уже видит ответ, и поток дочитывается с обычным таймаутом.
+    """
+    deadline = time.monotonic() + settings.ai_deadline
+    for model, breaker, timeout in _attempts(deadline):
+        started = time.monotonic()
+        buffered = []
+        stream = None
+        # Брошенный поток (таймаут первого текста, переход на запасную модель,
+        # отмена) закрывается сразу, иначе его соединение занято до таймаута
+        try:
+            try:
+                async with asyncio.timeout(timeout):
+                    stream = await client.with_options(timeout=timeout, max_retries=0).chat.completions.create(
+                        model=model, messages=messages_for_model(model, messages), stream=True, **kwargs
+                    )
+                    chunks = aiter(stream)
+                    # Ждём первый текст (служебные чанки без текста копим)
+                    async for chunk in chunks:
+                        buffered.append(chunk)
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            break
+            except asyncio.CancelledError:
+                breaker.release()
+                raise
+            except Exception as e:
+                breaker.record_failure()
+                logger.warning(f"LLM {model} (stream) не ответил за {time.monotonic() - started:.1f} с: {e!r}")
+                continue
+
+            breaker.record_success(time.monotonic() - started)
+            for chunk in buffered:
+                yield chunk
+            try:
+                async for chunk in chunks:
+                    yield chunk
+            except Exception:
+                breaker.record_failure()
+                raise
+            return
+        finally:
+            if stream is not None:
+                await _close_stream(stream)
+    raise LLMUnavailable("LLM недоступен: все модели не ответили")
@@ -1,3 +1,5 @@
+import asyncio
+import html
 import logging
 
 from aiogram import Bot, Dispatcher, Router, types, F
@@ -5,11 +7,13 @@ from aiogram.filters import CommandStart
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
 from app.bot.ai.assistant import (
+    ServiceTagFilter,
     bot_completed,
     clean_response,
     generate_response,
     needs_operator,
     format_knowledge_answer,
+    stream_response,
 )
 from app.core.config import settings
 from app.db.database import async_session
@@ -35,6 +39,7 @@ from app.services.notification import (
     get_operator_replying,
     clear_operator_replying,
 )
+from app.services.reply_debounce import reply_debouncer
 from app.services.knowledge import (
     search_knowledge_base,
     add_to_knowledge_base,
@@ -161,7 +166,7 @@ async def handle_save_knowledge_callback(callback: types.CallbackQuery):
         question, answer = qa_pair
 
         # Сохраняем в базу знаний
-        await add_to_knowledge_base(
+        _, duplicate = await add_to_knowledge_base(
             session=session,
             question=question,
             answer=answer,
@@ -169,12 +174,18 @@ async def handle_save_knowledge_callback(callback: types.CallbackQuery):
             conversation_id=conversation_id,
         )
 
-    await callback.answer("✅ Сохранено в базу знаний!")
-    await callback.message.edit_text(
+    text = (
         callback.message.text + "\n\n✅ <b>Добавлено в базу знаний!</b>\n"
-        "Теперь бот сможет отвечать на похожие вопросы сам.",
-        parse_mode="HTML",
+        "Теперь бот сможет отвечать на похожие вопросы сам."
     )
+    if duplicate:
+        text += (
+            f"\n\n⚠️ Похожий вопрос уже есть (#{duplicate.id}): "
+            f"«{html.escape(duplicate.question[:100])}». Объединить записи можно в админке."
+        )
+
+    await callback.answer("✅ Сохранено в базу знаний!")
+    await callback.message.edit_text(text, parse_mode="HTML")
 
 
 @router.callback_query(F.data.startswith("skip_kb:"))
@@ -259,7 +270,20 @@ async def handle_message(message: types.Message):
             await handle_operator_message(message, session, operator, user_telegram_id)
             return
 
-        await handle_client_message(message, session)
+        conversation_id = await handle_client_message(message, session)
+
+    if conversation_id is None:
+        return
+
+    # 5. Гость часто пишет серией коротких сообщений — ждём конца серии
+    # и отвечаем один раз на все сразу. Сессия БД на время ожидания закрыта
+    async with reply_debouncer.turn(conversation_id, message.text) as turn:
+        if not turn.active:
+            return
+        async with async_session() as session:
+            conversation = await session.get(Conversation, conversation_id)
+            client = await session.get(Client, conversation.client_id)
+            await reply_to_client(message, session, client, conversation, turn)
 
 
 async def handle_operator_message(message: types.Message, session, operator, operator_telegram_id: str):
@@ -375,8 +399,11 @@ async def handle_operator_message(message: types.Message, session, operator, ope
         await message.answer(f"❌ Ошибка отправки: {e}")
 
 
-async def handle_client_message(message: types.Message, session):
-    """Обработка сообщения от клиента."""
+async def handle_client_message(message: types.Message, session) -> int | None:
+    """Обработка сообщения от клиента.
+
+    Возвращает id диалога, если отвечать должен бот (None — диалог ведёт менеджер).
+    """
     # 1. Найти или создать клиента
     client = await get_or_create_client(
         session=session,
@@ -413,22 +440,45 @@ async def handle_client_message(message: types.Message, session):
                     )
                 except Exception as e:
                     logger.error(f"Ошибка уведомления менеджера: {e}")
-        return
+        return None
 
-    # 5. Показываем "печатает..." пока думаем
+    return conversation.id
+
+
+async def reply_to_client(message: types.Message, session, client, conversation, turn):
+    """Ответ бота на серию сообщений гостя (база знаний или AI)."""
+    # Показываем "печатает..." пока думаем
     await message.bot.send_chat_action(chat_id=message.chat.id, action="typing")
 
-    # 6. СНАЧАЛА ищем ответ в базе знаний
+    # СНАЧАЛА ищем ответ в базе знаний — по последнему сообщению: склейка
+    # серии разбавила бы совпадение слов с вопросом записи
     knowledge_entry = await search_knowledge_base(session, message.text)
+    streamed_message = None
+
+    # Гость дописал, пока искали — ответит новое сообщение
+    if turn.superseded:
+        return
 
     if knowledge_entry:
         # Нашли ответ в базе знаний — отвечаем без Claude!
         response_text = format_knowledge_answer(knowledge_entry.answer)
         logger.info(f"Ответ из базы знаний (id={knowledge_entry.id})")
     else:
-        # Не нашли — спрашиваем Claude
-        history = await get_conversation_history(session, conversation.id)
-        response_text = await generate_response(history)
+        # Не нашли — спрашиваем Claude (история уже содержит всю серию)
+        history = await get_conversation_history(session, conversation.id, limit=settings.ai_history_limit)
+        if settings.ai_streaming:
+            # Гость видит ответ по мере генерации, а не после всей генерации
+            reply = await turn.guard(
+                stream_ai_reply(message, history),
+                discard=lambda reply: _delete_streamed(reply[0]),
+            )
+            if reply is None:
+                return
+            streamed_message, response_text = reply
+        else:
+            response_text = await turn.guard(generate_response(history))
+            if response_text is None:
+                return
 
         # Проверяем нужен ли менеджер
         need_operator = needs_operator(response_text)
@@ -447,18 +497,74 @@ async def handle_client_message(message: types.Message, session):
                 session=session,
                 conversation=conversation,
                 client=client,
-                last_message=message.text,
+                last_message=turn.text,
             )
 
-    # 7. Сохранить ответ бота
+    # Сохранить ответ бота
     await save_message(
         session, conversation.id, MessageSender.bot, response_text
     )
 
     await session.commit()
 
-    # 8. Отправить ответ клиенту
-    await message.answer(response_text)
+    # Отправить ответ клиенту (потоковый ответ уже на экране)
+    if not streamed_message:
+        await message.answer(response_text)
+
+
+async def stream_ai_reply(message: types.Message, history) -> tuple[types.Message, str]:
+    """Показать ответ AI по мере генерации: заглушка, затем правки сообщения.
+
+    Правки идут не чаще ai_stream_edit_interval (ограничения Telegram на
+    редактирование), служебные теги вырезаются до показа. Возвращает
+    отправленное сообщение и полный ответ модели (с тегами). При отмене
+    (гость дописал сообщение) заглушка с частью ответа удаляется.
+    """
+    sent = await message.answer(settings.ai_stream_placeholder)
+    loop = asyncio.get_running_loop()
+    tag_filter = ServiceTagFilter()
+    parts = []
+    visible = ""
+    shown = ""
+    last_edit = loop.time()
+
+    try:
+        async for chunk in stream_response(history):
+            parts.append(chunk)
+            visible += tag_filter.feed(chunk)
+            # Первый текст показываем сразу, дальше — не чаще интервала
+            throttled = shown and loop.time() - last_edit < settings.ai_stream_edit_interval
+            if not throttled and visible.strip() != shown:
+                shown = visible.strip()
+                await _edit_streamed(sent, shown)
+                last_edit = loop.time()
+    except asyncio.CancelledError:
+        # Гость дописал сообщение — недописанный ответ убираем, придёт новый
+        await _delete_streamed(sent)
+        raise
+
+    response_text = "".join(parts)
+    final_text = clean_response(response_text)
+    if final_text != shown:
+        await _edit_streamed(sent, final_text)
+    return sent, response_text
+
+
+async def _delete_streamed(sent: types.Message):
+    try:
+        await sent.delete()
+    except Exception as e:
+        logger.debug(f"Не удалось удалить заменённый ответ: {e}")
+
+
+async def _edit_streamed(sent: types.Message, text: str):
+    if not text:
+        return
+    try:
+        await sent.edit_text(text)
+    except Exception as e:
+        # «message is not modified», лимит правок и т.п. — следующая правка догонит
+        logger.debug(f"Не удалось обновить потоковый ответ: {e}")
 
 
 async def start_bot():
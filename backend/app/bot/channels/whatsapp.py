@@ -2,6 +2,7 @@
 WhatsApp канал через Meta Cloud API.
 Обработка входящих сообщений и отправка ответов.
 """
+import asyncio
 import logging
 from fastapi import APIRouter, Request, Query
 from fastapi.responses import PlainTextResponse
@@ -16,6 +17,8 @@ from app.bot.ai.assistant import (
 from app.db.database import async_session
 from app.db.models.models import (
     ChannelType,
+    Client,
+    Conversation,
     ConversationStatus,
     MessageSender,
 )
@@ -28,6 +31,7 @@ from app.services.conversation import (
 )
 from app.services.notification import notify_operators_new_request
 from app.services.knowledge import search_knowledge_base
+from app.services.reply_debounce import reply_debouncer
 from app.services.meta_whatsapp import (
     send_whatsapp_message,
     parse_webhook_message,
@@ -39,6 +43,9 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Фоновые ответы гостям (ссылки держим, чтобы задачи не собрал GC)
+_reply_tasks: set[asyncio.Task] = set()
+
 
 @router.get("/webhook/whatsapp")
 async def whatsapp_webhook_verify(
@@ -81,13 +88,22 @@ async def whatsapp_webhook(request: Request):
 
     # Обрабатываем сообщение
     try:
-        await handle_whatsapp_message(
+        conversation_id = await handle_whatsapp_message(
             phone_number=message_data["phone"],
             message_text=message_data["text"],
             profile_name=message_data["name"],
         )
     except Exception as e:
         logger.error(f"Ошибка обработки WhatsApp сообщения: {e}")
+        return PlainTextResponse("OK")
+
+    # Ответ готовится в фоне: окно ожидания серии и генерация не держат запрос Meta
+    if conversation_id is not None:
+        task = asyncio.create_task(
+            reply_to_whatsapp(conversation_id, message_data["phone"], message_data["text"])
+        )
+        _reply_tasks.add(task)
+        task.add_done_callback(_reply_tasks.discard)
 
     return PlainTextResponse("OK")
 
@@ -96,13 +112,15 @@ async def handle_whatsapp_message(
     phone_number: str,
     message_text: str,
     profile_name: str,
-):
+) -> int | None:
     """
     Обработка входящего WhatsApp сообщения.
     Логика аналогична Telegram боту.
+
+    Возвращает id диалога, если отвечать должен бот (см. reply_to_whatsapp).
     """
     if not message_text.strip():
-        return
+        return None
 
     async with async_session() as session:
         # 1. Найти или создать клиента
@@ -146,52 +164,79 @@ async def handle_whatsapp_message(
                     except Exception as e:
                         logger.error(f"Ошибка уведомления менеджера о WhatsApp сообщении: {e}")
             await session.commit()
+            return None
+
+        return conversation.id
+
+
+async def reply_to_whatsapp(conversation_id: int, phone_number: str, message_text: str):
+    """Ответ бота на серию WhatsApp сообщений (база знаний или AI).
+
+    Серия сообщений подряд — один ответ на всё после паузы. Сессия БД
+    открывается только после окна ожидания.
+    """
+    try:
+        async with reply_debouncer.turn(conversation_id, message_text) as turn:
+            if not turn.active:
+                return
+            async with async_session() as session:
+                await _reply_in_turn(session, conversation_id, phone_number, message_text, turn)
+    except Exception as e:
+        logger.error(f"Ошибка ответа в WhatsApp (диалог #{conversation_id}): {e}")
+
+
+async def _reply_in_turn(session, conversation_id: int, phone_number: str, message_text: str, turn):
+    conversation = await session.get(Conversation, conversation_id)
+    client = await session.get(Client, conversation.client_id)
+
+    # 6. Ищем ответ в базе знаний (по последнему сообщению серии)
+    knowledge_entry = await search_knowledge_base(session, message_text)
+    if turn.superseded:
+        return
+
+    if knowledge_entry:
+        # Нашли ответ в базе знаний
+        response_text = format_knowledge_answer(knowledge_entry.answer)
+        logger.info(f"WhatsApp: ответ из базы знаний (id={knowledge_entry.id})")
+    else:
+        # Спрашиваем AI
+        history = await get_conversation_history(session, conversation.id, limit=settings.ai_history_limit)
+        response_text = await turn.guard(generate_response(history))
+        if response_text is None:
             return
 
-        # 5. Ищем ответ в базе знаний
-        knowledge_entry = await search_knowledge_base(session, message_text)
-
-        if knowledge_entry:
-            # Нашли ответ в базе знаний
-            response_text = format_knowledge_answer(knowledge_entry.answer)
-            logger.info(f"WhatsApp: ответ из базы знаний (id={knowledge_entry.id})")
-        else:
-            # Спрашиваем AI
-            history = await get_conversation_history(session, conversation.id)
-            response_text = await generate_response(history)
-
-            # Проверяем нужен ли менеджер
-            need_operator = needs_operator(response_text)
-            if need_operator:
-                conversation.status = ConversationStatus.needs_operator
-            elif bot_completed(response_text):
-                conversation.status = ConversationStatus.bot_completed
-
-            response_text = clean_response(response_text)
-
-            # Уведомляем менеджеров если нужно
-            if need_operator:
-                await session.commit()
-                from app.bot.channels.telegram import get_bot
+        # Проверяем нужен ли менеджер
+        need_operator = needs_operator(response_text)
+        if need_operator:
+            conversation.status = ConversationStatus.needs_operator
+        elif bot_completed(response_text):
+            conversation.status = ConversationStatus.bot_completed
 
-                bot = get_bot()
-                if bot:
-                    await notify_operators_new_request(
-                        bot=bot,
-                        session=session,
-                        conversation=conversation,
-                        client=client,
-                        last_message=message_text,
-                    )
-
-        # 6. Сохранить ответ бота
-        await save_message(
-            session, conversation.id, MessageSender.bot, response_text
-        )
-        await session.commit()
+        response_text = clean_response(response_text)
+
+        # Уведомляем менеджеров если нужно
+        if need_operator:
+            await session.commit()
+            from app.bot.channels.telegram import get_bot
+
+            bot = get_bot()
+            if bot:
+                await notify_operators_new_request(
+                    bot=bot,
+                    session=session,
+                    conversation=conversation,
+                    client=client,
+                    last_message=turn.text,
+                )
+
+    # 7. Сохранить ответ бота
+    await save_message(
+        session, conversation.id, MessageSender.bot, response_text
+    )
+    await session.commit()
 
-        # 7. Отправить ответ клиенту через WhatsApp
-        await send_whatsapp_message(phone_number, response_text)
+    # 8. Отправить ответ клиенту через WhatsApp
+    await send_whatsapp_message(phone_number, response_text)
 
 
 async def send_operator_reply_to_whatsapp(phone_number: str, message: str) -> bool:
@@ -29,6 +29,63 @@ class Settings(BaseSettings):
     # AI (OpenRouter)
     openrouter_api_key: str = ""
     ai_model: str = "deepseek/deepseek-chat"
+    ai_base_url: str = "https://openrouter.ai/api/v1"
+    # openrouter | fake — заглушка benchmarks/fake_llm.py (нагрузочные тесты, кассеты)
+    ai_backend: str = "openrouter"
+    ai_fake_base_url: str = "http://localhost:8081/v1"
+    # Общий пул соединений к LLM (keep-alive, HTTP/2)
+    ai_http2: bool = True
+    ai_max_connections: int = 20
+    ai_max_keepalive_connections: int = 10
+    ai_keepalive_expiry: float = 60.0  # секунд держать простаивающее соединение
+    ai_connect_timeout: float = 5.0
+    ai_timeout: float = 60.0
+    ai_max_retries: int = 2
+    # Устойчивость: дедлайн всего ответа, таймаут попытки, запасные модели по порядку
+    # (через запятую) и автомат, отключающий модель после неудач подряд
+    ai_deadline: float = 20.0
+    ai_attempt_timeout: float = 10.0
+    ai_fallback_models: str = ""
+    ai_breaker_failures: int = 3
+    ai_breaker_slow_seconds: float = 8.0  # ответ медленнее — тоже неудача
+    ai_breaker_reset_seconds: float = 30.0  # через сколько пробовать модель снова
+    # Бюджет промпта (токены считаются локально, приблизительно)
+    ai_input_token_budget: int = 4000  # системный промпт + история
+    ai_message_token_limit: int = 500  # длиннее — сообщение истории обрезается
+    ai_history_limit: int = 10         # сообщений истории, из которых набирается бюджет
+    ai_max_tokens: int = 500           # длина ответа
+    # Кэш префикса промпта у провайдера: системный промпт помечается cache_control
+    # для моделей, которым нужна явная метка (префиксы через запятую); OpenAI и
+    # DeepSeek кэшируют одинаковое начало промпта сами
+    ai_prompt_cache: bool = True
+    ai_prompt_cache_models: str = "anthropic/,google/gemini"
+    # Потоковые ответы в Telegram: заглушка, затем правки сообщения по мере генерации
+    ai_streaming: bool = True
+    ai_stream_edit_interval: float = 1.0  # секунд между правками (лимиты Telegram)
+    ai_stream_placeholder: str = "✍️"
+    # Пауза перед ответом: сообщения гостя подряд склеиваются в один запрос
+    reply_debounce_seconds: float = 1.5
+
+    # База знаний: движок поиска (overlap | bm25 | postgres)
+    kb_search_engine: str = "overlap"
+    kb_bm25_k1: float = 1.2
+    kb_bm25_b: float = 0.75
+    kb_fts_candidates: int = 50  # сколько кандидатов брать из PostgreSQL
+    # Второй этап: сходство по символьным n-граммам. Ловит только варианты
+    # написания (формы слов, опечатки, слитное/дефисное написание), а не
+    # перефразирование — для него синонимы (/api/knowledge/synonyms).
+    # По умолчанию выключен: на каждый промах добавляет второй проход
+    kb_semantic_enabled: bool = False
+    kb_semantic_threshold: float = 0.7
+    # Исправление опечаток и транслита (skolko stoit) по словарю базы знаний
+    kb_spelling_enabled: bool = True
+    kb_hits_flush_interval: int = 30  # секунд между записями счётчиков использования
+    kb_cache_size: int = 1000  # вопросов в кэше ответов
+    kb_cache_ttl: int = 600    # секунд жизни записи кэша
+    # Почти одинаковые вопросы: при добавлении сообщать о похожей записи
+    # (подписи MinHash строятся для всего индекса, поэтому по умолчанию выключено)
+    kb_dedup_on_add: bool = False
+    kb_dedup_threshold: float = 0.8
 
     # JWT для админки
     secret_key: str = "change-me-in-production"
@@ -43,5 +100,5 @@ settings = Settings()
 if settings.secret_key == "change-me-in-production" and not settings.debug:
     logger.critical("SECRET_KEY не изменён! Установите уникальный SECRET_KEY в .env")
 
-if not settings.openrouter_api_key:
+if not settings.openrouter_api_key and settings.ai_backend != "fake":
     logger.warning("OPENROUTER_API_KEY не задан — бот будет отвечать заглушкой")
@@ -142,6 +142,7 @@ class KnowledgeBase(Base):
     question = Column(Text, nullable=False)      # Вопрос клиента
     answer = Column(Text, nullable=False)        # Ответ менеджера
     keywords = Column(Text, nullable=True)       # Ключевые слова для поиска
+    tokens = Column(Text, nullable=True)         # Нормализованные слова для индекса
     added_by_id = Column(Integer, ForeignKey("operators.id"), nullable=True)
     conversation_id = Column(Integer, ForeignKey("conversations.id"), nullable=True)
     is_active = Column(Boolean, default=True)    # Можно отключить без удаления
@@ -150,3 +151,14 @@ class KnowledgeBase(Base):
     updated_at = Column(DateTime, default=now_bishkek, onupdate=now_bishkek)
 
     added_by = relationship("Operator")
+
+
+class KnowledgeSynonym(Base):
+    """Синонимы для поиска по базе знаний: «мк», «урок» -> «мастер-класс»"""
+    __tablename__ = "knowledge_synonyms"
+
+    id = Column(Integer, primary_key=True)
+    term = Column(String(255), unique=True, nullable=False)  # Основной термин
+    aliases = Column(Text, nullable=False)                    # Синонимы через запятую
+    created_at = Column(DateTime, default=now_bishkek)
+    updated_at = Column(DateTime, default=now_bishkek, onupdate=now_bishkek)
@@ -6,10 +6,18 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.config import settings
 from app.api.routes import api_router
+from app.bot.ai.budget import token_stats
+from app.bot.ai.gateway import start_llm_gateway, stop_llm_gateway
+from app.bot.ai.resilience import breaker_stats
 from app.bot.channels.telegram import start_bot, stop_bot
 from app.bot.channels.whatsapp import router as whatsapp_router
 from app.db.database import async_session
 from app.services.conversation import close_stale_conversations
+from app.services.knowledge import reindex_missing_tokens
+from app.services.knowledge_cache import answer_cache
+from app.services.knowledge_index import ENGINE_POSTGRES, knowledge_index
+from app.services.knowledge_stats import flush_knowledge_hits
+from app.services import knowledge_sync
 
 logging.basicConfig(level=logging.INFO)
 
@@ -48,6 +56,17 @@ async def status():
             "configured": is_whatsapp_configured(),
             "webhook": "/webhook/whatsapp",
         },
+        "ai": {
+            "model": settings.ai_model,
+            "tokens": token_stats.stats(),
+            "circuit": breaker_stats(),
+        },
+        "knowledge_base": {
+            "engine": settings.kb_search_engine,
+            "indexed": len(knowledge_index),
+            "version": knowledge_sync.last_version,
+            "cache": answer_cache.stats(),
+        },
     }
 
 
@@ -71,14 +90,67 @@ async def auto_close_loop():
                 await asyncio.sleep(1800)
 
 
+async def knowledge_hits_loop():
+    """Фоновая задача: сбрасывать счётчики использования базы знаний в БД."""
+    logger = logging.getLogger(__name__)
+    consecutive_errors = 0
+    while True:
+        await asyncio.sleep(settings.kb_hits_flush_interval)
+        try:
+            async with async_session() as session:
+                await flush_knowledge_hits(session)
+            consecutive_errors = 0
+        except Exception as e:
+            consecutive_errors += 1
+            logger.error(f"Ошибка записи счётчиков базы знаний ({consecutive_errors}): {e}")
+            if consecutive_errors >= 5:
+                # Счётчики копятся в памяти и запишутся после паузы
+                logger.critical("Счётчики базы знаний: 5 ошибок подряд, пауза 30 минут")
+                await asyncio.sleep(1800)
+
+
 @app.on_event("startup")
 async def on_startup():
     """Запуск Telegram бота и автозакрытия в фоне при старте сервера."""
+    # Изменения базы знаний из других процессов (uvicorn workers)
+    knowledge_sync.start_knowledge_listener()
+
+    # После миграции 009 tokens пусты — пересчитываем до построения индекса
+    # (в PostgreSQL один worker, остальные ждут его под advisory-блокировкой)
+    try:
+        async with async_session() as session:
+            await reindex_missing_tokens(session)
+    except Exception as e:
+        logging.getLogger(__name__).error(f"Не удалось переиндексировать базу знаний: {e}")
+
+    # При поиске через PostgreSQL индекс в памяти нужен только для второго этапа (n-граммы)
+    # и словаря исправления опечаток
+    if (
+        settings.kb_search_engine != ENGINE_POSTGRES
+        or settings.kb_semantic_enabled
+        or settings.kb_spelling_enabled
+    ):
+        try:
+            async with async_session() as session:
+                await knowledge_index.load(session)
+        except Exception as e:
+            logging.getLogger(__name__).error(f"Не удалось построить индекс базы знаний: {e}")
+    # Один пул соединений к LLM на весь процесс
+    await start_llm_gateway()
+
     asyncio.create_task(start_bot())
     asyncio.create_task(auto_close_loop())
+    asyncio.create_task(knowledge_hits_loop())
 
 
 @app.on_event("shutdown")
 async def on_shutdown():
-    """Остановка бота при выключении сервера."""
+    """Остановка бота и запись накопленных счётчиков при выключении сервера."""
     await stop_bot()
+    await stop_llm_gateway()
+    await knowledge_sync.stop_knowledge_listener()
+    try:
+        async with async_session() as session:
+            await flush_knowledge_hits(session)
+    except Exception as e:
+        logging.getLogger(__name__).error(f"Ошибка записи счётчиков базы знаний: {e}")
@@ -0,0 +1,40 @@
+"""
+Поиск почти одинаковых вопросов в базе знаний.
+
+    python -m app.scripts.dedup_knowledge [--threshold 0.8] [--merge]
+
+Без --merge только выводит найденные группы.
+"""
+import argparse
+import asyncio
+import logging
+
+from app.db.database import async_session
+from app.services.knowledge import find_duplicate_clusters, merge_knowledge_entries
+
+
+async def main(threshold: float | None, merge: bool):
+    async with async_session() as session:
+        clusters = await find_duplicate_clusters(session, threshold)
+
+        for cluster in clusters:
+            print(f"Группа из {len(cluster)} записей:")
+            for entry in cluster:
+                print(f"  #{entry.id} (использован {entry.times_used or 0} раз): {entry.question[:80]}")
+
+            if merge:
+                keeper = await merge_knowledge_entries(session, [entry.id for entry in cluster])
+                print(f"  -> оставлена #{keeper.id}")
+
+    print(f"Найдено групп: {len(clusters)}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Поиск и слияние дублей в базе знаний")
+    parser.add_argument("--threshold", type=float, default=None)
+    parser.add_argument("--merge", action="store_true", help="слить найденные группы")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.threshold, args.merge))
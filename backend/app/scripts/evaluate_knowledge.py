@@ -0,0 +1,220 @@
+"""
+Оценка базы знаний на истории диалогов: сколько вопросов гостей она закрыла бы
+при разных порогах и настройках поиска.
+
+    python -m app.scripts.evaluate_knowledge \
+        [--engines overlap bm25] [--thresholds 0.3 0.4 0.5 0.6 0.7] \
+        [--semantic on off] [--spelling on] [--limit 10000] [--output eval.json]
+
+Сообщения клиентов читаются потоком (серверный курсор, yield_per). Каждое
+прогоняется через search_knowledge_base без кэша и без счётчиков. Для каждой
+настройки считаются:
+  hit_rate      — доля вопросов, на которые нашлась запись (минус один вызов LLM);
+  answer_match  — среди найденных вопросов, на которые потом ответил менеджер,
+                  доля совпадений ответа записи с ответом менеджера;
+  per_second    — пропускная способность поиска: вопросов в секунду по времени этапов
+                  tokenize/candidates/scoring/semantic (без загрузки найденной записи;
+                  смысловой этап считается всегда, если включён, — оценка снизу).
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+from dataclasses import dataclass, field
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.db.database import async_session
+from app.db.models.models import KnowledgeBase, Message, MessageSender
+from app.services.knowledge import search_knowledge_base
+from app.services.knowledge_index import knowledge_index
+from app.services.knowledge_trace import SearchTrace
+
+# Этапы, которые не относятся к самому поиску
+UNTIMED_STAGES = ("fetch", "index_load")
+
+
+@dataclass
+class Variant:
+    """Одна настройка поиска и её счётчики по всем порогам."""
+    engine: str
+    semantic: bool
+    spelling: bool
+    thresholds: list[float]
+    questions: int = 0
+    seconds: float = 0.0
+    hits: dict[float, int] = field(default_factory=dict)
+    answered_hits: dict[float, int] = field(default_factory=dict)
+    answer_matches: dict[float, int] = field(default_factory=dict)
+
+    @property
+    def name(self) -> str:
+        flags = [self.engine]
+        if self.semantic:
+            flags.append("semantic")
+        if self.spelling:
+            flags.append("spelling")
+        return "+".join(flags)
+
+    def report(self) -> dict:
+        return {
+            "engine": self.engine,
+            "semantic": self.semantic,
+            "spelling": self.spelling,
+            "per_second": round(self.questions / self.seconds, 1) if self.seconds else None,
+            "thresholds": {
+                str(threshold): {
+                    "hit_rate": _ratio(self.hits.get(threshold, 0), self.questions),
+                    "answer_match": _ratio(
+                        self.answer_matches.get(threshold, 0), self.answered_hits.get(threshold, 0)
+                    ),
+                }
+                for threshold in self.thresholds
+            },
+        }
+
+
+def _ratio(part: int, total: int) -> float | None:
+    return round(part / total, 4) if total else None
+
+
+def _same_answer(first: str, second: str) -> bool:
+    return " ".join(first.lower().split()) == " ".join(second.lower().split())
+
+
+async def iter_client_questions(session, batch_size: int):
+    """(вопрос, ответ менеджера или None) по всей истории.
+
+    Ответ менеджера — первое сообщение оператора после вопроса в том же диалоге.
+    """
+    result = await session.stream(
+        select(Message.conversation_id, Message.sender, Message.text)
+        .where(Message.sender.in_([MessageSender.client, MessageSender.operator]))
+        .order_by(Message.conversation_id, Message.created_at, Message.id)
+        .execution_options(yield_per=batch_size)
+    )
+
+    pending: list[str] = []
+    conversation_id = None
+    async for row_conversation_id, sender, text in result:
+        if row_conversation_id != conversation_id:
+            for question in pending:
+                yield question, None
+            pending = []
+            conversation_id = row_conversation_id
+
+        if sender == MessageSender.client:
+            pending.append(text)
+        elif pending:
+            for question in pending:
+                yield question, text
+            pending = []
+
+    for question in pending:
+        yield question, None
+
+
+async def evaluate(variants: list[Variant], batch_size: int, limit: int | None):
+    thresholds = variants[0].thresholds
+    async with async_session() as stream_session, async_session() as session:
+        result = await session.execute(select(KnowledgeBase.id, KnowledgeBase.answer))
+        answers = dict(result.all())
+        # Индекс и синонимы строятся заранее, чтобы не попасть в замеры
+        await knowledge_index.load(session)
+
+        count = 0
+        async for question, operator_answer in iter_client_questions(stream_session, batch_size):
+            if limit and count >= limit:
+                break
+            for variant in variants:
+                # Бесконечный порог: ключевой этап не срабатывает, и смысловой этап
+                # выполняется всегда — по обоим кандидатам решение для любого
+                # порога принимается так же, как в _find_best_match
+                trace = SearchTrace(top_k=1)
+                await search_knowledge_base(
+                    session,
+                    question,
+                    float("inf"),
+                    trace=trace,
+                    engine=variant.engine,
+                    semantic=variant.semantic,
+                    spelling=variant.spelling,
+                )
+                variant.seconds += sum(
+                    ms for stage, ms in trace.timings.items() if stage not in UNTIMED_STAGES
+                ) / 1000
+                variant.questions += 1
+
+                keyword_top = (trace.data.get("candidates") or [None])[0]
+                semantic_top = (trace.data.get("semantic_candidates") or [None])[0]
+                for threshold in thresholds:
+                    if keyword_top and keyword_top[1] >= threshold:
+                        entry_id = keyword_top[0]
+                    elif semantic_top and semantic_top[1] >= settings.kb_semantic_threshold:
+                        entry_id = semantic_top[0]
+                    else:
+                        continue
+
+                    variant.hits[threshold] = variant.hits.get(threshold, 0) + 1
+                    if operator_answer is not None:
+                        variant.answered_hits[threshold] = variant.answered_hits.get(threshold, 0) + 1
+                        if _same_answer(answers.get(entry_id, ""), operator_answer):
+                            variant.answer_matches[threshold] = variant.answer_matches.get(threshold, 0) + 1
+
+            count += 1
+            if count % 1000 == 0:
+                logging.info(f"Обработано вопросов: {count}")
+
+    return count
+
+
+def print_report(variants: list[Variant], count: int):
+    print(f"Вопросов клиентов: {count}")
+    for variant in variants:
+        report = variant.report()
+        print(f"\n{variant.name}: {report['per_second']} вопросов/с")
+        print("  порог  hit_rate  answer_match")
+        for threshold, values in report["thresholds"].items():
+            hit_rate = values["hit_rate"] if values["hit_rate"] is not None else "-"
+            answer_match = values["answer_match"] if values["answer_match"] is not None else "-"
+            print(f"  {threshold:>5}  {hit_rate:>8}  {answer_match:>12}")
+
+
+async def main(args):
+    variants = [
+        Variant(engine=engine, semantic=semantic == "on", spelling=spelling == "on", thresholds=args.thresholds)
+        for engine, semantic, spelling in itertools.product(args.engines, args.semantic, args.spelling)
+    ]
+    count = await evaluate(variants, args.batch_size, args.limit)
+    print_report(variants, count)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(
+                {"questions": count, "variants": [variant.report() for variant in variants]},
+                f,
+                ensure_ascii=False,
+                indent=2,
+            )
+        print(f"\nРезультаты сохранены в {args.output}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Оценка базы знаний на истории диалогов")
+    parser.add_argument("--engines", nargs="+", default=[settings.kb_search_engine],
+                        choices=["overlap", "bm25", "postgres"])
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.3, 0.4, 0.5, 0.6, 0.7])
+    parser.add_argument("--semantic", nargs="+", default=["on" if settings.kb_semantic_enabled else "off"],
+                        choices=["on", "off"])
+    parser.add_argument("--spelling", nargs="+", default=["on" if settings.kb_spelling_enabled else "off"],
+                        choices=["on", "off"])
+    parser.add_argument("--limit", type=int, default=None, help="не больше N вопросов")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--output", default=None, help="сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    asyncio.run(main(args))
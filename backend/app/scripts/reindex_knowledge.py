@@ -0,0 +1,28 @@
+"""
+Переиндексация базы знаний: пересчитать keywords и tokens всех записей.
+
+Запускать после изменения стеммера или списка стоп-слов:
+    python -m app.scripts.reindex_knowledge [--batch-size 500]
+"""
+import argparse
+import asyncio
+import logging
+
+from app.db.database import async_session
+from app.services.knowledge import reindex_knowledge_base
+
+
+async def main(batch_size: int):
+    async with async_session() as session:
+        total = await reindex_knowledge_base(session, batch_size=batch_size)
+    print(f"Переиндексировано записей: {total}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Переиндексация базы знаний")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.batch_size))
@@ -1,9 +1,24 @@
 # Сервис базы знаний
+import csv
 import logging
-from sqlalchemy import select, func
+from typing import AsyncIterable, AsyncIterator, Iterable
+
+from sqlalchemy import insert, select, text, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
 from app.db.models.models import KnowledgeBase, Message, MessageSender
+from app.services.knowledge_cache import CACHE_MISS, answer_cache
+from app.services.knowledge_dedup import DuplicateDetector
+from app.services.knowledge_fts import rank_postgres
+from app.services.knowledge_index import ENGINE_POSTGRES, entry_tokens, knowledge_index
+from app.services.knowledge_spelling import correct_query_tokens
+from app.services.knowledge_stats import merge_pending_hits, record_knowledge_hit
+from app.services.knowledge_sync import is_postgres, on_corpus_changed, on_entry_saved
+from app.services.knowledge_synonyms import synonyms
+from app.services.knowledge_trace import NO_TRACE, SearchTrace
+from app.services.phrase_matcher import PhraseMatcher
+from app.services.tokenizer import extract_keywords, normalize_keywords, normalize_word
 
 logger = logging.getLogger(__name__)
 
@@ -14,133 +29,468 @@ async def add_to_knowledge_base(
     answer: str,
     operator_id: int | None = None,
     conversation_id: int | None = None,
-) -> KnowledgeBase:
-    """Добавить новую запись в базу знаний."""
+) -> tuple[KnowledgeBase, KnowledgeBase | None]:
+    """Добавить новую запись в базу знаний.
+
+    Возвращает новую запись и похожий вопрос, который уже был в базе
+    (при KB_DEDUP_ON_ADD, иначе None). Существующие записи не меняются:
+    «8 занятий» и «12 занятий» после нормализации неотличимы, поэтому
+    решение о слиянии остаётся за менеджером (/api/knowledge/duplicates).
+    """
     # Генерируем ключевые слова из вопроса (простая версия)
-    keywords = extract_keywords(question)
+    keywords, tokens = await question_terms(session, question)
+    duplicate = await _find_duplicate(session, tokens)
 
     entry = KnowledgeBase(
         question=question,
         answer=answer,
         keywords=keywords,
+        tokens=tokens,
         added_by_id=operator_id,
         conversation_id=conversation_id,
     )
     session.add(entry)
     await session.commit()
     await session.refresh(entry)
+    await on_entry_saved(session, entry)
 
     logger.info(f"Добавлено в базу знаний: '{question[:50]}...' -> '{answer[:50]}...'")
-    return entry
+    if duplicate:
+        logger.info(f"Похожий вопрос уже есть в базе знаний: id={duplicate.id} и новая id={entry.id}")
+    return entry, duplicate
+
+
+async def _find_duplicate(session: AsyncSession, tokens: str) -> KnowledgeBase | None:
+    # Дубли ищутся по индексу в памяти; если он не построен — проверка пропускается
+    if not settings.kb_dedup_on_add or not tokens or not knowledge_index.loaded:
+        return None
+
+    found = knowledge_index.duplicates.find(set(tokens.split()), settings.kb_dedup_threshold)
+    if not found:
+        return None
+    return await session.get(KnowledgeBase, found[0][0])
+
+
+async def find_duplicate_clusters(
+    session: AsyncSession,
+    threshold: float | None = None,
+) -> list[list[KnowledgeBase]]:
+    """Найти группы почти одинаковых вопросов среди активных записей (по всей таблице)."""
+    detector = DuplicateDetector()
+    entries: dict[int, KnowledgeBase] = {}
+    async for entry in iter_knowledge_entries(session):
+        if not entry.is_active:
+            continue
+        entries[entry.id] = entry
+        detector.add(entry.id, entry_tokens(entry.tokens, entry.keywords))
 
+    clusters = detector.clusters(threshold or settings.kb_dedup_threshold)
+    return [[entries[entry_id] for entry_id in cluster] for cluster in clusters]
 
-def extract_keywords(text: str) -> str:
-    """Извлечь ключевые слова из текста."""
-    # Стоп-слова на русском и английском
-    stop_words = {
-        'а', 'и', 'в', 'на', 'с', 'что', 'как', 'это', 'для', 'по', 'из',
-        'у', 'к', 'о', 'не', 'да', 'но', 'же', 'ли', 'бы', 'то', 'вы',
-        'мы', 'он', 'она', 'они', 'вас', 'нас', 'его', 'её', 'их', 'мне',
-        'есть', 'быть', 'был', 'была', 'будет', 'можно', 'нужно', 'надо',
-        'сколько', 'какой', 'какая', 'какие', 'когда', 'где', 'кто', 'чем',
-        'the', 'a', 'an', 'is', 'are', 'was', 'were', 'be', 'been', 'being',
-        'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could',
-        'should', 'may', 'might', 'must', 'shall', 'can', 'need', 'dare',
-        'ought', 'used', 'to', 'of', 'in', 'for', 'on', 'with', 'at', 'by',
-        'from', 'or', 'and', 'not', 'but', 'if', 'this', 'that', 'these',
-        'those', 'what', 'which', 'who', 'whom', 'how', 'when', 'where', 'why',
-    }
 
-    # Очищаем текст
-    words = text.lower().replace('?', '').replace('!', '').replace('.', '').replace(',', '').split()
-    keywords = [normalize_word(w) for w in words if w not in stop_words and len(w) > 2]
+async def merge_knowledge_entries(
+    session: AsyncSession,
+    entry_ids: list[int],
+) -> KnowledgeBase | None:
+    """Слить записи в одну: остаётся самая используемая (при равенстве — самая новая),
+    times_used суммируется, остальные записи удаляются."""
+    result = await session.execute(
+        select(KnowledgeBase).where(KnowledgeBase.id.in_(entry_ids))
+    )
+    entries = list(result.scalars().all())
+    if len(entries) < 2:
+        return entries[0] if entries else None
 
-    return ' '.join(keywords)
+    keeper = max(entries, key=lambda e: (e.times_used or 0, e.id))
+    for entry in entries:
+        if entry is keeper:
+            continue
+        keeper.times_used = (keeper.times_used or 0) + (entry.times_used or 0)
+        # Ещё не записанные попадания тоже переносим
+        merge_pending_hits(entry.id, keeper.id)
+        await session.delete(entry)
 
+    await session.commit()
+    await session.refresh(keeper)
+    await on_corpus_changed(session)
 
-def normalize_word(word: str) -> str:
-    """Простая нормализация слова — убираем окончания."""
-    # Убираем типичные русские окончания для грубого стемминга
-    suffixes = [
-        'ться', 'ить', 'ать', 'еть', 'уть', 'оть',  # глаголы
-        'ение', 'ание', 'ость', 'есть', 'ство',  # существительные
-        'ого', 'его', 'ому', 'ему', 'ым', 'им', 'ой', 'ей',  # прилагательные
-        'ёт', 'ет', 'ит', 'ут', 'ют', 'ат', 'ят',  # глаголы
-        'ся', 'сь',  # возвратные
-    ]
+    logger.info(f"Слиты записи базы знаний {sorted(e.id for e in entries)} -> {keeper.id}")
+    return keeper
 
-    word = word.lower().strip()
 
-    for suffix in suffixes:
-        if word.endswith(suffix) and len(word) > len(suffix) + 2:
-            return word[:-len(suffix)]
+def _question_terms(question: str) -> tuple[str, str]:
+    """(keywords, tokens) вопроса при уже загруженном словаре синонимов.
 
-    return word
+    keywords — ключевые слова в том виде, как вопрос написан (их видит
+    менеджер в админке), tokens — нормализованные слова для поиска, в них
+    синонимы заменены на основные термины.
+
+    Язык клиента не учитывается: записи и вопросы гостей разбираются по
+    одним правилам (кыргызские окончания снимаются только у слов с ң, ө, ү),
+    иначе русские слова кыргызоязычного гостя («карта» -> «кар») не
+    совпадали бы ни с одной записью.
+    """
+    keywords = extract_keywords(question)
+    tokens = normalize_keywords(extract_keywords(synonyms.apply(question)))
+    return keywords, tokens
+
+
+async def question_terms(session: AsyncSession, question: str) -> tuple[str, str]:
+    """(keywords, tokens) вопроса: keywords как написаны, в tokens синонимы заменены на термины."""
+    if not synonyms.loaded:
+        await synonyms.load(session)
+    return _question_terms(question)
+
+
+async def rank_knowledge_base(
+    session: AsyncSession,
+    question: str,
+    limit: int = 5,
+    engine: str | None = None,
+) -> list[tuple[KnowledgeBase, float]]:
+    """Лучшие записи базы знаний для вопроса с оценками (по убыванию)."""
+    _, tokens = await question_terms(session, question)
+    if not tokens:
+        return []
+
+    query_tokens = await _query_tokens(session, question, tokens)
+    ranked = await _rank_entry_ids(session, query_tokens, limit, engine)
+    if not ranked:
+        return []
+
+    result = await session.execute(
+        select(KnowledgeBase).where(KnowledgeBase.id.in_([entry_id for entry_id, _ in ranked]))
+    )
+    entries = {entry.id: entry for entry in result.scalars().all()}
+    return [(entries[entry_id], score) for entry_id, score in ranked if entry_id in entries]
 
 
 async def search_knowledge_base(
     session: AsyncSession,
     question: str,
     threshold: float = 0.5,
+    trace: SearchTrace | None = None,
+    engine: str | None = None,
+    semantic: bool | None = None,
+    spelling: bool | None = None,
 ) -> KnowledgeBase | None:
-    """Поиск ответа в базе знаний по вопросу."""
-    keywords = extract_keywords(question)
-    if not keywords:
+    """Поиск ответа в базе знаний по вопросу.
+
+    trace — отладка (/api/knowledge/debug): этапы замеряются, кэш ответов
+    и счётчик использования не затрагиваются.
+    engine, semantic, spelling — движок и этапы поиска вместо KB_SEARCH_ENGINE,
+    KB_SEMANTIC_ENABLED и KB_SPELLING_ENABLED (None — из настроек).
+    """
+    trace = trace or NO_TRACE
+    engine = engine or settings.kb_search_engine
+    semantic = settings.kb_semantic_enabled if semantic is None else semantic
+
+    with trace.stage("tokenize"):
+        keywords, tokens = await question_terms(session, question)
+        query_tokens = await _query_tokens(session, question, tokens, spelling) if tokens else set()
+    trace.record("keywords", keywords.split())
+    trace.record("tokens", sorted(query_tokens))
+    if not tokens:
         return None
 
-    keyword_list = keywords.split()
-    # Также нормализуем ключевые слова вопроса
-    normalized_question_keywords = set(normalize_word(w) for w in keyword_list)
+    if trace.enabled:
+        match = await _find_best_match(session, keywords, query_tokens, threshold, engine, semantic, trace)
+    else:
+        # Повторные вопросы с тем же набором слов берём из кэша. Второй этап
+        # сравнивает ключевые слова как написаны, поэтому при нём они тоже в ключе
+        semantic_keywords = keywords if semantic else None
+        cache_key = (' '.join(sorted(query_tokens)), threshold, engine, semantic_keywords)
+        version = knowledge_index.version
+        match = answer_cache.get(cache_key, version)
+        if match is CACHE_MISS:
+            match = await _find_best_match(session, keywords, query_tokens, threshold, engine, semantic)
+            answer_cache.put(cache_key, match, version)
+
+    trace.record("match", match)
+    if match is None:
+        return None
+
+    best_id, best_score, stage = match
+    with trace.stage("fetch"):
+        best_match = await session.get(KnowledgeBase, best_id)
+
+    if best_match and not trace.enabled:
+        logger.info(f"Найдено в базе знаний ({stage}, score={best_score:.2f}): '{best_match.question[:50]}...'")
+        # Счётчик использования пишется в БД пачкой в фоне
+        record_knowledge_hit(best_match.id)
+
+    return best_match
 
-    # Получаем все активные записи
-    result = await session.execute(
-        select(KnowledgeBase).where(KnowledgeBase.is_active == True)
-    )
-    entries = list(result.scalars().all())
 
-    if not entries:
+async def _find_best_match(
+    session: AsyncSession,
+    keywords: str,
+    query_tokens: set[str],
+    threshold: float,
+    engine: str,
+    semantic: bool,
+    trace: SearchTrace = NO_TRACE,
+) -> tuple[int, float, str] | None:
+    """Лучшая запись выше порога: (id, score, этап) или None."""
+    ranked = await _rank_entry_ids(session, query_tokens, limit=trace.top_k, engine=engine, trace=trace)
+    trace.record("candidates", ranked)
+    if ranked and ranked[0][1] >= threshold:
+        return (*ranked[0], "keywords")
+
+    if not semantic:
         return None
 
-    # Поиск по совпадению ключевых слов с нормализацией
-    best_match = None
-    best_score = 0
+    # Второй этап: другие формы слов и опечатки по символьным n-граммам
+    if not knowledge_index.loaded:
+        with trace.stage("index_load"):
+            await knowledge_index.load(session)
 
-    for entry in entries:
-        if not entry.keywords:
-            continue
+    with trace.stage("semantic"):
+        ranked = knowledge_index.semantic.search(keywords, limit=trace.top_k)
+    trace.record("semantic_candidates", ranked)
+    if ranked and ranked[0][1] >= settings.kb_semantic_threshold:
+        return (*ranked[0], "semantic")
 
-        entry_keywords = set(entry.keywords.split())
-        # Нормализуем ключевые слова записи
-        normalized_entry_keywords = set(normalize_word(w) for w in entry_keywords)
+    return None
 
-        # Считаем пересечение нормализованных слов
-        common = normalized_entry_keywords.intersection(normalized_question_keywords)
 
-        # Также проверяем частичное совпадение (начало слова)
-        for eq in normalized_entry_keywords:
-            for qq in normalized_question_keywords:
-                if eq not in common and qq not in common:
-                    # Проверяем совпадение начала слова (минимум 4 буквы)
-                    if len(eq) >= 4 and len(qq) >= 4:
-                        if eq.startswith(qq[:4]) or qq.startswith(eq[:4]):
-                            common.add(eq)
+async def _query_tokens(
+    session: AsyncSession,
+    question: str,
+    tokens: str,
+    spelling: bool | None = None,
+) -> set[str]:
+    """Слова вопроса, нормализованные так же, как записи в KnowledgeBase.tokens."""
+    if spelling is None:
+        spelling = settings.kb_spelling_enabled
+    if not spelling:
+        return set(tokens.split())
+
+    # Опечатки и транслит исправляются по словарю индекса
+    if not knowledge_index.loaded:
+        await knowledge_index.load(session)
+    return correct_query_tokens(synonyms.apply(question), knowledge_index.spelling)
+
+
+async def _rank_entry_ids(
+    session: AsyncSession,
+    normalized_question_keywords: set[str],
+    limit: int,
+    engine: str | None = None,
+    trace: SearchTrace = NO_TRACE,
+) -> list[tuple[int, float]]:
+    engine = engine or settings.kb_search_engine
+    trace.record("engine", engine)
+    if engine == ENGINE_POSTGRES:
+        return await rank_postgres(
+            session, normalized_question_keywords, limit, candidates=settings.kb_fts_candidates, trace=trace
+        )
+
+    # Индекс строится при старте; если его ещё нет — строим сейчас
+    if not knowledge_index.loaded:
+        with trace.stage("index_load"):
+            await knowledge_index.load(session)
+
+    return knowledge_index.rank(
+        normalized_question_keywords,
+        engine=engine,
+        limit=limit,
+        k1=settings.kb_bm25_k1,
+        b=settings.kb_bm25_b,
+        trace=trace,
+    )
 
-        if not normalized_entry_keywords:
-            continue
 
-        score = len(common) / max(len(normalized_entry_keywords), len(normalized_question_keywords))
+async def reindex_knowledge_base(
+    session: AsyncSession,
+    batch_size: int = 500,
+) -> int:
+    """Пересчитать keywords и tokens у всех записей (после изменения стеммера, стоп-слов или синонимов).
+
+    Записи обрабатываются пачками по id, каждая пачка — одним UPDATE.
+    Возвращает количество обработанных записей.
+    """
+    # Синонимы могли измениться — применяем свежий словарь ко всему корпусу
+    await synonyms.load(session)
+
+    total = 0
+    last_id = 0
+    while True:
+        result = await session.execute(
+            select(KnowledgeBase.id, KnowledgeBase.question)
+            .where(KnowledgeBase.id > last_id)
+            .order_by(KnowledgeBase.id)
+            .limit(batch_size)
+        )
+        rows = result.all()
+        if not rows:
+            break
 
-        if score > best_score and score >= threshold:
-            best_score = score
-            best_match = entry
+        params = []
+        for entry_id, question in rows:
+            keywords, tokens = _question_terms(question)
+            params.append({"id": entry_id, "keywords": keywords, "tokens": tokens})
 
-    if best_match:
-        logger.info(f"Найдено в базе знаний (score={best_score:.2f}): '{best_match.question[:50]}...'")
-        # Увеличиваем счётчик использования
-        best_match.times_used += 1
+        await session.execute(update(KnowledgeBase), params)
         await session.commit()
 
-    return best_match
+        total += len(rows)
+        last_id = rows[-1][0]
+        logger.info(f"Переиндексация базы знаний: {total} записей")
+
+    await on_corpus_changed(session)
+    return total
+
+
+# Ключ advisory-блокировки PostgreSQL для переиндексации при старте
+REINDEX_LOCK_KEY = 7_340_009
+
+
+async def reindex_missing_tokens(session: AsyncSession) -> int:
+    """Переиндексировать базу знаний, если у записей нет tokens (после миграции 009).
+
+    Без этого индекс вычисляет tokens из keywords, посчитанных прежней
+    версией токенизатора, и английские слова перестают совпадать с
+    вопросами. Возвращает количество обработанных записей (0 — не нужно).
+
+    Вызывается при старте каждого uvicorn worker. В PostgreSQL проверка и
+    переиндексация идут под advisory-блокировкой: работает первый worker,
+    остальные ждут его и видят, что tokens уже заполнены. Блокировка
+    держится на отдельном соединении — сессия коммитит пачки и
+    возвращает своё соединение в пул.
+    """
+    if not is_postgres():
+        return await _reindex_missing_tokens(session)
+
+    async with session.bind.connect() as lock_conn:
+        await lock_conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": REINDEX_LOCK_KEY})
+        try:
+            return await _reindex_missing_tokens(session)
+        finally:
+            await lock_conn.execute(
+                text("SELECT pg_advisory_unlock(:key)"), {"key": REINDEX_LOCK_KEY}
+            )
+
+
+async def _reindex_missing_tokens(session: AsyncSession) -> int:
+    result = await session.execute(
+        select(KnowledgeBase.id).where(KnowledgeBase.tokens.is_(None)).limit(1)
+    )
+    if result.first() is None:
+        return 0
+    logger.info("У записей базы знаний нет tokens — переиндексация")
+    return await reindex_knowledge_base(session)
+
+
+class KnowledgeImportError(ValueError):
+    """Файл импорта не дочитан; imported записей до ошибки уже сохранены."""
+
+    def __init__(self, message: str, imported: int):
+        super().__init__(message)
+        self.imported = imported
+
+
+async def import_knowledge_entries(
+    session: AsyncSession,
+    rows: AsyncIterable[dict | None] | Iterable[dict | None],
+    operator_id: int | None = None,
+    batch_size: int = 500,
+) -> tuple[int, list[str]]:
+    """Массовый импорт пар вопрос-ответ.
+
+    rows читается лениво; ключевые слова считаются и записи вставляются
+    пачками (один многострочный INSERT на пачку). Строка None или не-объект
+    (например, битая строка NDJSON) пропускается. Возвращает количество
+    добавленных записей и описания пропущенных строк.
+
+    Пачки коммитятся по мере чтения. Если файл не удаётся дочитать,
+    поднимается KnowledgeImportError с числом уже сохранённых записей, а
+    индексы всё равно перестраиваются — сохранённое сразу доступно поиску.
+    """
+    imported = 0
+    errors: list[str] = []
+    batch: list[dict] = []
+    if not synonyms.loaded:
+        await synonyms.load(session)
+
+    async def insert_batch():
+        nonlocal imported
+        await session.execute(insert(KnowledgeBase), batch)
+        await session.commit()
+        imported += len(batch)
+        batch.clear()
+
+    line_no = 0
+    try:
+        async for row in _aiter(rows):
+            line_no += 1
+            if not isinstance(row, dict):
+                errors.append(f"Строка {line_no}: нужен JSON-объект с question и answer")
+                continue
+            question = (row.get("question") or "").strip()
+            answer = (row.get("answer") or "").strip()
+            if not question or not answer:
+                errors.append(f"Строка {line_no}: нужны question и answer")
+                continue
+
+            keywords, tokens = _question_terms(question)
+            batch.append({
+                "question": question,
+                "answer": answer,
+                "keywords": keywords,
+                "tokens": tokens,
+                "added_by_id": operator_id,
+                "is_active": _parse_bool(row.get("is_active"), default=True),
+                "times_used": 0,
+            })
+
+            if len(batch) >= batch_size:
+                await insert_batch()
+                logger.info(f"Импорт базы знаний: {imported} записей")
+
+        if batch:
+            await insert_batch()
+    except (ValueError, csv.Error) as e:
+        raise KnowledgeImportError(f"строка {line_no + 1}: {e}", imported) from e
+    finally:
+        if imported:
+            # Уже сохранённые пачки должны попасть в индексы всех процессов, даже при ошибке
+            await session.rollback()
+            await on_corpus_changed(session)
+
+    logger.info(f"Импорт базы знаний завершён: {imported} добавлено, {len(errors)} пропущено")
+    return imported, errors
+
+
+async def _aiter(rows):
+    if hasattr(rows, "__aiter__"):
+        async for row in rows:
+            yield row
+    else:
+        for row in rows:
+            yield row
+
+
+def _parse_bool(value, default: bool) -> bool:
+    if value is None or value == "":
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() not in ("false", "0", "no", "нет")
+
+
+async def iter_knowledge_entries(
+    session: AsyncSession,
+    batch_size: int = 500,
+) -> AsyncIterator[KnowledgeBase]:
+    """Все записи базы знаний по порядку id через серверный курсор."""
+    result = await session.stream_scalars(
+        select(KnowledgeBase)
+        .order_by(KnowledgeBase.id)
+        .execution_options(yield_per=batch_size)
+    )
+    async for entry in result:
+        yield entry
 
 
 async def get_last_qa_pair(
@@ -189,63 +539,65 @@ async def get_all_knowledge_entries(
     return list(result.scalars().all())
 
 
+# Слова указывающие на ЛИЧНЫЙ запрос (НЕ сохранять)
+PERSONAL_INDICATORS = [
+    # Запись/бронирование
+    'запиши', 'запишите', 'записать', 'забронируй', 'забронировать',
+    'бронь', 'хочу записаться', 'можно записаться',
+    # Даты и время
+    'на завтра', 'на сегодня', 'на послезавтра', 'на выходные',
+    'на понедельник', 'на вторник', 'на среду', 'на четверг',
+    'на пятницу', 'на субботу', 'на воскресенье',
+    'в понедельник', 'в воскресенье',
+    'на утро', 'на вечер', 'на день', 'днём', 'утром', 'вечером',
+    'на 1', 'на 2', 'на 3', 'на 4', 'на 5', 'на 6', 'на 7', 'на 8',
+    'на 9', 'на 10', 'на 11', 'на 12',
+    ':00', ':30', 'часов', 'час дня', 'часа',
+    # Личные данные
+    'меня зовут', 'мой номер', 'мой телефон', 'перезвоните',
+    'я буду', 'мы придём', 'нас будет', 'человек',
+    # Подтверждения
+    'спасибо', 'хорошо', 'ок', 'понял', 'ясно', 'отлично',
+    'да', 'нет', 'рахмат', 'thanks',
+]
+
+# Слова указывающие на ОБЩИЙ вопрос (сохранять)
+GENERAL_INDICATORS = [
+    # Цены
+    'сколько стоит', 'какая цена', 'прайс', 'стоимость', 'цены',
+    'почём', 'во сколько обойдётся',
+    # Информация
+    'где находитесь', 'где вы', 'адрес', 'как добраться', 'как доехать',
+    'режим работы', 'во сколько открываетесь', 'до скольки работаете',
+    'когда работаете', 'график работы', 'выходные',
+    # Услуги
+    'какие есть', 'что есть', 'что включает', 'что входит',
+    'расскажите про', 'расскажи про', 'что такое',
+    'чем отличается', 'в чём разница', 'какая разница',
+    # Условия
+    'можно ли', 'есть ли', 'а есть',
+    'с детьми', 'для детей', 'для взрослых',
+    'скидки', 'акции',
+    # Конкретные услуги
+    'мастер-класс', 'мастер класс', 'свидание', 'vip', 'silver',
+    'курс', 'курсы', 'отель', 'номер', 'аренда',
+]
+
+# Оба списка собраны в один автомат — проверка за один проход по тексту
+auto_save_matcher = PhraseMatcher({
+    "personal": PERSONAL_INDICATORS,
+    "general": GENERAL_INDICATORS,
+})
+
+
 def should_auto_save_to_knowledge(question: str) -> bool:
     """Определить, стоит ли автоматически сохранять вопрос в базу знаний."""
-    question_lower = question.lower()
-
-    # Слова указывающие на ЛИЧНЫЙ запрос (НЕ сохранять)
-    personal_indicators = [
-        # Запись/бронирование
-        'запиши', 'запишите', 'записать', 'забронируй', 'забронировать',
-        'бронь', 'хочу записаться', 'можно записаться',
-        # Даты и время
-        'на завтра', 'на сегодня', 'на послезавтра', 'на выходные',
-        'на понедельник', 'на вторник', 'на среду', 'на четверг',
-        'на пятницу', 'на субботу', 'на воскресенье',
-        'в понедельник', 'в воскресенье',
-        'на утро', 'на вечер', 'на день', 'днём', 'утром', 'вечером',
-        'на 1', 'на 2', 'на 3', 'на 4', 'на 5', 'на 6', 'на 7', 'на 8',
-        'на 9', 'на 10', 'на 11', 'на 12',
-        ':00', ':30', 'часов', 'час дня', 'часа',
-        # Личные данные
-        'меня зовут', 'мой номер', 'мой телефон', 'перезвоните',
-        'я буду', 'мы придём', 'нас будет', 'человек',
-        # Подтверждения
-        'спасибо', 'хорошо', 'ок', 'понял', 'ясно', 'отлично',
-        'да', 'нет', 'рахмат', 'thanks',
-    ]
-
-    # Слова указывающие на ОБЩИЙ вопрос (сохранять)
-    general_indicators = [
-        # Цены
-        'сколько стоит', 'какая цена', 'прайс', 'стоимость', 'цены',
-        'почём', 'во сколько обойдётся',
-        # Информация
-        'где находитесь', 'где вы', 'адрес', 'как добраться', 'как доехать',
-        'режим работы', 'во сколько открываетесь', 'до скольки работаете',
-        'когда работаете', 'график работы', 'выходные',
-        # Услуги
-        'какие есть', 'что есть', 'что включает', 'что входит',
-        'расскажите про', 'расскажи про', 'что такое',
-        'чем отличается', 'в чём разница', 'какая разница',
-        # Условия
-        'можно ли', 'есть ли', 'а есть',
-        'с детьми', 'для детей', 'для взрослых',
-        'скидки', 'акции',
-        # Конкретные услуги
-        'мастер-класс', 'мастер класс', 'свидание', 'vip', 'silver',
-        'курс', 'курсы', 'отель', 'номер', 'аренда',
-    ]
-
-    # Проверяем на личные индикаторы
-    for indicator in personal_indicators:
-        if indicator in question_lower:
-            return False
-
-    # Проверяем на общие индикаторы
-    for indicator in general_indicators:
-        if indicator in question_lower:
-            return True
-
-    # По умолчанию не сохраняем (лучше пропустить, чем засорить)
-    return False
+    found = auto_save_matcher.find(question.lower())
+
+    # Личный запрос — не сохраняем
+    if "personal" in found:
+        logger.debug(f"Не сохраняем в базу знаний (личный запрос): {sorted(found['personal'])}")
+        return False
+
+    # Общий вопрос — сохраняем; по умолчанию не сохраняем (лучше пропустить, чем засорить)
+    return "general" in found
@@ -0,0 +1,71 @@
+# Кэш ответов базы знаний для повторяющихся вопросов
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+from app.core.config import settings
+
+# Отличает «нет в кэше» от закэшированного «ответа нет» (None)
+CACHE_MISS = object()
+
+
+class AnswerCache:
+    """LRU-кэш с временем жизни записей.
+
+    Ключ — нормализованный набор слов вопроса, порог и движок поиска (при
+    включённом втором этапе — ещё и ключевые слова как написаны), значение — найденная запись
+    или None («в базе знаний ответа нет»). Каждое значение помечено версией
+    корпуса; при смене версии кэш сбрасывается целиком.
+    """
+
+    def __init__(self, maxsize: int = 1000, ttl: float = 600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._version: int | None = None
+        self._items: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Hashable, version: int) -> Any:
+        if version != self._version:
+            self._items.clear()
+            self._version = version
+
+        item = self._items.get(key)
+        if item is None or item[0] < time.monotonic():
+            if item is not None:
+                del self._items[key]
+            self.misses += 1
+            return CACHE_MISS
+
+        self._items.move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    def put(self, key: Hashable, value: Any, version: int):
+        # Корпус изменился, пока искали ответ — результат уже устарел
+        if version != self._version:
+            return
+
+        self._items[key] = (time.monotonic() + self.ttl, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def clear(self):
+        self._items.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._items),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+answer_cache = AnswerCache(
+    maxsize=settings.kb_cache_size,
+    ttl=settings.kb_cache_ttl,
+)
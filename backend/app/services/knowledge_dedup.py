@@ -0,0 +1,146 @@
+# Поиск почти одинаковых вопросов в базе знаний (MinHash + LSH)
+import random
+import zlib
+from itertools import combinations
+
+# Параметры MinHash/LSH: 16 полос по 4 хеша — кандидатами становятся пары
+# с похожестью примерно от 0.5, дальше похожесть считается точно по n-граммам
+NUM_HASHES = 64
+BANDS = 16
+ROWS = NUM_HASHES // BANDS
+SHINGLE_SIZE = 4
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20240101)  # фиксированные коэффициенты — подписи стабильны между запусками
+_COEFFICIENTS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_HASHES)]
+
+Signature = tuple[int, ...]
+
+
+def shingles(tokens: set[str]) -> set[int]:
+    """Хеши символьных 4-грамм по нормализованным словам вопроса."""
+    text = " ".join(sorted(tokens))
+    if len(text) <= SHINGLE_SIZE:
+        return {zlib.crc32(text.encode())} if text else set()
+    return {
+        zlib.crc32(text[i:i + SHINGLE_SIZE].encode())
+        for i in range(len(text) - SHINGLE_SIZE + 1)
+    }
+
+
+def minhash(tokens: set[str]) -> Signature | None:
+    values = shingles(tokens)
+    if not values:
+        return None
+    return _signature(values)
+
+
+def _signature(values: set[int]) -> Signature:
+    return tuple(min((a * v + b) % _PRIME for v in values) for a, b in _COEFFICIENTS)
+
+
+def jaccard(first: set[int], second: set[int]) -> float:
+    """Точный коэффициент Жаккара двух множеств n-грамм."""
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+
+class DuplicateDetector:
+    """LSH-индекс подписей записей: поиск дублей для одной записи и кластеры по всем.
+
+    Подписи только отбирают кандидатов; решение принимается по точному
+    Жаккару n-грамм (оценка по 64 хешам ошибается на ±0.06 и пропускала бы
+    пары с похожестью около 0.7 при пороге 0.8).
+    """
+
+    def __init__(self):
+        self._signatures: dict[int, Signature] = {}
+        self._shingles: dict[int, set[int]] = {}
+        self._bands: list[dict[Signature, set[int]]] = [{} for _ in range(BANDS)]
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def clear(self):
+        self._signatures.clear()
+        self._shingles.clear()
+        for band in self._bands:
+            band.clear()
+
+    def add(self, entry_id: int, tokens: set[str]):
+        self.remove(entry_id)
+        values = shingles(tokens)
+        if not values:
+            return
+        signature = _signature(values)
+        self._signatures[entry_id] = signature
+        self._shingles[entry_id] = values
+        for band, key in zip(self._bands, _band_keys(signature)):
+            band.setdefault(key, set()).add(entry_id)
+
+    def remove(self, entry_id: int):
+        signature = self._signatures.pop(entry_id, None)
+        if signature is None:
+            return
+        del self._shingles[entry_id]
+        for band, key in zip(self._bands, _band_keys(signature)):
+            ids = band.get(key)
+            if ids is not None:
+                ids.discard(entry_id)
+                if not ids:
+                    del band[key]
+
+    def find(self, tokens: set[str], threshold: float) -> list[tuple[int, float]]:
+        """Записи, похожие на вопрос: [(id, похожесть)] по убыванию."""
+        values = shingles(tokens)
+        if not values:
+            return []
+
+        candidates: set[int] = set()
+        for band, key in zip(self._bands, _band_keys(_signature(values))):
+            candidates.update(band.get(key, ()))
+
+        found = []
+        for entry_id in candidates:
+            score = jaccard(values, self._shingles[entry_id])
+            if score >= threshold:
+                found.append((entry_id, score))
+        found.sort(key=lambda item: (-item[1], item[0]))
+        return found
+
+    def clusters(self, threshold: float) -> list[list[int]]:
+        """Группы записей-дублей (размером от 2), связанные похожестью >= threshold."""
+        parent: dict[int, int] = {}
+
+        def root(entry_id: int) -> int:
+            while parent.get(entry_id, entry_id) != entry_id:
+                entry_id = parent[entry_id]
+            return entry_id
+
+        checked: set[tuple[int, int]] = set()
+        for band in self._bands:
+            for ids in band.values():
+                if len(ids) < 2:
+                    continue
+                for first, second in combinations(sorted(ids), 2):
+                    if (first, second) in checked:
+                        continue
+                    checked.add((first, second))
+                    if jaccard(self._shingles[first], self._shingles[second]) >= threshold:
+                        first_root, second_root = root(first), root(second)
+                        if first_root != second_root:
+                            parent[second_root] = first_root
+
+        groups: dict[int, list[int]] = {}
+        for entry_id in parent:
+            groups.setdefault(root(entry_id), []).append(entry_id)
+        for entry_root, members in groups.items():
+            if entry_root not in members:
+                members.append(entry_root)
+        return sorted(sorted(members) for members in groups.values() if len(members) > 1)
+
+
+def _band_keys(signature: Signature):
+    for i in range(BANDS):
+        yield signature[i * ROWS:(i + 1) * ROWS]
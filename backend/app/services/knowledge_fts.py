@@ -0,0 +1,65 @@
+# Полнотекстовый поиск по базе знаний средствами PostgreSQL
+import re
+
+from sqlalchemy import func, literal_column, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models.models import KnowledgeBase
+from app.services.knowledge_index import (
+    entry_tokens,
+    overlap_score,
+    prefix_buckets,
+    top_scores,
+)
+from app.services.knowledge_trace import NO_TRACE, SearchTrace
+
+# Генерируемая колонка из миграции 007 (в модели не объявлена — только для PostgreSQL)
+search_vector = literal_column("knowledge_base.search_vector")
+
+_non_word_re = re.compile(r"\W+")
+
+
+def build_tsquery(query_tokens: set[str]) -> str:
+    """tsquery вида 'слово:* | слово:*' — совпадение по началу любого из слов."""
+    words = set()
+    for token in query_tokens:
+        words.update(w for w in _non_word_re.split(token) if w)
+    return " | ".join(f"{w}:*" for w in sorted(words))
+
+
+async def rank_postgres(
+    session: AsyncSession,
+    query_tokens: set[str],
+    limit: int,
+    candidates: int = 50,
+    trace: SearchTrace = NO_TRACE,
+) -> list[tuple[int, float]]:
+    """Отобрать кандидатов через GIN-индекс (ts_rank) и оценить их как overlap."""
+    tsquery_text = build_tsquery(query_tokens)
+    if not tsquery_text:
+        return []
+
+    tsquery = func.to_tsquery("simple", tsquery_text)
+    with trace.stage("candidates"):
+        result = await session.execute(
+            select(KnowledgeBase.id, KnowledgeBase.tokens, KnowledgeBase.keywords)
+            .where(
+                KnowledgeBase.is_active == True,
+                search_vector.op("@@")(tsquery),
+            )
+            .order_by(func.ts_rank(search_vector, tsquery).desc())
+            .limit(candidates)
+        )
+        rows = result.all()
+    trace.record("candidate_count", len(rows))
+
+    with trace.stage("scoring"):
+        query_prefixes = prefix_buckets(query_tokens)
+        scores = {}
+        for entry_id, tokens, keywords in rows:
+            normalized = entry_tokens(tokens, keywords)
+            if normalized:
+                scores[entry_id] = overlap_score(
+                    normalized, prefix_buckets(normalized), query_tokens, query_prefixes
+                )
+        return top_scores(scores, limit)
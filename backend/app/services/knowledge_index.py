@@ -0,0 +1,263 @@
+# Индекс базы знаний в памяти процесса
+import heapq
+import logging
+import math
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.models.models import KnowledgeBase
+from app.services.knowledge_dedup import DuplicateDetector
+from app.services.knowledge_semantic import SemanticIndex
+from app.services.knowledge_spelling import SpellingIndex
+from app.services.knowledge_synonyms import synonyms
+from app.services.knowledge_trace import NO_TRACE, SearchTrace
+from app.services.tokenizer import normalize_keywords
+
+logger = logging.getLogger(__name__)
+
+# Длина префикса для частичного совпадения слов
+PREFIX_LENGTH = 4
+
+# Движки ранжирования
+ENGINE_OVERLAP = "overlap"    # доля совпавших слов (исходный алгоритм)
+ENGINE_BM25 = "bm25"          # BM25 по инвертированному индексу
+ENGINE_POSTGRES = "postgres"  # полнотекстовый поиск PostgreSQL (без индекса в памяти)
+
+
+def entry_tokens(tokens: str | None, keywords: str | None = None) -> set[str]:
+    """Нормализованные слова записи базы знаний.
+
+    Обычно берутся из KnowledgeBase.tokens; для записей, которые ещё не
+    переиндексированы, вычисляются из keywords.
+    """
+    if tokens is not None:
+        return set(tokens.split())
+    if not keywords:
+        return set()
+    return set(normalize_keywords(keywords).split())
+
+
+def prefix_buckets(tokens: set[str]) -> dict[str, set[str]]:
+    """Сгруппировать слова по первым PREFIX_LENGTH буквам (короткие слова не участвуют)."""
+    buckets: dict[str, set[str]] = {}
+    for token in tokens:
+        if len(token) >= PREFIX_LENGTH:
+            buckets.setdefault(token[:PREFIX_LENGTH], set()).add(token)
+    return buckets
+
+
+def overlap_score(
+    tokens: set[str],
+    token_prefixes: dict[str, set[str]],
+    query_tokens: set[str],
+    query_prefixes: dict[str, set[str]],
+) -> float:
+    """Доля совпавших слов: точные совпадения плюс совпадения по префиксу.
+
+    Слово записи засчитывается по префиксу, если его нет среди слов вопроса,
+    а в вопросе есть слово с тем же префиксом, которого нет в записи.
+    """
+    common = len(tokens & query_tokens)
+    for prefix, entry_words in token_prefixes.items():
+        query_words = query_prefixes.get(prefix)
+        if query_words and not query_words <= tokens:
+            common += len(entry_words - query_tokens)
+
+    return common / max(len(tokens), len(query_tokens))
+
+
+def top_scores(scores: dict[int, float], limit: int) -> list[tuple[int, float]]:
+    """Лучшие [(id, score)] по убыванию оценки, при равенстве — по id."""
+    ranked = heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))
+    return [item for item in ranked if item[1] > 0]
+
+
+class KnowledgeIndex:
+    """Инвертированный индекс: нормализованное слово -> id записей.
+
+    Строится один раз при старте и обновляется при изменении записей,
+    чтобы при поиске оценивать только записи с общими словами.
+    """
+
+    def __init__(self):
+        self.loaded = False
+        # Версия корпуса: меняется при любом изменении индекса (для сброса кэшей)
+        self.version = 0
+        self._entries: dict[int, set[str]] = {}
+        self._entry_prefixes: dict[int, dict[str, set[str]]] = {}
+        self._tokens: dict[str, set[int]] = {}
+        self._prefixes: dict[str, set[int]] = {}
+        self._total_length = 0
+        # Второй этап: нечёткий поиск по символьным n-граммам
+        self.semantic = SemanticIndex()
+        # Поиск почти одинаковых вопросов при добавлении записей (KB_DEDUP_ON_ADD)
+        self.duplicates = DuplicateDetector()
+        # Словарь слов записей для исправления опечаток и транслита в вопросах
+        self.spelling = SpellingIndex()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def load(self, session: AsyncSession):
+        """Построить индекс по всем активным записям (и перечитать синонимы)."""
+        await synonyms.load(session)
+        result = await session.execute(
+            select(KnowledgeBase.id, KnowledgeBase.tokens, KnowledgeBase.keywords)
+            .where(KnowledgeBase.is_active == True)
+        )
+        self.clear()
+        for entry_id, tokens, keywords in result.all():
+            self._add(entry_id, entry_tokens(tokens, keywords))
+            self.semantic.add(entry_id, keywords)
+            if settings.kb_dedup_on_add:
+                self.duplicates.add(entry_id, self.tokens_of(entry_id))
+        self.loaded = True
+        self.version += 1
+        logger.info(f"Индекс базы знаний построен: {len(self._entries)} записей")
+
+    def clear(self):
+        self._entries.clear()
+        self._entry_prefixes.clear()
+        self._tokens.clear()
+        self._prefixes.clear()
+        self._total_length = 0
+        self.semantic.clear()
+        self.duplicates.clear()
+        self.spelling.clear()
+
+    def upsert(self, entry: KnowledgeBase):
+        """Добавить или обновить запись (неактивные записи убираются)."""
+        self.remove(entry.id)
+        if entry.is_active is not False:
+            self._add(entry.id, entry_tokens(entry.tokens, entry.keywords))
+            self.semantic.add(entry.id, entry.keywords)
+            if settings.kb_dedup_on_add:
+                self.duplicates.add(entry.id, self.tokens_of(entry.id))
+
+    def remove(self, entry_id: int):
+        self.version += 1
+        self.semantic.remove(entry_id)
+        self.duplicates.remove(entry_id)
+        tokens = self._entries.pop(entry_id, None)
+        if tokens is None:
+            return
+        self._entry_prefixes.pop(entry_id, None)
+        self._total_length -= len(tokens)
+        for token in tokens:
+            _discard(self._tokens, token, entry_id)
+            self.spelling.remove(token)
+            if len(token) >= PREFIX_LENGTH:
+                _discard(self._prefixes, token[:PREFIX_LENGTH], entry_id)
+
+    def candidates(self, query_tokens: set[str]) -> list[int]:
+        """id записей, у которых есть общее слово или общий префикс с вопросом."""
+        ids: set[int] = set()
+        for token in query_tokens:
+            ids.update(self._tokens.get(token, ()))
+            if len(token) >= PREFIX_LENGTH:
+                ids.update(self._prefixes.get(token[:PREFIX_LENGTH], ()))
+        return sorted(ids)
+
+    def tokens_of(self, entry_id: int) -> set[str]:
+        return self._entries.get(entry_id, set())
+
+    def overlap_score(
+        self,
+        entry_id: int,
+        query_tokens: set[str],
+        query_prefixes: dict[str, set[str]],
+    ) -> float:
+        tokens = self._entries.get(entry_id)
+        if not tokens:
+            return 0.0
+        return overlap_score(tokens, self._entry_prefixes[entry_id], query_tokens, query_prefixes)
+
+    def bm25_scores(
+        self,
+        query_tokens: set[str],
+        k1: float = 1.2,
+        b: float = 0.75,
+    ) -> dict[int, float]:
+        """BM25 по спискам вхождений: разреженное произведение матрицы на вектор вопроса.
+
+        Слова в записи хранятся множеством, поэтому tf = 1. Оценка делится на сумму idf
+        слов вопроса: 1 — все слова вопроса есть в записи средней длины. У записей
+        короче средней оценка может быть больше 1; rank() ограничивает её единицей,
+        чтобы она сравнивалась с тем же порогом, что и overlap.
+        """
+        n = len(self._entries)
+        if not n or not query_tokens:
+            return {}
+
+        avg_length = self._total_length / n
+        scores: dict[int, float] = {}
+        max_score = 0.0
+        for token in query_tokens:
+            postings = self._tokens.get(token, ())
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            max_score += idf
+            for entry_id in postings:
+                length = len(self._entries[entry_id])
+                weight = idf * (k1 + 1) / (1 + k1 * (1 - b + b * length / avg_length))
+                scores[entry_id] = scores.get(entry_id, 0.0) + weight
+
+        return {entry_id: score / max_score for entry_id, score in scores.items()}
+
+    def rank(
+        self,
+        query_tokens: set[str],
+        engine: str = ENGINE_OVERLAP,
+        limit: int = 5,
+        k1: float = 1.2,
+        b: float = 0.75,
+        trace: SearchTrace = NO_TRACE,
+    ) -> list[tuple[int, float]]:
+        """Лучшие записи для вопроса: [(id, score)] по убыванию оценки, при равенстве — по id."""
+        if engine == ENGINE_BM25:
+            # Кандидаты — списки вхождений слов, они обходятся вместе с подсчётом оценок
+            with trace.stage("scoring"):
+                scores = self.bm25_scores(query_tokens, k1=k1, b=b)
+                # Порядок — по исходной оценке, наружу — не больше 1
+                ranked = [(entry_id, min(score, 1.0)) for entry_id, score in top_scores(scores, limit)]
+        elif engine == ENGINE_OVERLAP:
+            with trace.stage("candidates"):
+                query_prefixes = prefix_buckets(query_tokens)
+                candidates = self.candidates(query_tokens)
+            with trace.stage("scoring"):
+                scores = {
+                    entry_id: self.overlap_score(entry_id, query_tokens, query_prefixes)
+                    for entry_id in candidates
+                }
+                ranked = top_scores(scores, limit)
+        else:
+            raise ValueError(f"Неизвестный движок поиска: {engine}")
+
+        trace.record("candidate_count", len(scores))
+        return ranked
+
+    def _add(self, entry_id: int, tokens: set[str]):
+        if not tokens:
+            return
+        self._entries[entry_id] = tokens
+        self._entry_prefixes[entry_id] = prefix_buckets(tokens)
+        self._total_length += len(tokens)
+        for token in tokens:
+            self._tokens.setdefault(token, set()).add(entry_id)
+            self.spelling.add(token)
+            if len(token) >= PREFIX_LENGTH:
+                self._prefixes.setdefault(token[:PREFIX_LENGTH], set()).add(entry_id)
+
+
+def _discard(index: dict[str, set[int]], key: str, entry_id: int):
+    ids = index.get(key)
+    if ids is None:
+        return
+    ids.discard(entry_id)
+    if not ids:
+        del index[key]
+
+
+# Общий индекс процесса
+knowledge_index = KnowledgeIndex()
@@ -0,0 +1,101 @@
+# Нечёткий поиск по базе знаний: хешированные символьные n-граммы без сети.
+# Сходство здесь орфографическое, а не смысловое: «записаться»/«запись»,
+# «мастеркласс»/«мастер-класс» и опечатки находятся, а перефразированный
+# вопрос с другими словами («во сколько открываетесь» / «режим работы») — нет
+import math
+import zlib
+
+# Длина n-граммы и размер хеш-пространства признаков
+NGRAM_SIZE = 3
+HASH_DIMENSIONS = 1 << 20
+
+# Признаки, которые встречаются больше чем в этой доле записей, не участвуют
+# в отборе кандидатов (слишком общие, только замедляют поиск)
+MAX_FEATURE_SHARE = 0.5
+
+Vector = dict[int, float]
+
+
+def text_vector(keywords: str | None) -> Vector:
+    """Нормированный (L2) вектор хешированных символьных n-грамм ключевых слов."""
+    if not keywords:
+        return {}
+
+    counts: dict[int, int] = {}
+    for word in keywords.split():
+        padded = f" {word} "
+        for i in range(len(padded) - NGRAM_SIZE + 1):
+            feature = zlib.crc32(padded[i:i + NGRAM_SIZE].encode()) % HASH_DIMENSIONS
+            counts[feature] = counts.get(feature, 0) + 1
+
+    norm = math.sqrt(sum(c * c for c in counts.values()))
+    return {feature: c / norm for feature, c in counts.items()}
+
+
+class SemanticIndex:
+    """Приближённый поиск ближайших соседей по косинусу.
+
+    Векторы записей хранятся в инвертированных списках по признакам. Кандидаты
+    отбираются только по редким признакам вопроса, затем точный косинус
+    считается для ограниченного числа лучших кандидатов.
+    """
+
+    def __init__(self, max_candidates: int = 100):
+        self.max_candidates = max_candidates
+        self._vectors: dict[int, Vector] = {}
+        self._postings: dict[int, set[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._vectors)
+
+    def clear(self):
+        self._vectors.clear()
+        self._postings.clear()
+
+    def add(self, entry_id: int, keywords: str | None):
+        self.remove(entry_id)
+        vector = text_vector(keywords)
+        if not vector:
+            return
+        self._vectors[entry_id] = vector
+        for feature in vector:
+            self._postings.setdefault(feature, set()).add(entry_id)
+
+    def remove(self, entry_id: int):
+        vector = self._vectors.pop(entry_id, None)
+        if vector is None:
+            return
+        for feature in vector:
+            ids = self._postings.get(feature)
+            if ids is not None:
+                ids.discard(entry_id)
+                if not ids:
+                    del self._postings[feature]
+
+    def search(self, keywords: str, limit: int = 5) -> list[tuple[int, float]]:
+        """Ближайшие записи: [(id, косинус)] по убыванию."""
+        query = text_vector(keywords)
+        if not query or not self._vectors:
+            return []
+
+        # Отбор кандидатов по частичному скалярному произведению на редких признаках
+        max_postings = max(1, int(len(self._vectors) * MAX_FEATURE_SHARE))
+        partial: dict[int, float] = {}
+        for feature, weight in query.items():
+            ids = self._postings.get(feature)
+            if not ids or len(ids) > max_postings:
+                continue
+            for entry_id in ids:
+                partial[entry_id] = partial.get(entry_id, 0.0) + weight * self._vectors[entry_id][feature]
+
+        candidates = sorted(partial, key=partial.get, reverse=True)[:self.max_candidates]
+
+        # Точный косинус для кандидатов (векторы уже нормированы)
+        scores = []
+        for entry_id in candidates:
+            vector = self._vectors[entry_id]
+            score = sum(weight * vector.get(feature, 0.0) for feature, weight in query.items())
+            scores.append((entry_id, score))
+
+        scores.sort(key=lambda item: (-item[1], item[0]))
+        return scores[:limit]
@@ -0,0 +1,211 @@
+# Исправление опечаток и транслита в вопросах к базе знаний (SymSpell)
+from app.db.models.models import Language
+from app.services.tokenizer import KY_STOP_WORDS, STOP_WORDS, is_latin, split_words, transliterate, word_token
+
+# Опечатки исправляются только в словах не короче MIN_WORD_LENGTH букв:
+# до LONG_WORD_LENGTH допускается одна ошибка, дальше — MAX_DISTANCE
+MIN_WORD_LENGTH = 5
+LONG_WORD_LENGTH = 9
+MAX_DISTANCE = 2
+
+# Удаления считаются только по началу слова: словарь остаётся компактным,
+# а окончательное решение принимает точное расстояние
+PREFIX_LENGTH = 7
+
+# Сколько исправлений помнить (сбрасываются при изменении словаря)
+CORRECTIONS_CACHE_SIZE = 10_000
+
+
+def allowed_distance(word: str) -> int:
+    """Сколько ошибок допускается в слове такой длины."""
+    if len(word) < MIN_WORD_LENGTH:
+        return 0
+    return 1 if len(word) < LONG_WORD_LENGTH else MAX_DISTANCE
+
+
+def edit_distance(first: str, second: str, max_distance: int) -> int:
+    """Расстояние Дамерау–Левенштейна (с перестановкой соседних букв).
+
+    Если оно больше max_distance, возвращается max_distance + 1.
+    """
+    if abs(len(first) - len(second)) > max_distance:
+        return max_distance + 1
+
+    previous_row = None
+    row = list(range(len(second) + 1))
+    for i in range(1, len(first) + 1):
+        before_previous, previous_row = previous_row, row
+        row = [i] + [0] * len(second)
+        for j in range(1, len(second) + 1):
+            cost = first[i - 1] != second[j - 1]
+            row[j] = min(previous_row[j] + 1, row[j - 1] + 1, previous_row[j - 1] + cost)
+            if (
+                before_previous is not None and j > 1
+                and first[i - 1] == second[j - 2] and first[i - 2] == second[j - 1]
+            ):
+                row[j] = min(row[j], before_previous[j - 2] + 1)
+        if min(row) > max_distance:
+            return max_distance + 1
+
+    return min(row[-1], max_distance + 1)
+
+
+def deletes(word: str, distance: int) -> set[str]:
+    """Все варианты слова без 1..distance букв."""
+    result: set[str] = set()
+    level = {word}
+    for _ in range(distance):
+        level = {variant[:i] + variant[i + 1:] for variant in level for i in range(len(variant))}
+        result |= level
+    return result
+
+
+class SpellingIndex:
+    """Словарь удалений SymSpell: вариант без 1–2 букв -> слова словаря.
+
+    Для слова вопроса строятся его удаления (их число зависит только от длины
+    слова), и кандидаты берутся из словаря по ключу — без перебора всех слов.
+    Частота слова — число записей, в которых оно встречается.
+    """
+
+    def __init__(self, max_distance: int = MAX_DISTANCE):
+        self.max_distance = max_distance
+        self._counts: dict[str, int] = {}
+        self._deletes: dict[str, set[str]] = {}
+        self._corrections: dict[str, str | None] = {}
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def __contains__(self, word: str) -> bool:
+        return word in self._counts
+
+    def clear(self):
+        self._counts.clear()
+        self._deletes.clear()
+        self._corrections.clear()
+
+    def add(self, word: str):
+        count = self._counts.get(word, 0)
+        self._counts[word] = count + 1
+        if count:
+            return
+        self._corrections.clear()
+        for key in self._keys(word):
+            self._deletes.setdefault(key, set()).add(word)
+
+    def remove(self, word: str):
+        count = self._counts.get(word)
+        if count is None:
+            return
+        if count > 1:
+            self._counts[word] = count - 1
+            return
+        del self._counts[word]
+        self._corrections.clear()
+        for key in self._keys(word):
+            words = self._deletes.get(key)
+            if words is not None:
+                words.discard(word)
+                if not words:
+                    del self._deletes[key]
+
+    def correct(self, word: str) -> str | None:
+        """Ближайшее слово словаря (само слово, если оно есть) или None.
+
+        При равном расстоянии выбирается более частое слово, затем — по алфавиту.
+        """
+        if word in self._counts:
+            return word
+        if word in self._corrections:
+            return self._corrections[word]
+
+        if len(self._corrections) >= CORRECTIONS_CACHE_SIZE:
+            self._corrections.clear()
+        correction = self._corrections[word] = self._lookup(word)
+        return correction
+
+    def _lookup(self, word: str) -> str | None:
+        max_distance = min(allowed_distance(word), self.max_distance)
+        if not max_distance:
+            return None
+
+        prefix = word[:PREFIX_LENGTH]
+        candidates: set[str] = set()
+        for key in deletes(prefix, max_distance) | {prefix}:
+            candidates.update(self._deletes.get(key, ()))
+
+        best = None
+        best_rank = None
+        for candidate in candidates:
+            distance = edit_distance(word, candidate, max_distance)
+            if distance > max_distance:
+                continue
+            rank = (distance, -self._counts[candidate], candidate)
+            if best_rank is None or rank < best_rank:
+                best, best_rank = candidate, rank
+        return best
+
+    def _keys(self, word: str) -> set[str]:
+        prefix = word[:PREFIX_LENGTH]
+        return deletes(prefix, self.max_distance) | {prefix}
+
+
+# Различия, которые теряются в транслите: мягкий знак, э/е, й/ы/и
+_TRANSLIT_LOSSES = str.maketrans({'ь': None, 'ъ': None, 'э': 'е', 'ё': 'е', 'й': 'и', 'ы': 'и'})
+
+
+def translit_key(word: str) -> str:
+    """Кириллическое слово без различий, которых нет в транслите («есть», «эст» -> «ест»)."""
+    return word.translate(_TRANSLIT_LOSSES)
+
+
+# Стоп-слова сверяются только по ключу транслита, без исправления опечаток:
+# на расстоянии одной буквы от них лежат обычные слова («budget» -> «будгет»
+# ~ «будет», «kakao» -> «какао» ~ «какая»), и они не должны отбрасываться
+_stop_word_keys = frozenset(translit_key(w) for w in STOP_WORDS if not w.isascii())
+_ky_stop_word_keys = frozenset(translit_key(w) for w in KY_STOP_WORDS if not w.isascii())
+
+
+def is_translit_stop_word(cyrillic: str, language: Language | str | None = None) -> bool:
+    """Транслит латинского слова — стоп-слово (с точностью до различий транслита)."""
+    keys = _ky_stop_word_keys if language == Language.ky else _stop_word_keys
+    return translit_key(cyrillic) in keys
+
+
+def correct_query_tokens(
+    question: str,
+    vocabulary: SpellingIndex,
+) -> set[str]:
+    """Нормализованные слова вопроса, приведённые к словарю базы знаний.
+
+    Слово, которого нет в словаре, пробуется в транслите (для латиницы)
+    и исправляется до ближайшего слова словаря; если не нашлось ничего,
+    остаётся как есть (сработает совпадение по префиксу).
+    """
+    tokens = set()
+    for word in split_words(question):
+        token = _resolve_word(word, vocabulary)
+        if token:
+            tokens.add(token)
+    return tokens
+
+
+def _resolve_word(word: str, vocabulary: SpellingIndex) -> str | None:
+    token = word_token(word)
+    if token is None or token in vocabulary:
+        return token
+
+    if is_latin(word):
+        cyrillic = transliterate(word)
+        # Стоп-слова проверяются до отсева коротких слов в word_token
+        if is_translit_stop_word(cyrillic):
+            return None
+        cyrillic_token = word_token(cyrillic)
+        if cyrillic_token is None:
+            return None
+        corrected = vocabulary.correct(cyrillic_token)
+        if corrected:
+            return corrected
+
+    return vocabulary.correct(token) or token
@@ -0,0 +1,68 @@
+# Счётчики использования записей базы знаний (отложенная запись)
+import logging
+
+from sqlalchemy import Integer, bindparam, column, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models.models import KnowledgeBase
+
+logger = logging.getLogger(__name__)
+
+# Накопленные попадания: entry_id -> сколько раз использован с последнего сброса
+pending_hits: dict[int, int] = {}
+
+
+def record_knowledge_hit(entry_id: int):
+    """Учесть использование записи (без обращения к БД)."""
+    pending_hits[entry_id] = pending_hits.get(entry_id, 0) + 1
+
+
+def merge_pending_hits(from_id: int, to_id: int):
+    """Перенести ещё не записанные попадания с одной записи на другую."""
+    count = pending_hits.pop(from_id, 0)
+    if count:
+        pending_hits[to_id] = pending_hits.get(to_id, 0) + count
+
+
+async def flush_knowledge_hits(session: AsyncSession) -> int:
+    """Записать накопленные попадания.
+
+    В PostgreSQL — одним UPDATE ... FROM (VALUES ...), в остальных СУБД
+    (SQLite в бенчмарке и оценке) — одним executemany по id. Возвращает
+    количество обновлённых записей. При ошибке счётчики возвращаются в
+    очередь и будут записаны при следующем сбросе.
+    """
+    if not pending_hits:
+        return 0
+
+    hits = dict(pending_hits)
+    pending_hits.clear()
+
+    try:
+        if session.get_bind().dialect.name == "postgresql":
+            rows = values(
+                column("id", Integer),
+                column("hits", Integer),
+                name="hits",
+            ).data(list(hits.items()))
+            await session.execute(
+                update(KnowledgeBase)
+                .where(KnowledgeBase.id == rows.c.id)
+                .values(times_used=KnowledgeBase.times_used + rows.c.hits)
+            )
+        else:
+            table = KnowledgeBase.__table__
+            await session.execute(
+                update(table)
+                .where(table.c.id == bindparam("entry_id"))
+                .values(times_used=table.c.times_used + bindparam("hits")),
+                [{"entry_id": entry_id, "hits": count} for entry_id, count in hits.items()],
+            )
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        for entry_id, count in hits.items():
+            pending_hits[entry_id] = pending_hits.get(entry_id, 0) + count
+        raise
+
+    return len(hits)
@@ -0,0 +1,189 @@
+# Синхронизация индексов базы знаний между процессами через PostgreSQL LISTEN/NOTIFY
+import asyncio
+import json
+import logging
+import ssl as _ssl
+import uuid
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.database import async_session
+from app.db.models.models import KnowledgeBase
+from app.services.knowledge_index import knowledge_index
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "knowledge_base_changes"
+
+# Идентификатор процесса — свои уведомления применять не нужно
+WORKER_ID = uuid.uuid4().hex
+
+# Последняя версия корпуса, о которой знает процесс
+last_version: int | None = None
+
+_listener_task: asyncio.Task | None = None
+
+# Уведомление «перестроить индекс» без отправителя (после переподключения)
+RELOAD = json.dumps({"op": "reload"})
+
+
+def is_postgres() -> bool:
+    return settings.database_url.startswith("postgresql")
+
+
+async def on_entry_saved(session: AsyncSession, entry: KnowledgeBase):
+    """Запись создана или изменена: обновить свой индекс и оповестить остальные процессы."""
+    knowledge_index.upsert(entry)
+    await _notify(session, "upsert", entry.id)
+
+
+async def on_entry_deleted(session: AsyncSession, entry_id: int):
+    """Запись удалена."""
+    knowledge_index.remove(entry_id)
+    await _notify(session, "delete", entry_id)
+
+
+async def on_corpus_changed(session: AsyncSession):
+    """Изменилось много записей сразу — всем процессам перестроить индекс."""
+    await knowledge_index.load(session)
+    await _notify(session, "reload")
+
+
+async def _notify(session: AsyncSession, op: str, entry_id: int | None = None):
+    if not is_postgres():
+        return
+
+    global last_version
+    try:
+        result = await session.execute(
+            text(
+                "SELECT v, pg_notify(:channel, json_build_object("
+                "'op', CAST(:op AS text), 'id', CAST(:id AS integer), "
+                "'origin', CAST(:origin AS text), 'version', v)::text) "
+                "FROM (SELECT nextval('knowledge_base_version_seq') AS v) AS seq"
+            ),
+            {"channel": CHANNEL, "op": op, "id": entry_id, "origin": WORKER_ID},
+        )
+        last_version = result.scalar_one()
+        await session.commit()
+    except Exception as e:
+        # Данные уже сохранены; другие процессы догонят при следующей перестройке
+        await session.rollback()
+        logger.error(f"Не удалось отправить уведомление об изменении базы знаний: {e}")
+
+
+async def _apply(payload: str):
+    """Применить изменение, пришедшее от другого процесса."""
+    global last_version
+    try:
+        change = json.loads(payload)
+    except ValueError:
+        logger.warning(f"Некорректное уведомление базы знаний: {payload}")
+        return
+
+    version = change.get("version")
+    expected = last_version + 1 if last_version is not None else version
+    if version is not None and (last_version is None or version > last_version):
+        last_version = version
+
+    if change.get("origin") == WORKER_ID:
+        return
+
+    async with async_session() as session:
+        # Пропущено уведомление (или массовое изменение) — перестраиваем целиком
+        if change.get("op") == "reload" or (version is not None and version > expected):
+            await knowledge_index.load(session)
+            return
+
+        entry_id = change.get("id")
+        if change.get("op") == "delete":
+            knowledge_index.remove(entry_id)
+            return
+
+        entry = await session.get(KnowledgeBase, entry_id)
+        if entry:
+            knowledge_index.upsert(entry)
+        else:
+            knowledge_index.remove(entry_id)
+
+
+async def _apply_loop(queue: asyncio.Queue):
+    """Применять уведомления по одному в порядке прихода.
+
+    Перестройка индекса (load) очищает его и собирает заново; если бы
+    уведомления применялись параллельно, upsert во время перестройки мог
+    потеряться или лечь раньше более старого изменения.
+    """
+    while True:
+        payload = await queue.get()
+        try:
+            await _apply(payload)
+        except Exception as e:
+            logger.error(f"Синхронизация базы знаний: не удалось применить {payload}: {e}")
+
+
+async def _listen_loop():
+    """Слушать канал; после разрыва соединения — переподключиться и перестроить индекс."""
+    queue: asyncio.Queue[str] = asyncio.Queue()
+    worker = asyncio.create_task(_apply_loop(queue))
+    try:
+        await _listen(queue)
+    finally:
+        worker.cancel()
+
+
+async def _listen(queue: asyncio.Queue):
+    import asyncpg
+
+    dsn = settings.database_url.replace("postgresql+asyncpg://", "postgresql://")
+    ssl = _ssl.create_default_context() if settings.database_ssl else None
+    reconnect = False
+
+    while True:
+        conn = None
+        try:
+            conn = await asyncpg.connect(dsn, ssl=ssl)
+            closed = asyncio.Event()
+            conn.add_termination_listener(lambda _conn: closed.set())
+            await conn.add_listener(
+                CHANNEL,
+                lambda _conn, _pid, _channel, payload: queue.put_nowait(payload),
+            )
+            logger.info("Синхронизация базы знаний: слушаем уведомления")
+
+            if reconnect:
+                # В ту же очередь: перестройка не пересечётся с уведомлениями
+                queue.put_nowait(RELOAD)
+            reconnect = True
+
+            await closed.wait()
+            logger.warning("Синхронизация базы знаний: соединение потеряно")
+        except asyncio.CancelledError:
+            if conn and not conn.is_closed():
+                await conn.close()
+            raise
+        except Exception as e:
+            logger.error(f"Синхронизация базы знаний: ошибка подключения: {e}")
+            reconnect = True
+        await asyncio.sleep(5)
+
+
+def start_knowledge_listener():
+    """Запустить прослушивание изменений базы знаний (только PostgreSQL)."""
+    global _listener_task
+    if not is_postgres() or _listener_task:
+        return
+    _listener_task = asyncio.create_task(_listen_loop())
+
+
+async def stop_knowledge_listener():
+    global _listener_task
+    if _listener_task:
+        _listener_task.cancel()
+        try:
+            await _listener_task
+        except asyncio.CancelledError:
+            pass
+        _listener_task = None
@@ -0,0 +1,100 @@
+# Синонимы базы знаний: «мк», «урок», «занятие» -> «мастер-класс»
+import logging
+from typing import Iterable
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models.models import KnowledgeSynonym
+from app.services.tokenizer import split_words, word_token
+
+logger = logging.getLogger(__name__)
+
+
+def parse_aliases(aliases: str | Iterable[str]) -> list[str]:
+    """Синонимы из строки через запятую (или списка) без пустых и повторов."""
+    if isinstance(aliases, str):
+        aliases = aliases.split(',')
+    result = []
+    for alias in aliases:
+        alias = ' '.join(split_words(alias))
+        if alias and alias not in result:
+            result.append(alias)
+    return result
+
+
+class SynonymMap:
+    """Замена синонимов на основной термин до извлечения ключевых слов.
+
+    Применяется и к вопросам записей (при сохранении и переиндексации), и к
+    вопросам гостей, но только для поисковых слов: в индексе и в
+    KnowledgeBase.tokens остаётся основной термин, а «мк» совпадает с ним как
+    обычное слово. KnowledgeBase.keywords хранятся как написаны в вопросе.
+    Короткие синонимы вроде «мк» заменяются до отсева слов из двух букв.
+    """
+
+    def __init__(self):
+        self.loaded = False
+        # Фраза-синоним (кортеж слов) -> термин
+        self._phrases: dict[tuple[str, ...], str] = {}
+        # Нормализованная форма однословного синонима -> термин
+        self._tokens: dict[str, str] = {}
+        self._max_words = 0
+
+    def __len__(self) -> int:
+        return len(self._phrases)
+
+    async def load(self, session: AsyncSession):
+        result = await session.execute(select(KnowledgeSynonym.term, KnowledgeSynonym.aliases))
+        self.build(result.all())
+        logger.info(f"Синонимы базы знаний загружены: {len(self._phrases)}")
+
+    def build(self, rows: Iterable[tuple[str, str]]):
+        """Собрать словарь из пар (термин, синонимы)."""
+        phrases: dict[tuple[str, ...], str] = {}
+        tokens: dict[str, str] = {}
+        for term, aliases in rows:
+            canonical = ' '.join(split_words(term))
+            if not canonical:
+                continue
+            for alias in parse_aliases(aliases):
+                if alias == canonical:
+                    continue
+                words = tuple(alias.split())
+                phrases.setdefault(words, canonical)
+                if len(words) == 1:
+                    token = word_token(words[0])
+                    if token:
+                        tokens.setdefault(token, canonical)
+
+        self._phrases = phrases
+        self._tokens = tokens
+        self._max_words = max((len(words) for words in phrases), default=0)
+        self.loaded = True
+
+    def apply(self, text: str) -> str:
+        """Текст с синонимами, заменёнными на термины (без синонимов — как есть)."""
+        if not self._phrases:
+            return text
+
+        words = split_words(text)
+        result = []
+        i = 0
+        while i < len(words):
+            # Сначала самые длинные фразы-синонимы
+            for size in range(min(self._max_words, len(words) - i), 0, -1):
+                term = self._phrases.get(tuple(words[i:i + size]))
+                if term:
+                    result.append(term)
+                    i += size
+                    break
+            else:
+                # Та же основа, что у синонима (после нормализации окончаний)
+                token = word_token(words[i])
+                result.append(self._tokens.get(token, words[i]) if token else words[i])
+                i += 1
+        return ' '.join(result)
+
+
+# Общий словарь синонимов процесса
+synonyms = SynonymMap()
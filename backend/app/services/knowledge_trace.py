@@ -0,0 +1,50 @@
+# Трассировка поиска по базе знаний: время этапов и промежуточные результаты
+import time
+from contextlib import contextmanager, nullcontext
+
+
+class SearchTrace:
+    """Отладочная запись одного поиска.
+
+    Передаётся в search_knowledge_base и дальше по тому же пути, что и в
+    рабочем режиме: этапы замеряются через stage(), данные — через record().
+    Время этапов — в миллисекундах, повторные вызовы этапа суммируются.
+    """
+
+    enabled = True
+
+    def __init__(self, top_k: int = 10):
+        # Сколько лучших кандидатов оценивать (в рабочем режиме — один)
+        self.top_k = top_k
+        self.timings: dict[str, float] = {}
+        self.data: dict[str, object] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            self.timings[name] = self.timings.get(name, 0.0) + elapsed
+
+    def record(self, key: str, value):
+        self.data[key] = value
+
+
+class _NoTrace:
+    """Трассировка по умолчанию: ничего не замеряет и не хранит."""
+
+    enabled = False
+    top_k = 1
+
+    def stage(self, name: str):
+        return _NO_STAGE
+
+    def record(self, key: str, value):
+        pass
+
+
+_NO_STAGE = nullcontext()
+
+NO_TRACE = _NoTrace()
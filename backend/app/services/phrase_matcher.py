@@ -0,0 +1,73 @@
+# Поиск множества фраз в тексте за один проход (автомат Ахо–Корасик)
+from collections import deque
+from typing import Iterable
+
+
+class PhraseMatcher:
+    """Автомат Ахо–Корасик по группам фраз.
+
+    Собирается один раз; find() за один проход по тексту возвращает,
+    какие фразы каких групп встретились (как подстроки, с пересечениями).
+
+        matcher = PhraseMatcher({"price": ["сколько стоит", "цена"]})
+        matcher.find("а сколько стоит?")  # {"price": {"сколько стоит"}}
+    """
+
+    def __init__(self, groups: dict[str, Iterable[str]]):
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._output: list[list[tuple[str, str]]] = [[]]
+
+        for label, phrases in groups.items():
+            for phrase in phrases:
+                self._insert(label, phrase)
+        self._build_links()
+
+    def find(self, text: str) -> dict[str, set[str]]:
+        """Найденные фразы по группам: {группа: {фраза, ...}}."""
+        found: dict[str, set[str]] = {}
+        for label, phrase in self._scan(text):
+            found.setdefault(label, set()).add(phrase)
+        return found
+
+    def contains(self, text: str, label: str | None = None) -> bool:
+        """Есть ли в тексте хотя бы одна фраза (из группы label, если указана)."""
+        for found_label, _ in self._scan(text):
+            if label is None or found_label == label:
+                return True
+        return False
+
+    def _scan(self, text: str):
+        goto, fail, output = self._goto, self._fail, self._output
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            yield from output[node]
+
+    def _insert(self, label: str, phrase: str):
+        node = 0
+        for ch in phrase:
+            next_node = self._goto[node].get(ch)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[node][ch] = next_node
+            node = next_node
+        self._output[node].append((label, phrase))
+
+    def _build_links(self):
+        # Обход в ширину: суффиксная ссылка ведёт в самый длинный суффикс-префикс
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, next_node in self._goto[node].items():
+                queue.append(next_node)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_node] = self._goto[fail].get(ch, 0)
+                self._output[next_node] = self._output[next_node] + self._output[self._fail[next_node]]
@@ -0,0 +1,125 @@
+# Склейка серий сообщений гостя: один ответ бота на «Здравствуйте» / «хотим на МК» / «в субботу»
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, TypeVar
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class ReplyTurn:
+    """Право одного сообщения ответить за всю серию в диалоге.
+
+    Активен только ход последнего сообщения, пережившего окно ожидания.
+    Генерация ответа запускается через guard(): новое сообщение гостя
+    отменяет её, и ответ строится заново уже по всей серии.
+    """
+
+    def __init__(self, debouncer: "ReplyDebouncer", key: int, generation: int):
+        self._debouncer = debouncer
+        self.key = key
+        self.generation = generation
+        self.active = False
+        self.texts: list[str] = []
+
+    @property
+    def text(self) -> str:
+        """Все сообщения серии одной строкой (для уведомления менеджера)."""
+        return "\n".join(self.texts)
+
+    @property
+    def superseded(self) -> bool:
+        """Пришло более новое сообщение — отвечать будет его ход."""
+        return self._debouncer._generations.get(self.key) != self.generation
+
+    async def guard(
+        self,
+        awaitable: Awaitable[T],
+        discard: Callable[[T], Awaitable[None]] | None = None,
+    ) -> T | None:
+        """Выполнить генерацию ответа; None — ответ заменён новым сообщением.
+
+        Новое сообщение, пришедшее до вызова, отменяет генерацию сразу, во
+        время генерации — прерывает её. Если оно пришло, когда генерация уже
+        закончилась, результат отдаётся в discard (убрать показанный гостю
+        потоковый ответ) и тоже не используется.
+        """
+        if self.superseded:
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            return None
+
+        task = asyncio.ensure_future(awaitable)
+        self._debouncer._inflight[self.key] = task
+        try:
+            await asyncio.wait({task})
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        finally:
+            if self._debouncer._inflight.get(self.key) is task:
+                del self._debouncer._inflight[self.key]
+
+        if task.cancelled() or self.superseded:
+            logger.info(f"Ответ в диалоге #{self.key} заменён: гость дописал сообщение")
+            if not task.cancelled() and discard:
+                await discard(task.result())
+            return None
+        return task.result()
+
+
+class ReplyDebouncer:
+    """Окно ожидания по диалогу перед ответом бота.
+
+    Каждое сообщение гостя сохраняется сразу, но отвечает только последнее:
+    если за reply_debounce_seconds пришло новое, прежнее молча выходит.
+    Новое сообщение также отменяет уже идущую генерацию ответа, поэтому на
+    серию из трёх сообщений уходит один запрос к LLM и один ответ гостю.
+    Состояние — в памяти процесса, как и operator_reply_state.
+    """
+
+    def __init__(self):
+        self._generations: dict[int, int] = {}
+        self._texts: dict[int, list[str]] = {}
+        self._inflight: dict[int, asyncio.Future] = {}
+
+    @asynccontextmanager
+    async def turn(self, key: int, text: str):
+        """Дождаться конца серии сообщений диалога key.
+
+            async with reply_debouncer.turn(conversation.id, text) as turn:
+                if not turn.active:
+                    return  # ответит более новое сообщение
+                response = await turn.guard(generate_response(history))
+        """
+        generation = self._generations.get(key, 0) + 1
+        self._generations[key] = generation
+        self._texts.setdefault(key, []).append(text)
+
+        inflight = self._inflight.get(key)
+        if inflight and not inflight.done():
+            inflight.cancel()
+
+        turn = ReplyTurn(self, key, generation)
+        if settings.reply_debounce_seconds > 0:
+            await asyncio.sleep(settings.reply_debounce_seconds)
+
+        if not turn.superseded:
+            turn.active = True
+            turn.texts = list(self._texts[key])
+        try:
+            yield turn
+        finally:
+            # Последний ход серии убирает за собой; иначе сообщения
+            # достаются более новому ходу
+            if not turn.superseded:
+                self._generations.pop(key, None)
+                self._texts.pop(key, None)
+
+
+# Общий на процесс
+reply_debouncer = ReplyDebouncer()
@@ -0,0 +1,181 @@
+# Токенизация текста для базы знаний: очистка, стоп-слова, грубый стемминг
+import re
+from functools import lru_cache
+
+from app.db.models.models import Language
+
+# Стоп-слова на русском и английском
+STOP_WORDS = frozenset({
+    'а', 'и', 'в', 'на', 'с', 'что', 'как', 'это', 'для', 'по', 'из',
+    'у', 'к', 'о', 'не', 'да', 'но', 'же', 'ли', 'бы', 'то', 'вы',
+    'мы', 'он', 'она', 'они', 'вас', 'нас', 'его', 'её', 'их', 'мне',
+    'есть', 'быть', 'был', 'была', 'будет', 'можно', 'нужно', 'надо',
+    'сколько', 'какой', 'какая', 'какие', 'когда', 'где', 'кто', 'чем',
+    'the', 'a', 'an', 'is', 'are', 'was', 'were', 'be', 'been', 'being',
+    'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could',
+    'should', 'may', 'might', 'must', 'shall', 'can', 'need', 'dare',
+    'ought', 'used', 'to', 'of', 'in', 'for', 'on', 'with', 'at', 'by',
+    'from', 'or', 'and', 'not', 'but', 'if', 'this', 'that', 'these',
+    'those', 'what', 'which', 'who', 'whom', 'how', 'when', 'where', 'why',
+})
+
+# Для кыргызоязычных клиентов добавляются кыргызские стоп-слова
+# (русские остаются: в сообщениях языки часто смешиваются)
+KY_STOP_WORDS = STOP_WORDS | frozenset({
+    'жана', 'менен', 'үчүн', 'бул', 'ошол', 'ал', 'алар', 'мен', 'сен',
+    'сиз', 'биз', 'силер', 'сиздер', 'эмне', 'кандай', 'канча',
+    'качан', 'кайда', 'ким', 'кайсы', 'бар', 'жок', 'дагы', 'деле', 'эле',
+    'болот', 'болобу', 'керек', 'барбы', 'беле', 'экен', 'мага', 'сизге',
+})
+
+# Знаки препинания, которые убираются перед разбиением на слова
+_PUNCTUATION = re.compile(r'[?!.,]')
+
+# Типичные русские окончания для грубого стемминга (порядок важен)
+RU_SUFFIXES = (
+    'ться', 'ить', 'ать', 'еть', 'уть', 'оть',  # глаголы
+    'ение', 'ание', 'ость', 'есть', 'ство',  # существительные
+    'ого', 'его', 'ому', 'ему', 'ым', 'им', 'ой', 'ей',  # прилагательные
+    'ёт', 'ет', 'ит', 'ут', 'ют', 'ат', 'ят',  # глаголы
+    'ся', 'сь',  # возвратные
+)
+
+# Кыргызские аффиксы с вариантами по гармонии гласных, длинные раньше коротких
+KY_SUFFIXES = tuple(sorted({
+    # множественное число
+    'лар', 'лер', 'лор', 'лөр', 'дар', 'дер', 'дор', 'дөр', 'тар', 'тер', 'тор', 'төр',
+    # родительный падеж
+    'нын', 'нин', 'нун', 'нүн', 'дын', 'дин', 'дун', 'дүн', 'тын', 'тин', 'тун', 'түн',
+    # исходный падеж
+    'дан', 'ден', 'дон', 'дөн', 'тан', 'тен', 'тон', 'төн', 'нан', 'нен', 'нон', 'нөн',
+    # дательный падеж
+    'га', 'ге', 'го', 'гө', 'ка', 'ке', 'ко', 'кө',
+    # местный падеж
+    'да', 'де', 'до', 'дө', 'та', 'те', 'то', 'тө',
+    # винительный падеж
+    'ны', 'ни', 'ну', 'нү', 'ды', 'ди', 'ду', 'дү', 'ты', 'ти', 'ту', 'тү',
+}, key=lambda suffix: (-len(suffix), suffix)))
+
+# Кыргызские аффиксы нанизываются (мн. число + падеж), снимаем не больше двух
+KY_MAX_SUFFIXES = 2
+
+# Буквы, которые есть в кыргызском алфавите, но не в русском
+_KY_LETTERS = frozenset('ңөү')
+
+# Английские окончания: (окончание, замена); 'ss' оставляет слово как есть
+EN_SUFFIXES = (
+    ('sses', 'ss'), ('ies', 'y'), ('ss', 'ss'),
+    ('ing', ''), ('ed', ''), ('ly', ''), ('s', ''),
+)
+
+# Транслит: сначала многобуквенные сочетания, затем отдельные буквы
+_TRANSLIT = {
+    'shch': 'щ', 'sch': 'щ', 'zh': 'ж', 'kh': 'х', 'ts': 'ц', 'ch': 'ч', 'sh': 'ш',
+    'yu': 'ю', 'ya': 'я', 'yo': 'ё', 'ye': 'е', 'ju': 'ю', 'ja': 'я', 'jo': 'ё',
+    'a': 'а', 'b': 'б', 'v': 'в', 'g': 'г', 'd': 'д', 'e': 'е', 'z': 'з', 'i': 'и',
+    'j': 'й', 'k': 'к', 'l': 'л', 'm': 'м', 'n': 'н', 'o': 'о', 'p': 'п', 'r': 'р',
+    's': 'с', 't': 'т', 'u': 'у', 'f': 'ф', 'h': 'х', 'c': 'ц', 'w': 'в', 'x': 'кс',
+    'q': 'к', "'": 'ь',
+}
+_TRANSLIT_PATTERN = re.compile(
+    '|'.join(sorted((re.escape(chunk) for chunk in _TRANSLIT), key=len, reverse=True)) + '|y|.'
+)
+_CYRILLIC_VOWELS = frozenset('аеёиоуыэюя')
+
+# Сколько основ слов держать в памяти
+STEM_CACHE_SIZE = 50_000
+
+
+def extract_keywords(text: str, language: Language | str | None = None) -> str:
+    """Извлечь ключевые слова из текста (language — язык клиента)."""
+    stop_words = KY_STOP_WORDS if language == Language.ky else STOP_WORDS
+    return ' '.join(
+        normalize_word(w, language) for w in split_words(text) if w not in stop_words and len(w) > 2
+    )
+
+
+def split_words(text: str) -> list[str]:
+    """Слова текста в нижнем регистре без знаков препинания."""
+    return _PUNCTUATION.sub('', text.lower()).split()
+
+
+def word_token(word: str, language: Language | str | None = None) -> str | None:
+    """Слово в том виде, в каком оно попадает в KnowledgeBase.tokens
+    (extract_keywords + normalize_keywords); None для стоп-слов и коротких слов."""
+    stop_words = KY_STOP_WORDS if language == Language.ky else STOP_WORDS
+    if word in stop_words or len(word) <= 2:
+        return None
+    return normalize_word(normalize_word(word, language))
+
+
+def is_latin(word: str) -> bool:
+    """Слово набрано латиницей (может быть транслитом русского)."""
+    return word.isascii() and any(ch.isalpha() for ch in word)
+
+
+def transliterate(word: str) -> str:
+    """Латиница -> кириллица по распространённому «бытовому» транслиту:
+    skolko -> сколко, adres -> адрес, chas -> час, kakoy -> какой."""
+    result = []
+    for match in _TRANSLIT_PATTERN.finditer(word):
+        chunk = match.group()
+        previous = result[-1] if result else ''
+        if chunk == 'e' and not previous:
+            result.append('э')
+        elif chunk == 'y':
+            # после гласной — й (kakoy), иначе — ы (vy)
+            result.append('й' if previous and previous in _CYRILLIC_VOWELS else 'ы')
+        else:
+            result.append(_TRANSLIT.get(chunk, chunk))
+    return ''.join(result)
+
+
+def normalize_keywords(keywords: str) -> str:
+    """Нормализованные слова для индекса (хранятся в KnowledgeBase.tokens)."""
+    return ' '.join(sorted(set(normalize_word(w) for w in keywords.split())))
+
+
+def normalize_word(word: str, language: Language | str | None = None) -> str:
+    """Простая нормализация слова — убираем окончания.
+
+    Латиница стеммится по английским правилам, кириллица — по русским;
+    кыргызские правила включаются для клиентов с языком ky и для слов
+    с буквами ң, ө, ү.
+    """
+    return _stem(word.lower().strip(), language == Language.ky)
+
+
+@lru_cache(maxsize=STEM_CACHE_SIZE)
+def _stem(word: str, kyrgyz: bool) -> str:
+    if word.isascii():
+        return _stem_english(word)
+    if kyrgyz or not _KY_LETTERS.isdisjoint(word):
+        stem = _stem_kyrgyz(word)
+        if stem != word:
+            return stem
+    return _stem_russian(word)
+
+
+def _stem_russian(word: str) -> str:
+    for suffix in RU_SUFFIXES:
+        if word.endswith(suffix) and len(word) > len(suffix) + 2:
+            return word[:-len(suffix)]
+    return word
+
+
+def _stem_kyrgyz(word: str) -> str:
+    for _ in range(KY_MAX_SUFFIXES):
+        for suffix in KY_SUFFIXES:
+            if word.endswith(suffix) and len(word) > len(suffix) + 2:
+                word = word[:-len(suffix)]
+                break
+        else:
+            break
+    return word
+
+
+def _stem_english(word: str) -> str:
+    for suffix, replacement in EN_SUFFIXES:
+        if word.endswith(suffix) and len(word) > len(suffix) + 2:
+            return word[:-len(suffix)] + replacement
+    return word
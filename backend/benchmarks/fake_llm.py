@@ -0,0 +1,296 @@
+"""
+Заглушка OpenRouter для нагрузочных тестов: OpenAI-совместимый
+POST /v1/chat/completions (обычный и потоковый SSE) без сети и без затрат.
+
+Режимы:
+  fake    — синтетические ответы: задержка из заданного распределения,
+            служебные теги по правилам и с заданной вероятностью, ошибки 500;
+  record  — прокси к настоящему API: каждый обмен сохраняется в кассету;
+  replay  — ответы из кассет, детерминированно (без кассеты — 404).
+
+    python -m benchmarks.fake_llm --port 8081 --latency lognormal:-0.5,0.4 \\
+        --token-delay 0.02 --manager-rate 0.1 --done-rate 0.05 --error-rate 0.02
+
+    OPENROUTER_API_KEY=... python -m benchmarks.fake_llm --mode record --cassettes cassettes/
+    python -m benchmarks.fake_llm --mode replay --cassettes cassettes/
+
+Бот переключается на заглушку настройками (ключ OpenRouter не нужен):
+    AI_BACKEND=fake AI_FAKE_BASE_URL=http://localhost:8081/v1
+
+Распределения задержки до первого токена (секунды):
+  fixed:0.5 | uniform:0.2,1.5 | normal:0.8,0.2 | lognormal:mu,sigma | exp:0.7
+Кассета — JSON-файл на запрос; имя — хэш модели, сообщений, max_tokens и stream.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import time
+import uuid
+from pathlib import Path
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.bot.ai.budget import count_tokens, message_tokens
+from app.core.config import settings
+
+logger = logging.getLogger("fake_llm")
+
+MANAGER_TAG = "[НУЖЕН_МЕНЕДЖЕР]"
+DONE_TAG = "[ЗАВЕРШЕНО]"
+
+# Сценарий, как в системном промпте: цены — к менеджеру, благодарность — завершение
+PRICE_WORDS = ("цен", "стоим", "сколько", "прайс", "price", "баасы")
+THANKS_WORDS = ("спасибо", "рахмат", "thanks", "понятно")
+
+REPLIES = (
+    "Здравствуйте! Мастер-классы проходят каждый день, кроме воскресенья, с 8:00 до 19:00.",
+    "С радостью подскажу! Длительность мастер-класса — 1,5–2 часа, все материалы включены.",
+    "Изделия будут готовы через 3–4 недели после обжига, забрать их можно в студии.",
+    "Для записи напишите нам в WhatsApp: +996 505 732 888.",
+)
+PRICE_REPLY = "Стоимость уточню у менеджера, он свяжется с вами!"
+THANKS_REPLY = "Спасибо, что написали! Будем рады видеть вас в SKERAMOS."
+CARE_ENDING = " Могу ещё чем-то помочь?"
+
+STREAM_CHUNK_CHARS = 6
+
+
+def parse_latency(spec: str):
+    """Функция без аргументов, возвращающая задержку в секундах по описанию spec."""
+    name, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",")] if params else []
+    samplers = {
+        "fixed": lambda: values[0],
+        "uniform": lambda: random.uniform(values[0], values[1]),
+        "normal": lambda: random.gauss(values[0], values[1]),
+        "lognormal": lambda: random.lognormvariate(values[0], values[1]),
+        "exp": lambda: random.expovariate(1 / values[0]),
+    }
+    if name not in samplers:
+        raise argparse.ArgumentTypeError(f"Неизвестное распределение: {name}")
+    sampler = samplers[name]
+    try:
+        sampler()
+    except (IndexError, ValueError, ZeroDivisionError):
+        raise argparse.ArgumentTypeError(f"Неверные параметры распределения: {spec}")
+    return lambda: max(sampler(), 0.0)
+
+
+def cassette_key(body: dict) -> str:
+    """Ключ кассеты: только то, что определяет ответ модели."""
+    key = {
+        "model": body.get("model"),
+        "messages": body.get("messages"),
+        "max_tokens": body.get("max_tokens"),
+        "stream": bool(body.get("stream")),
+    }
+    data = json.dumps(key, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(data.encode()).hexdigest()[:32]
+
+
+def content_text(message: dict) -> str:
+    """Текст сообщения: строка или части [{"type": "text", ...}] (cache_control)."""
+    content = message.get("content") or ""
+    if isinstance(content, list):
+        content = " ".join(part.get("text", "") for part in content)
+    return content
+
+
+def last_user_text(messages: list[dict]) -> str:
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            return content_text(message)
+    return ""
+
+
+def _sse(data) -> bytes:
+    payload = data if isinstance(data, str) else json.dumps(data, ensure_ascii=False)
+    return f"data: {payload}\n\n".encode()
+
+
+class FakeLLM:
+    """Синтетические ответы для режима fake."""
+
+    def __init__(self, args):
+        self.latency = args.latency
+        self.token_delay = args.token_delay
+        self.manager_rate = args.manager_rate
+        self.done_rate = args.done_rate
+        self.error_rate = args.error_rate
+
+    def reply(self, messages: list[dict]) -> str:
+        question = last_user_text(messages).lower()
+        if any(word in question for word in PRICE_WORDS):
+            return f"{PRICE_REPLY} {MANAGER_TAG}"
+        if any(word in question for word in THANKS_WORDS):
+            return f"{THANKS_REPLY} {DONE_TAG}"
+
+        text = random.choice(REPLIES) + CARE_ENDING
+        if random.random() < self.manager_rate:
+            text += f" {MANAGER_TAG}"
+        elif random.random() < self.done_rate:
+            text += f" {DONE_TAG}"
+        return text
+
+    async def handle(self, body: dict):
+        await asyncio.sleep(self.latency())
+        if random.random() < self.error_rate:
+            raise HTTPException(status_code=500, detail="Искусственная ошибка заглушки")
+
+        messages = body.get("messages", [])
+        text = self.reply(messages)
+        usage = {
+            "prompt_tokens": sum(message_tokens({"content": content_text(m)}) for m in messages),
+            "completion_tokens": count_tokens(text),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        model = body.get("model", "fake")
+
+        if not body.get("stream"):
+            return JSONResponse({
+                "id": f"chatcmpl-{uuid.uuid4().hex}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": text},
+                }],
+                "usage": usage,
+            })
+
+        include_usage = (body.get("stream_options") or {}).get("include_usage")
+        return StreamingResponse(
+            self._stream(model, text, usage if include_usage else None),
+            media_type="text/event-stream",
+        )
+
+    async def _stream(self, model: str, text: str, usage: dict | None):
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+
+        def chunk(delta: dict, finish_reason=None) -> dict:
+            return {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+
+        # Мелкими порциями — теги режутся между частями, как у настоящих моделей
+        for start in range(0, len(text), STREAM_CHUNK_CHARS):
+            yield _sse(chunk({"content": text[start:start + STREAM_CHUNK_CHARS]}))
+            if self.token_delay:
+                await asyncio.sleep(self.token_delay)
+        yield _sse(chunk({}, finish_reason="stop"))
+        if usage:
+            yield _sse({**chunk({}), "choices": [], "usage": usage})
+        yield _sse("[DONE]")
+
+
+class Cassettes:
+    """Запись обменов с настоящим API и их воспроизведение."""
+
+    def __init__(self, directory: str, upstream: str, api_key: str):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.upstream = upstream.rstrip("/")
+        self.api_key = api_key
+        self.http = httpx.AsyncClient(timeout=settings.ai_timeout)
+
+    def path(self, body: dict) -> Path:
+        return self.directory / f"{cassette_key(body)}.json"
+
+    def save(self, body: dict, response: dict | None = None, stream: list[str] | None = None):
+        cassette = {"request": body, "response": response, "stream": stream}
+        self.path(body).write_text(json.dumps(cassette, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    async def record(self, body: dict):
+        url = f"{self.upstream}/chat/completions"
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+
+        if not body.get("stream"):
+            upstream = await self.http.post(url, json=body, headers=headers)
+            if upstream.status_code == 200:
+                self.save(body, response=upstream.json())
+            return JSONResponse(upstream.json(), status_code=upstream.status_code)
+
+        async def relay():
+            lines = []
+            async with self.http.stream("POST", url, json=body, headers=headers) as upstream:
+                async for line in upstream.aiter_lines():
+                    if line.startswith("data: "):
+                        lines.append(line[len("data: "):])
+                        yield f"{line}\n\n".encode()
+                ok = upstream.status_code == 200
+            if ok:
+                self.save(body, stream=lines)
+
+        return StreamingResponse(relay(), media_type="text/event-stream")
+
+    async def replay(self, body: dict):
+        path = self.path(body)
+        if not path.exists():
+            raise HTTPException(status_code=404, detail=f"Нет кассеты для запроса: {path.name}")
+        cassette = json.loads(path.read_text(encoding="utf-8"))
+
+        if cassette["stream"] is None:
+            return JSONResponse(cassette["response"])
+
+        async def play():
+            for data in cassette["stream"]:
+                yield _sse(data)
+
+        return StreamingResponse(play(), media_type="text/event-stream")
+
+
+def create_app(args) -> FastAPI:
+    app = FastAPI(title="Fake LLM")
+    fake = FakeLLM(args)
+    cassettes = None
+    if args.mode in ("record", "replay"):
+        cassettes = Cassettes(args.cassettes, args.upstream, settings.openrouter_api_key)
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        if args.mode == "record":
+            return await cassettes.record(body)
+        if args.mode == "replay":
+            return await cassettes.replay(body)
+        return await fake.handle(body)
+
+    return app
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Заглушка OpenRouter для нагрузочных тестов")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--mode", choices=["fake", "record", "replay"], default="fake")
+    parser.add_argument("--latency", type=parse_latency, default=parse_latency("lognormal:-0.5,0.4"),
+                        help="задержка до первого токена, например uniform:0.2,1.5")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="секунд между частями потока")
+    parser.add_argument("--manager-rate", type=float, default=0.1, help="доля ответов с [НУЖЕН_МЕНЕДЖЕР]")
+    parser.add_argument("--done-rate", type=float, default=0.05, help="доля ответов с [ЗАВЕРШЕНО]")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля ответов с ошибкой 500")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--cassettes", default="cassettes", help="каталог кассет (record/replay)")
+    parser.add_argument("--upstream", default="https://openrouter.ai/api/v1", help="настоящий API (record)")
+    args = parser.parse_args()
+
+    if args.mode == "record" and not settings.openrouter_api_key:
+        parser.error("для записи кассет нужен OPENROUTER_API_KEY")
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    uvicorn.run(create_app(args), host=args.host, port=args.port)
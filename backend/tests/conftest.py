@@ -0,0 +1,42 @@
+# Общие фикстуры тестов: SQLite во временном каталоге вместо PostgreSQL, без ключа API
+import os
+import tempfile
+
+_db_dir = tempfile.mkdtemp(prefix="skeramos-tests-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_db_dir}/test.db"
+os.environ["DEBUG"] = "false"
+os.environ["SECRET_KEY"] = "test-secret-key"
+os.environ["OPENROUTER_API_KEY"] = ""
+os.environ["AI_BACKEND"] = "fake"
+
+import pytest
+
+from app.db.database import async_session, engine
+from app.db.models.models import Base
+from app.services.knowledge_cache import answer_cache
+from app.services.knowledge_index import knowledge_index
+from app.services.knowledge_stats import pending_hits
+from app.services.knowledge_synonyms import synonyms
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def session():
+    """Сессия пустой БД; индексы и кэши базы знаний сброшены."""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+    knowledge_index.clear()
+    knowledge_index.loaded = False
+    synonyms.loaded = False
+    answer_cache.clear()
+    answer_cache.hits = answer_cache.misses = 0
+    pending_hits.clear()
+
+    async with async_session() as session:
+        yield session
@@ -0,0 +1,105 @@
+import pytest
+
+from app.core.config import settings
+from app.services import knowledge_cache
+from app.services.knowledge import add_to_knowledge_base, search_knowledge_base
+from app.services.knowledge_cache import CACHE_MISS, AnswerCache, answer_cache
+from app.services.knowledge_index import knowledge_index
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(knowledge_cache.time, "monotonic", clock)
+    return clock
+
+
+def test_hit_and_cached_none(clock):
+    cache = AnswerCache(maxsize=10, ttl=60)
+    assert cache.get("парковк", version=1) is CACHE_MISS
+    cache.put("парковк", 7, version=1)
+    cache.put("адрес", None, version=1)
+
+    assert cache.get("парковк", version=1) == 7
+    assert cache.get("адрес", version=1) is None
+    assert cache.stats() == {"size": 2, "hits": 2, "misses": 1, "hit_rate": 0.667}
+
+
+def test_new_version_invalidates(clock):
+    cache = AnswerCache(maxsize=10, ttl=60)
+    cache.get("парковк", version=1)
+    cache.put("парковк", 7, version=1)
+
+    assert cache.get("парковк", version=2) is CACHE_MISS
+    # Ответ, найденный по старому корпусу, не сохраняется
+    cache.put("парковк", 7, version=1)
+    assert cache.get("парковк", version=2) is CACHE_MISS
+
+
+def test_ttl_expiry(clock):
+    cache = AnswerCache(maxsize=10, ttl=60)
+    cache.get("парковк", version=1)
+    cache.put("парковк", 7, version=1)
+
+    clock.now += 59
+    assert cache.get("парковк", version=1) == 7
+    clock.now += 2
+    assert cache.get("парковк", version=1) is CACHE_MISS
+    assert cache.stats()["size"] == 0
+
+
+def test_lru_eviction(clock):
+    cache = AnswerCache(maxsize=2, ttl=60)
+    cache.get("a", version=1)
+    cache.put("a", 1, version=1)
+    cache.put("b", 2, version=1)
+    cache.get("a", version=1)
+    cache.put("c", 3, version=1)
+
+    assert cache.get("b", version=1) is CACHE_MISS
+    assert cache.get("a", version=1) == 1
+
+
+@pytest.mark.anyio
+async def test_search_cache_is_invalidated_by_index_changes(session):
+    assert await search_knowledge_base(session, "Где парковка?") is None
+    version = knowledge_index.version
+
+    entry, _ = await add_to_knowledge_base(session, "Где парковка?", "Во дворе")
+    assert knowledge_index.version != version
+    found = await search_knowledge_base(session, "Где парковка?")
+    assert found is not None and found.id == entry.id
+    assert answer_cache.stats()["hits"] == 0
+
+    assert (await search_knowledge_base(session, "где парковка")).id == entry.id
+    assert answer_cache.stats()["hits"] == 1
+
+
+@pytest.mark.anyio
+async def test_semantic_stage_keys_by_wording(session, monkeypatch):
+    monkeypatch.setattr(settings, "kb_spelling_enabled", False)
+    monkeypatch.setattr(settings, "kb_semantic_enabled", True)
+    monkeypatch.setattr(settings, "kb_semantic_threshold", 0.5)
+    await knowledge_index.load(session)
+    entry, _ = await add_to_knowledge_base(
+        session, "Как записаться на мастер-класс по гончарному кругу?", "Напишите нам в WhatsApp"
+    )
+
+    # Одинаковые tokens, разное написание: результат первого не должен достаться второму
+    await search_knowledge_base(session, "парковка во дворе")
+    await search_knowledge_base(session, "парковка парковка во дворе")
+    assert answer_cache.stats()["hits"] == 0
+    assert answer_cache.stats()["size"] == 2
+
+    question = "зпаисаться на мсатер-класс по гночарному кругу"
+    assert (await search_knowledge_base(session, question)).id == entry.id
+    assert (await search_knowledge_base(session, question)).id == entry.id
+    assert answer_cache.stats()["hits"] == 1
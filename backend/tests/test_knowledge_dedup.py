@@ -0,0 +1,60 @@
+import pytest
+
+from app.core.config import settings
+from app.services.knowledge import add_to_knowledge_base
+from app.services.knowledge_dedup import DuplicateDetector, jaccard, shingles
+from app.services.knowledge_index import knowledge_index
+
+
+def test_jaccard_is_exact():
+    first = shingles({"парковк", "студи"})
+    assert jaccard(first, first) == 1.0
+    assert jaccard(first, set()) == 0.0
+    second = shingles({"парковк", "отел"})
+    assert jaccard(first, second) == len(first & second) / len(first | second)
+
+
+def test_detector_decides_by_exact_jaccard():
+    question = {"сто", "мастер-класс", "гончарн", "круг"}
+    detector = DuplicateDetector()
+    detector.add(1, question)
+    detector.add(2, question | {"дет"})  # Жаккар 0.75
+    detector.add(3, {"парковк", "двор"})
+    detector.add(4, set(question))
+
+    assert detector.find(question, threshold=0.8) == [(1, 1.0), (4, 1.0)]
+    assert [entry_id for entry_id, _ in detector.find(question, threshold=0.7)] == [1, 4, 2]
+    assert detector.clusters(threshold=0.8) == [[1, 4]]
+    assert detector.clusters(threshold=0.7) == [[1, 2, 4]]
+
+    detector.remove(4)
+    assert detector.clusters(threshold=0.8) == []
+
+
+@pytest.mark.anyio
+async def test_add_reports_duplicate_without_overwriting(session, monkeypatch):
+    monkeypatch.setattr(settings, "kb_dedup_on_add", True)
+    await knowledge_index.load(session)
+
+    first, duplicate = await add_to_knowledge_base(session, "Сколько стоит абонемент на 8 занятий?", "4000 сом")
+    assert duplicate is None
+
+    second, duplicate = await add_to_knowledge_base(session, "Сколько стоит абонемент на 12 занятий?", "5500 сом")
+    assert duplicate is not None and duplicate.id == first.id
+    assert second.id != first.id
+
+    await session.refresh(first)
+    assert first.answer == "4000 сом"
+    assert second.answer == "5500 сом"
+
+
+@pytest.mark.anyio
+async def test_add_skips_duplicate_check_by_default(session):
+    assert settings.kb_dedup_on_add is False
+    await knowledge_index.load(session)
+
+    await add_to_knowledge_base(session, "Где парковка?", "Во дворе")
+    _, duplicate = await add_to_knowledge_base(session, "Где парковка?", "У входа")
+
+    assert duplicate is None
+    assert len(knowledge_index) == 2
@@ -0,0 +1,68 @@
+import io
+
+import pytest
+
+from app.api.routes.knowledge import _ndjson_rows, _read_in_threadpool
+from app.services.knowledge import KnowledgeImportError, import_knowledge_entries, search_knowledge_base
+from app.services.knowledge_index import knowledge_index
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_import_skips_bad_rows(session):
+    rows = [
+        {"question": "Где парковка?", "answer": "Во дворе"},
+        None,
+        ["не", "объект"],
+        {"question": "Есть ли фартуки?", "answer": ""},
+        {"question": "Какой адрес студии?", "answer": "Ул. Токтогула, 1"},
+    ]
+
+    imported, errors = await import_knowledge_entries(session, rows, batch_size=1)
+
+    assert imported == 2
+    assert [error.split(":")[0] for error in errors] == ["Строка 2", "Строка 3", "Строка 4"]
+    entry = await search_knowledge_base(session, "где парковка")
+    assert entry is not None and entry.answer == "Во дворе"
+
+
+async def test_failed_import_keeps_committed_batches_searchable(session):
+    def rows():
+        yield {"question": "Где парковка?", "answer": "Во дворе"}
+        yield {"question": "Какой адрес студии?", "answer": "Ул. Токтогула, 1"}
+        yield {"question": "Сколько длится мастер-класс?", "answer": "2 часа"}
+        raise ValueError("обрыв файла")
+
+    with pytest.raises(KnowledgeImportError) as error:
+        await import_knowledge_entries(session, rows(), batch_size=2)
+
+    assert error.value.imported == 2
+    assert "строка 4" in str(error.value)
+    # Индекс перестроен, хотя импорт не дошёл до конца
+    assert len(knowledge_index) == 2
+    entry = await search_knowledge_base(session, "адрес студии")
+    assert entry is not None and entry.answer == "Ул. Токтогула, 1"
+
+
+async def test_upload_reader_skips_broken_json_line(session):
+    text = '{"question": "Где парковка?", "answer": "Во дворе"}\n{oops\n\n' \
+           '{"question": "Какой адрес студии?", "answer": "Ул. Токтогула, 1"}\n'
+
+    rows = _read_in_threadpool(_ndjson_rows(io.StringIO(text)))
+    imported, errors = await import_knowledge_entries(session, rows)
+
+    assert imported == 2
+    assert len(errors) == 1
+
+
+async def test_upload_reader_stops_at_undecodable_bytes(session):
+    lines = "".join(f'{{"question": "Вопрос номер {i} про глину", "answer": "Ответ {i}"}}\n' for i in range(400))
+    data = lines.encode() + b'{"question": "\xff\xfe", "answer": "x"}\n'
+    stream = io.TextIOWrapper(io.BytesIO(data), encoding="utf-8-sig", newline="")
+
+    with pytest.raises(KnowledgeImportError) as error:
+        await import_knowledge_entries(session, _read_in_threadpool(_ndjson_rows(stream)), batch_size=50)
+
+    # Прочитанное до битого фрагмента сохранено и попало в индекс
+    assert 0 < error.value.imported < 400
+    assert len(knowledge_index) == error.value.imported
@@ -0,0 +1,46 @@
+import httpx
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import select
+
+from app.api.routes import api_router
+from app.core.auth import get_current_operator
+from app.db.models.models import KnowledgeBase, Operator
+from app.services.knowledge import add_to_knowledge_base
+
+pytestmark = pytest.mark.anyio
+
+
+async def api_client(session, is_admin: bool) -> httpx.AsyncClient:
+    operator = Operator(name="Менеджер", email=f"op{int(is_admin)}@skeramos.kg", password_hash="x", is_admin=is_admin)
+    session.add(operator)
+    await session.commit()
+
+    app = FastAPI()
+    app.include_router(api_router)
+    app.dependency_overrides[get_current_operator] = lambda: operator
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+async def test_merge_duplicates_requires_admin(session):
+    first, _ = await add_to_knowledge_base(session, "Где парковка?", "Во дворе")
+    second, _ = await add_to_knowledge_base(session, "Где у вас парковка?", "Во дворе студии")
+
+    async with await api_client(session, is_admin=False) as client:
+        response = await client.post("/api/knowledge/duplicates/merge", json={"ids": [first.id, second.id]})
+
+    assert response.status_code == 403
+    result = await session.execute(select(KnowledgeBase.id))
+    assert sorted(result.scalars().all()) == [first.id, second.id]
+
+
+async def test_admin_merges_duplicates(session):
+    first, _ = await add_to_knowledge_base(session, "Где парковка?", "Во дворе")
+    second, _ = await add_to_knowledge_base(session, "Где у вас парковка?", "Во дворе студии")
+
+    async with await api_client(session, is_admin=True) as client:
+        response = await client.post("/api/knowledge/duplicates/merge", json={"ids": [first.id, second.id]})
+
+    assert response.status_code == 200
+    result = await session.execute(select(KnowledgeBase.id))
+    assert result.scalars().all() == [response.json()["id"]]
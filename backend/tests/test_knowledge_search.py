@@ -0,0 +1,87 @@
+import pytest
+from sqlalchemy import select, update
+
+from app.db.models.models import KnowledgeBase, KnowledgeSynonym
+from app.services.knowledge import (
+    add_to_knowledge_base,
+    rank_knowledge_base,
+    reindex_knowledge_base,
+    reindex_missing_tokens,
+    search_knowledge_base,
+)
+from app.services.knowledge_index import ENGINE_BM25, KnowledgeIndex
+from app.services.tokenizer import extract_keywords, word_token
+
+
+def test_bm25_scores_are_capped_for_threshold():
+    index = KnowledgeIndex()
+    for entry_id, tokens in enumerate(["цен", "цен мастер-класс длит", "парковк двор", "адрес студи"], 1):
+        index._add(entry_id, set(tokens.split()))
+
+    raw = index.bm25_scores({"цен"})
+    assert raw[1] > 1 > raw[2]
+
+    ranked = index.rank({"цен"}, engine=ENGINE_BM25)
+    assert [entry_id for entry_id, _ in ranked] == [1, 2]
+    assert ranked[0][1] == 1.0
+    assert all(0 < score <= 1 for _, score in ranked)
+
+
+@pytest.mark.anyio
+async def test_startup_reindex_restores_null_tokens(session):
+    entry, _ = await add_to_knowledge_base(session, "How much is the pottery class?", "1500 som")
+    tokens = entry.tokens
+    assert await reindex_missing_tokens(session) == 0
+
+    # Как после миграции 009
+    await session.execute(update(KnowledgeBase).values(tokens=None))
+    await session.commit()
+
+    assert await reindex_missing_tokens(session) == 1
+    result = await session.execute(select(KnowledgeBase.tokens))
+    assert result.scalar_one() == tokens
+    found = await search_knowledge_base(session, "pottery class price")
+    assert found is not None and found.id == entry.id
+
+
+@pytest.mark.anyio
+async def test_synonyms_change_tokens_but_not_keywords(session):
+    session.add(KnowledgeSynonym(term="мастер-класс", aliases="мк, урок"))
+    await session.commit()
+
+    entry, _ = await add_to_knowledge_base(session, "Сколько длится урок?", "2 часа")
+    assert entry.keywords == extract_keywords("Сколько длится урок?")
+    assert "урок" not in entry.tokens.split() and word_token("мастер-класс") in entry.tokens.split()
+
+    await reindex_knowledge_base(session)
+    await session.refresh(entry)
+    assert entry.keywords == extract_keywords("Сколько длится урок?")
+
+    for question in ("сколько длится мк", "сколько длится мастер-класс"):
+        found = await search_knowledge_base(session, question)
+        assert found is not None and found.id == entry.id
+
+
+@pytest.mark.parametrize("question", [
+    "Мастер-класстын баасы канча?",
+    "Балдар үчүн сабактар барбы?",
+    "Можно ли оплатить картой?",
+])
+@pytest.mark.anyio
+async def test_repeated_question_scores_one_for_any_client_language(session, question):
+    # Кыргызоязычный гость часто пишет по-русски: правила разбора одни для всех
+    entry, _ = await add_to_knowledge_base(session, question, "ответ")
+
+    ranked = await rank_knowledge_base(session, question)
+
+    assert ranked[0][0].id == entry.id
+    assert ranked[0][1] == 1.0
+
+
+@pytest.mark.anyio
+async def test_russian_words_keep_russian_stems(session):
+    entry, _ = await add_to_knowledge_base(session, "Оплата картой", "Да, принимаем карты")
+
+    assert "кар" not in entry.tokens.split()
+    found = await search_knowledge_base(session, "оплата картой есть?")
+    assert found is not None and found.id == entry.id
@@ -0,0 +1,77 @@
+import pytest
+
+from app.core.config import settings
+from app.services.knowledge import add_to_knowledge_base, search_knowledge_base
+from app.services.knowledge_semantic import SemanticIndex, text_vector
+from app.services.knowledge_trace import SearchTrace
+from app.services.tokenizer import extract_keywords
+
+QUESTION = "Как записаться на мастер-класс по гончарному кругу?"
+# Те же слова с опечатками и слитным «мастеркласс»
+MISSPELLED = "записатся на мастеркласс гончарный круг"
+
+
+def cosine(first: str, second: str) -> float:
+    first_vector, second_vector = text_vector(first), text_vector(second)
+    return sum(weight * second_vector.get(feature, 0.0) for feature, weight in first_vector.items())
+
+
+def test_vectors_are_normalized():
+    vector = text_vector(extract_keywords(QUESTION))
+    assert sum(weight * weight for weight in vector.values()) == pytest.approx(1.0)
+    assert text_vector("") == {}
+
+
+def test_index_finds_spelling_variants_first():
+    index = SemanticIndex()
+    index.add(1, extract_keywords(QUESTION))
+    index.add(2, extract_keywords("Где находится парковка?"))
+    index.add(3, extract_keywords("Режим работы студии"))
+
+    ranked = index.search(extract_keywords(MISSPELLED))
+    assert ranked[0][0] == 1 and ranked[0][1] >= 0.7
+
+    index.remove(1)
+    assert all(entry_id != 1 for entry_id, _ in index.search(extract_keywords(MISSPELLED)))
+
+
+def test_paraphrases_are_out_of_scope():
+    # Перефразирование с другими словами этап не ловит — для него синонимы
+    assert cosine(extract_keywords("Режим работы"), extract_keywords("Во сколько открываетесь?")) < 0.2
+
+
+@pytest.mark.anyio
+async def test_ngram_stage_answers_when_keywords_miss(session, monkeypatch):
+    monkeypatch.setattr(settings, "kb_spelling_enabled", False)
+    monkeypatch.setattr(settings, "kb_semantic_threshold", 0.5)
+    entry, _ = await add_to_knowledge_base(session, QUESTION, "Напишите нам в WhatsApp")
+    # Перестановки букв в начале слов: совпадения по префиксу тоже не срабатывают
+    question = "зпаисаться на мсатер-класс по гночарному кругу"
+
+    monkeypatch.setattr(settings, "kb_semantic_enabled", False)
+    trace = SearchTrace()
+    assert await search_knowledge_base(session, question, trace=trace) is None
+    assert trace.data["candidates"][0][1] < 0.5
+
+    monkeypatch.setattr(settings, "kb_semantic_enabled", True)
+    trace = SearchTrace()
+    found = await search_knowledge_base(session, question, trace=trace)
+    assert found is not None and found.id == entry.id
+    assert trace.data["match"][2] == "semantic"
+
+
+@pytest.mark.anyio
+async def test_search_stages_can_be_chosen_per_call(session, monkeypatch):
+    monkeypatch.setattr(settings, "kb_spelling_enabled", False)
+    monkeypatch.setattr(settings, "kb_semantic_enabled", False)
+    monkeypatch.setattr(settings, "kb_semantic_threshold", 0.5)
+    entry, _ = await add_to_knowledge_base(session, QUESTION, "Напишите нам в WhatsApp")
+    question = "зпаисаться на мсатер-класс по гночарному кругу"
+
+    trace = SearchTrace()
+    found = await search_knowledge_base(session, question, trace=trace, engine="bm25", semantic=True)
+    assert found is not None and found.id == entry.id
+    assert trace.data["engine"] == "bm25"
+    # Глобальные настройки не меняются
+    assert settings.kb_semantic_enabled is False
+    assert await search_knowledge_base(session, question) is None
@@ -0,0 +1,56 @@
+import pytest
+
+from app.db.models.models import Language
+from app.services.knowledge_spelling import SpellingIndex, correct_query_tokens, is_translit_stop_word
+from app.services.tokenizer import transliterate, word_token
+
+
+@pytest.fixture
+def vocabulary():
+    vocabulary = SpellingIndex()
+    for word in ("парковка", "адрес", "стоит", "мастер-класс"):
+        vocabulary.add(word_token(word))
+    return vocabulary
+
+
+@pytest.mark.parametrize("word", ["est", "yest", "eto", "skolko", "kakoy", "mozhno", "gde", "budet"])
+def test_transliterated_stop_words(word):
+    assert is_translit_stop_word(transliterate(word))
+
+
+@pytest.mark.parametrize("word", ["parkovka", "adres", "chas", "stoit"])
+def test_regular_words_are_not_stop_words(word):
+    assert not is_translit_stop_word(transliterate(word))
+
+
+@pytest.mark.parametrize("word", ["budget", "kakao", "studio", "kotoryy", "moment"])
+def test_english_words_close_to_stop_words_are_kept(word):
+    assert not is_translit_stop_word(transliterate(word))
+
+
+def test_english_words_are_not_dropped_or_rewritten():
+    vocabulary = SpellingIndex()
+    for word in ("budget", "studio", "какао"):
+        vocabulary.add(word_token(word))
+
+    assert correct_query_tokens("budget", vocabulary) == {word_token("budget")}
+    assert correct_query_tokens("studio", vocabulary) == {word_token("studio")}
+    assert correct_query_tokens("kakao", vocabulary) == {word_token("какао")}
+
+
+def test_kyrgyz_stop_words_only_for_kyrgyz():
+    assert is_translit_stop_word("канча", Language.ky)
+    assert not is_translit_stop_word("канча")
+
+
+def test_short_transliterated_stop_word_is_dropped(vocabulary):
+    assert correct_query_tokens("est parkovka?", vocabulary) == {word_token("парковка")}
+    assert correct_query_tokens("eto kogda", vocabulary) == set()
+
+
+def test_transliteration_and_typos_map_to_vocabulary(vocabulary):
+    assert correct_query_tokens("skolko stoit master-klass", vocabulary) == {
+        word_token("стоит"),
+        word_token("мастер-класс"),
+    }
+    assert correct_query_tokens("parkovko", vocabulary) == {word_token("парковка")}
@@ -0,0 +1,25 @@
+import pytest
+from sqlalchemy import select
+
+from app.db.models.models import KnowledgeBase
+from app.services.knowledge_stats import flush_knowledge_hits, pending_hits, record_knowledge_hit
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_flush_writes_hits_on_sqlite(session):
+    session.add_all([
+        KnowledgeBase(id=1, question="Где парковка?", answer="Во дворе", keywords="парковк", times_used=5),
+        KnowledgeBase(id=2, question="Какой адрес?", answer="Ул. Токтогула, 1", keywords="адрес", times_used=0),
+    ])
+    await session.commit()
+
+    record_knowledge_hit(1)
+    record_knowledge_hit(1)
+    record_knowledge_hit(2)
+    assert await flush_knowledge_hits(session) == 2
+    assert not pending_hits
+
+    result = await session.execute(select(KnowledgeBase.id, KnowledgeBase.times_used).order_by(KnowledgeBase.id))
+    assert result.all() == [(1, 7), (2, 1)]
+    assert await flush_knowledge_hits(session) == 0
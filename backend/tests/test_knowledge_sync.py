@@ -0,0 +1,102 @@
+import asyncio
+import json
+
+import pytest
+
+from app.db.models.models import KnowledgeBase
+from app.services import knowledge_sync
+from app.services.knowledge_index import knowledge_index
+from app.services.knowledge_sync import RELOAD, WORKER_ID, _apply, _apply_loop
+
+pytestmark = pytest.mark.anyio
+
+OTHER_WORKER = "other-worker"
+
+
+@pytest.fixture(autouse=True)
+def last_version(monkeypatch):
+    monkeypatch.setattr(knowledge_sync, "last_version", 10)
+
+
+def notification(op: str, entry_id: int | None, version: int | None, origin: str = OTHER_WORKER) -> str:
+    return json.dumps({"op": op, "id": entry_id, "origin": origin, "version": version})
+
+
+async def add_entry(session, entry_id: int, question: str) -> KnowledgeBase:
+    entry = KnowledgeBase(id=entry_id, question=question, answer="ответ", keywords=question, tokens=question)
+    session.add(entry)
+    await session.commit()
+    return entry
+
+
+async def test_next_version_is_applied_incrementally(session, monkeypatch):
+    await knowledge_index.load(session)
+    await add_entry(session, 1, "парковк")
+    loads = []
+    monkeypatch.setattr(knowledge_index, "load", lambda session: loads.append(1))
+
+    await _apply(notification("upsert", 1, 11))
+    assert knowledge_index.tokens_of(1) == {"парковк"}
+    assert knowledge_sync.last_version == 11
+
+    await _apply(notification("delete", 1, 12))
+    assert len(knowledge_index) == 0
+    assert knowledge_sync.last_version == 12
+    assert loads == []
+
+
+async def test_version_gap_triggers_full_reload(session):
+    await knowledge_index.load(session)
+    # Записи, об изменении которых уведомление потерялось
+    await add_entry(session, 1, "парковк")
+    await add_entry(session, 2, "адрес")
+
+    await _apply(notification("upsert", 2, 12))
+
+    assert len(knowledge_index) == 2
+    assert knowledge_sync.last_version == 12
+
+
+async def test_own_notifications_only_advance_version(session):
+    await knowledge_index.load(session)
+    await add_entry(session, 1, "парковк")
+
+    await _apply(notification("upsert", 1, 11, origin=WORKER_ID))
+    assert len(knowledge_index) == 0
+    assert knowledge_sync.last_version == 11
+
+    # Старое уведомление версию не откатывает
+    await _apply(notification("upsert", 1, 5, origin=WORKER_ID))
+    assert knowledge_sync.last_version == 11
+
+
+async def test_bad_payload_is_ignored(session):
+    await _apply("{oops")
+    assert knowledge_sync.last_version == 10
+
+
+async def test_notifications_are_applied_one_at_a_time(session, monkeypatch):
+    events = []
+
+    async def slow_load(session):
+        events.append("load:start")
+        await asyncio.sleep(0.05)
+        events.append("load:end")
+
+    monkeypatch.setattr(knowledge_index, "load", slow_load)
+    monkeypatch.setattr(knowledge_index, "upsert", lambda entry: events.append(f"upsert:{entry.id}"))
+    await add_entry(session, 1, "парковк")
+
+    queue = asyncio.Queue()
+    worker = asyncio.create_task(_apply_loop(queue))
+    queue.put_nowait(RELOAD)
+    queue.put_nowait(notification("upsert", 1, 11))
+    queue.put_nowait("{oops")
+    queue.put_nowait(notification("upsert", 1, 12))
+    for _ in range(100):
+        if len(events) == 4:
+            break
+        await asyncio.sleep(0.01)
+    worker.cancel()
+
+    assert events == ["load:start", "load:end", "upsert:1", "upsert:1"]
@@ -0,0 +1,66 @@
+import pytest
+
+from app.bot.ai import gateway as gateway_module
+from app.bot.ai.gateway import get_llm_gateway, set_llm_gateway, start_llm_gateway, stop_llm_gateway
+from app.core.config import settings
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(autouse=True)
+def no_gateway():
+    set_llm_gateway(None)
+    yield
+    set_llm_gateway(None)
+
+
+def test_no_gateway_without_api_key(monkeypatch):
+    monkeypatch.setattr(settings, "ai_backend", "openrouter")
+    monkeypatch.setattr(settings, "openrouter_api_key", "")
+    assert get_llm_gateway() is None
+
+
+def test_fake_backend_needs_no_key(monkeypatch):
+    monkeypatch.setattr(settings, "ai_backend", "fake")
+    monkeypatch.setattr(settings, "openrouter_api_key", "")
+    monkeypatch.setattr(settings, "ai_fake_base_url", "http://localhost:9999/v1")
+
+    gateway = get_llm_gateway()
+    assert gateway is not None
+    assert gateway.base_url == "http://localhost:9999/v1"
+    assert get_llm_gateway() is gateway
+
+
+def test_openrouter_backend_uses_configured_url(monkeypatch):
+    monkeypatch.setattr(settings, "ai_backend", "openrouter")
+    monkeypatch.setattr(settings, "openrouter_api_key", "key")
+    monkeypatch.setattr(settings, "ai_base_url", "https://openrouter.test/v1")
+
+    gateway = get_llm_gateway()
+    assert gateway.base_url == "https://openrouter.test/v1"
+    assert gateway.client.api_key == "key"
+
+
+async def test_start_and_stop_share_one_client(monkeypatch):
+    monkeypatch.setattr(settings, "ai_backend", "fake")
+
+    await start_llm_gateway()
+    gateway = gateway_module.gateway
+    assert gateway is not None
+    assert get_llm_gateway() is gateway
+
+    await stop_llm_gateway()
+    assert gateway_module.gateway is None
+    assert gateway.http_client.is_closed
+
+    # Повторная остановка ничего не ломает
+    await stop_llm_gateway()
+
+
+async def test_start_without_key_leaves_no_gateway(monkeypatch):
+    monkeypatch.setattr(settings, "ai_backend", "openrouter")
+    monkeypatch.setattr(settings, "openrouter_api_key", "")
+
+    await start_llm_gateway()
+    assert gateway_module.gateway is None
+    await stop_llm_gateway()
@@ -0,0 +1,289 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from openai import AsyncOpenAI
+
+from app.bot.ai import resilience
+from app.bot.ai.assistant import ERROR_RESPONSE, generate_response, needs_operator
+from app.bot.ai.gateway import LLMGateway, set_llm_gateway
+from app.bot.ai.resilience import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    LLMUnavailable,
+    create_completion,
+    stream_completion,
+)
+from app.core.config import settings
+
+MESSAGES = [{"role": "system", "content": "Промпт"}, {"role": "user", "content": "Здравствуйте"}]
+
+
+@pytest.fixture(autouse=True)
+def llm_settings(monkeypatch):
+    monkeypatch.setattr(settings, "ai_model", "primary/model")
+    monkeypatch.setattr(settings, "ai_fallback_models", "fallback/model")
+    monkeypatch.setattr(settings, "ai_deadline", 2.0)
+    monkeypatch.setattr(settings, "ai_attempt_timeout", 1.0)
+    monkeypatch.setattr(settings, "ai_breaker_failures", 2)
+    monkeypatch.setattr(settings, "ai_breaker_slow_seconds", 5.0)
+    monkeypatch.setattr(settings, "ai_breaker_reset_seconds", 30.0)
+    monkeypatch.setattr(resilience, "breakers", {})
+
+
+def completion(model: str, text: str = "ок") -> dict:
+    return {
+        "id": "chatcmpl-test",
+        "object": "chat.completion",
+        "created": 0,
+        "model": model,
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": text}}],
+    }
+
+
+def stream_body(model: str, text: str) -> bytes:
+    chunk = {
+        "id": "chatcmpl-test",
+        "object": "chat.completion.chunk",
+        "created": 0,
+        "model": model,
+        "choices": [{"index": 0, "delta": {"content": text}, "finish_reason": None}],
+    }
+    return f"data: {json.dumps(chunk)}\n\ndata: [DONE]\n\n".encode()
+
+
+def make_client(responses: dict) -> tuple[AsyncOpenAI, list[str]]:
+    client, requests, _ = make_transport(responses)
+    return client, requests
+
+
+# Системный промпт каждого запроса к заглушке (строка или части с cache_control)
+system_contents: list = []
+
+
+def make_transport(responses: dict) -> tuple[AsyncOpenAI, list[str], httpx.MockTransport]:
+    """Клиент на httpx.MockTransport: responses — модель -> статус ответа или "slow"."""
+    requests = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        model = body["model"]
+        requests.append(model)
+        system_contents.append(body["messages"][0]["content"])
+        status = responses[model]
+        if status == "slow":
+            await asyncio.sleep(10)
+            status = 200
+        if status != 200:
+            return httpx.Response(status, json={"error": {"message": "сбой"}})
+        if body.get("stream"):
+            return httpx.Response(
+                200, content=stream_body(model, f"ответ {model}"), headers={"content-type": "text/event-stream"}
+            )
+        return httpx.Response(200, json=completion(model, f"ответ {model}"))
+
+    transport = httpx.MockTransport(handler)
+    client = AsyncOpenAI(
+        api_key="test",
+        base_url="http://llm.test/v1",
+        http_client=httpx.AsyncClient(transport=transport),
+    )
+    return client, requests, transport
+
+
+def test_breaker_opens_and_probes_once():
+    breaker = CircuitBreaker(failure_threshold=2, slow_call=1.0, reset_timeout=30.0)
+    breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+
+    # Время вышло — пропускается одна пробная попытка
+    breaker.opened_at -= 30.0
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+
+    breaker.record_success(elapsed=0.1)
+    assert breaker.state == CLOSED and breaker.failures == 0
+
+
+def test_breaker_counts_slow_calls_and_failed_probe():
+    breaker = CircuitBreaker(failure_threshold=2, slow_call=1.0, reset_timeout=30.0)
+    breaker.record_success(elapsed=2.0)
+    breaker.record_success(elapsed=2.0)
+    assert breaker.state == OPEN
+
+    breaker.opened_at -= 30.0
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+
+
+@pytest.mark.anyio
+async def test_falls_back_to_next_model_on_error():
+    client, requests = make_client({"primary/model": 500, "fallback/model": 200})
+
+    response = await create_completion(client, messages=MESSAGES, max_tokens=10)
+
+    assert response.choices[0].message.content == "ответ fallback/model"
+    assert requests == ["primary/model", "fallback/model"]
+    assert resilience.get_breaker("primary/model").failures == 1
+
+
+@pytest.mark.anyio
+async def test_open_breaker_skips_model():
+    client, requests = make_client({"primary/model": 500, "fallback/model": 200})
+
+    for _ in range(2):
+        await create_completion(client, messages=MESSAGES)
+    requests.clear()
+    await create_completion(client, messages=MESSAGES)
+
+    assert resilience.breaker_stats()["primary/model"]["state"] == OPEN
+    assert requests == ["fallback/model"]
+
+
+@pytest.mark.anyio
+async def test_slow_model_hits_attempt_timeout(monkeypatch):
+    monkeypatch.setattr(settings, "ai_attempt_timeout", 0.2)
+    client, requests = make_client({"primary/model": "slow", "fallback/model": 200})
+
+    response = await create_completion(client, messages=MESSAGES)
+
+    assert response.choices[0].message.content == "ответ fallback/model"
+    assert requests == ["primary/model", "fallback/model"]
+
+
+@pytest.mark.anyio
+async def test_deadline_raises_when_no_model_answers(monkeypatch):
+    monkeypatch.setattr(settings, "ai_deadline", 0.3)
+    monkeypatch.setattr(settings, "ai_attempt_timeout", 0.2)
+    client, requests = make_client({"primary/model": "slow", "fallback/model": "slow"})
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    with pytest.raises(LLMUnavailable):
+        await create_completion(client, messages=MESSAGES)
+
+    assert loop.time() - started < 1.0
+    assert requests == ["primary/model", "fallback/model"]
+
+
+@pytest.mark.anyio
+async def test_stream_falls_back_before_first_text():
+    client, requests = make_client({"primary/model": 503, "fallback/model": 200})
+
+    chunks = [chunk async for chunk in stream_completion(client, messages=MESSAGES)]
+
+    assert "".join(c.choices[0].delta.content or "" for c in chunks if c.choices) == "ответ fallback/model"
+    assert requests == ["primary/model", "fallback/model"]
+
+
+class StalledStream(httpx.AsyncByteStream):
+    """Тело потокового ответа: один чанк (delta), затем тишина."""
+
+    def __init__(self, delta: dict):
+        self.delta = delta
+        self.closed = False
+
+    async def __aiter__(self):
+        chunk = {
+            "id": "chatcmpl-test",
+            "object": "chat.completion.chunk",
+            "created": 0,
+            "model": "primary/model",
+            "choices": [{"index": 0, "delta": self.delta, "finish_reason": None}],
+        }
+        yield f"data: {json.dumps(chunk)}\n\n".encode()
+        await asyncio.sleep(10)
+
+    async def aclose(self):
+        self.closed = True
+
+
+@pytest.mark.anyio
+async def test_stream_without_first_text_is_closed(monkeypatch):
+    monkeypatch.setattr(settings, "ai_attempt_timeout", 0.2)
+    stalled = StalledStream({"role": "assistant"})
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        model = json.loads(request.content)["model"]
+        if model == "primary/model":
+            return httpx.Response(200, stream=stalled, headers={"content-type": "text/event-stream"})
+        return httpx.Response(
+            200, content=stream_body(model, "ответ запасной"), headers={"content-type": "text/event-stream"}
+        )
+
+    client = AsyncOpenAI(
+        api_key="test",
+        base_url="http://llm.test/v1",
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    )
+    chunks = [chunk async for chunk in stream_completion(client, messages=MESSAGES)]
+
+    assert "".join(c.choices[0].delta.content or "" for c in chunks if c.choices) == "ответ запасной"
+    # Соединение брошенного потока возвращено, а не ждёт таймаута чтения
+    assert stalled.closed
+
+
+@pytest.mark.anyio
+async def test_abandoned_stream_is_closed():
+    stalled = StalledStream({"content": "Здравствуйте"})
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, stream=stalled, headers={"content-type": "text/event-stream"})
+
+    client = AsyncOpenAI(
+        api_key="test",
+        base_url="http://llm.test/v1",
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    )
+    chunks = stream_completion(client, messages=MESSAGES)
+    first = await anext(chunks)
+    assert first.choices[0].delta.content == "Здравствуйте"
+
+    # Гость дописал сообщение — ответ больше не нужен
+    await chunks.aclose()
+    assert stalled.closed
+
+
+@pytest.mark.anyio
+async def test_unavailable_llm_hands_off_to_operator(monkeypatch):
+    monkeypatch.setattr(settings, "ai_deadline", 0.3)
+    monkeypatch.setattr(settings, "ai_attempt_timeout", 0.2)
+    _, requests, transport = make_transport({"primary/model": 500, "fallback/model": "slow"})
+    gateway = LLMGateway("test", base_url="http://llm.test/v1", http_client=httpx.AsyncClient(transport=transport))
+    set_llm_gateway(gateway)
+    try:
+        reply = await generate_response([])
+    finally:
+        set_llm_gateway(None)
+        await gateway.close()
+
+    assert reply == ERROR_RESPONSE
+    assert needs_operator(reply)
+    assert requests == ["primary/model", "fallback/model"]
+
+
+@pytest.mark.anyio
+async def test_cache_control_is_decided_per_model(monkeypatch):
+    monkeypatch.setattr(settings, "ai_model", "anthropic/claude")
+    monkeypatch.setattr(settings, "ai_fallback_models", "deepseek/deepseek-chat")
+    monkeypatch.setattr(settings, "ai_prompt_cache", True)
+    monkeypatch.setattr(settings, "ai_prompt_cache_models", "anthropic/")
+    system_contents.clear()
+    client, requests = make_client({"anthropic/claude": 500, "deepseek/deepseek-chat": 200})
+
+    await create_completion(client, messages=MESSAGES)
+
+    assert requests == ["anthropic/claude", "deepseek/deepseek-chat"]
+    assert system_contents == [
+        [{"type": "text", "text": "Промпт", "cache_control": {"type": "ephemeral"}}],
+        "Промпт",
+    ]
+    # Исходные сообщения не меняются
+    assert MESSAGES[0]["content"] == "Промпт"
@@ -0,0 +1,88 @@
+from app.bot.ai.budget import MESSAGE_OVERHEAD, TRUNCATION_MARK, count_tokens, fit_messages, truncate
+
+SYSTEM = {"role": "system", "content": "Ты помощник студии керамики."}
+
+
+def user(text: str) -> dict:
+    return {"role": "user", "content": text}
+
+
+def assistant(text: str) -> dict:
+    return {"role": "assistant", "content": text}
+
+
+def test_count_tokens():
+    assert count_tokens("") == 0
+    # Латиница — 4 знака на токен, кириллица — 2.5, знак препинания — отдельный токен
+    assert count_tokens("test") == 1
+    assert count_tokens("pottery") == 2
+    assert count_tokens("мастер") == 3
+    assert count_tokens("Привет, мир!") == count_tokens("Привет") + 1 + count_tokens("мир") + 1
+
+
+def test_truncate_keeps_short_text():
+    assert truncate("Сколько стоит?", 100) == "Сколько стоит?"
+
+
+def test_truncate_fits_limit():
+    text = "Хотим записаться на мастер-класс по гончарному кругу в субботу " * 10
+    short = truncate(text, 20)
+    assert short.endswith(TRUNCATION_MARK)
+    assert text.startswith(short[:-1])
+    assert count_tokens(short) <= 20
+
+
+def test_history_within_budget_is_kept():
+    messages = [SYSTEM, user("Здравствуйте"), assistant("Добрый день!"), user("Сколько стоит?")]
+    fitted, usage = fit_messages(messages, budget=1000, message_limit=100)
+
+    assert fitted == messages
+    assert usage.kept == 3 and usage.dropped == 0 and usage.truncated == 0
+    assert usage.total == sum(count_tokens(m["content"]) + MESSAGE_OVERHEAD for m in messages)
+
+
+def test_oldest_messages_are_dropped_over_budget():
+    old = [user("Старый вопрос про цены на занятия"), assistant("Старый ответ про цены на занятия")]
+    recent = [assistant("Есть занятия по субботам"), user("А в воскресенье?")]
+    messages = [SYSTEM, *old, *recent]
+    recent_tokens = sum(count_tokens(m["content"]) + MESSAGE_OVERHEAD for m in recent)
+    budget = count_tokens(SYSTEM["content"]) + MESSAGE_OVERHEAD + recent_tokens
+
+    fitted, usage = fit_messages(messages, budget=budget, message_limit=100)
+
+    assert fitted == [SYSTEM, *recent]
+    assert usage.kept == 2 and usage.dropped == 2
+    assert usage.total <= budget
+
+
+def test_long_message_is_truncated_to_limit():
+    long_answer = "Подробно рассказываю про все наши курсы и цены " * 20
+    fitted, usage = fit_messages([SYSTEM, assistant(long_answer), user("Спасибо")], budget=1000, message_limit=30)
+
+    assert usage.truncated == 1
+    assert count_tokens(fitted[1]["content"]) <= 30
+    assert fitted[2] == user("Спасибо")
+
+
+def test_last_guest_message_survives_tiny_budget():
+    question = "Хотим записаться на мастер-класс по гончарному кругу вдвоём в субботу " * 5
+    budget = count_tokens(SYSTEM["content"]) + MESSAGE_OVERHEAD + 15
+
+    fitted, usage = fit_messages([SYSTEM, assistant("Добрый день!"), user(question)], budget=budget, message_limit=500)
+
+    assert [m["role"] for m in fitted] == ["system", "user"]
+    assert fitted[-1]["content"].endswith(TRUNCATION_MARK)
+    assert usage.kept == 1 and usage.dropped == 1 and usage.truncated == 1
+
+
+def test_last_guest_message_is_kept_when_history_ends_with_bot():
+    # После вопроса гостя в истории уже есть длинный ответ бота (например, менеджера)
+    question = "Можно ли прийти с ребёнком?"
+    long_reply = "Ответ оператора с подробностями про занятия для детей и взрослых " * 20
+    budget = count_tokens(SYSTEM["content"]) + MESSAGE_OVERHEAD + count_tokens(question) + MESSAGE_OVERHEAD + 5
+
+    fitted, usage = fit_messages([SYSTEM, user(question), assistant(long_reply)], budget=budget, message_limit=500)
+
+    assert fitted == [SYSTEM, user(question)]
+    assert usage.dropped == 1
+    assert usage.total <= budget
@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.services.reply_debounce import ReplyDebouncer
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def debouncer(monkeypatch):
+    monkeypatch.setattr(settings, "reply_debounce_seconds", 0.05)
+    return ReplyDebouncer()
+
+
+async def test_burst_gets_one_reply_with_all_messages(debouncer):
+    calls = []
+    results = {}
+
+    async def llm(text):
+        calls.append(text)
+        return f"ответ: {text}"
+
+    async def handle(text, delay):
+        await asyncio.sleep(delay)
+        async with debouncer.turn(1, text) as turn:
+            results[text] = await turn.guard(llm(turn.text)) if turn.active else "skip"
+
+    await asyncio.gather(handle("Здравствуйте", 0), handle("хотим на МК", 0.01), handle("в субботу", 0.02))
+
+    assert calls == ["Здравствуйте\nхотим на МК\nв субботу"]
+    assert results == {
+        "Здравствуйте": "skip",
+        "хотим на МК": "skip",
+        "в субботу": "ответ: Здравствуйте\nхотим на МК\nв субботу",
+    }
+    assert not debouncer._generations and not debouncer._texts and not debouncer._inflight
+
+
+async def test_new_message_cancels_running_generation(debouncer):
+    started = asyncio.Event()
+    calls = []
+    results = {}
+
+    async def llm(text):
+        calls.append(text)
+        started.set()
+        await asyncio.sleep(1)
+        return text
+
+    async def handle(text):
+        async with debouncer.turn(1, text) as turn:
+            results[text] = await turn.guard(llm(turn.text))
+
+    first = asyncio.create_task(handle("сколько стоит"))
+    await started.wait()
+    await handle("для двоих")
+    await first
+
+    assert results == {"сколько стоит": None, "для двоих": "сколько стоит\nдля двоих"}
+    assert len(calls) == 2
+
+
+async def test_superseded_before_guard_skips_generation(debouncer):
+    calls = []
+
+    async def llm():
+        calls.append(1)
+        return "ответ"
+
+    async with debouncer.turn(1, "сколько стоит") as turn:
+        assert turn.active
+        # Пока искали ответ в базе знаний, гость дописал сообщение
+        async with debouncer.turn(1, "для двоих") as newer:
+            assert await newer.guard(llm()) == "ответ"
+        assert turn.superseded
+        assert await turn.guard(llm()) is None
+
+    assert calls == [1]
+
+
+async def test_discard_receives_result_finished_after_new_message(debouncer):
+    discarded = []
+    newer_turn = None
+
+    async def discard(result):
+        discarded.append(result)
+
+    async def newer():
+        async with debouncer.turn(1, "для двоих"):
+            pass
+
+    async with debouncer.turn(1, "сколько стоит") as turn:
+
+        async def llm():
+            nonlocal newer_turn
+            # Новое сообщение приходит, когда ответ уже готов
+            newer_turn = asyncio.create_task(newer())
+            return "показанный ответ"
+
+        assert await turn.guard(llm(), discard=discard) is None
+
+    await newer_turn
+    assert discarded == ["показанный ответ"]
@@ -0,0 +1,97 @@
+import pytest
+
+from app.bot.ai.assistant import COMPLETED_RESPONSE, HANDOFF_RESPONSE, ServiceTagFilter, clean_response
+from app.bot.channels import telegram
+from app.core.config import settings
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeSent:
+    def __init__(self, text: str):
+        self.text = text
+        self.edits: list[str] = []
+        self.deleted = False
+
+    async def edit_text(self, text: str):
+        self.text = text
+        self.edits.append(text)
+
+    async def delete(self):
+        self.deleted = True
+
+
+class FakeMessage:
+    def __init__(self):
+        self.sent: list[FakeSent] = []
+
+    async def answer(self, text: str) -> FakeSent:
+        sent = FakeSent(text)
+        self.sent.append(sent)
+        return sent
+
+
+def fake_stream(monkeypatch, chunks: list[str]):
+    async def stream_response(history):
+        for chunk in chunks:
+            yield chunk
+
+    monkeypatch.setattr(telegram, "stream_response", stream_response)
+
+
+def test_tag_split_between_chunks_is_hidden():
+    tag_filter = ServiceTagFilter()
+    visible = "".join(tag_filter.feed(chunk) for chunk in ["Передам ", "[НУЖ", "ЕН_МЕНЕ", "ДЖЕР] вопрос"])
+    visible += tag_filter.flush()
+
+    assert visible == "Передам  вопрос"
+    assert tag_filter.found == {"[НУЖЕН_МЕНЕДЖЕР]"}
+
+
+def test_brackets_that_are_not_tags_are_shown():
+    tag_filter = ServiceTagFilter()
+    visible = tag_filter.feed("Цены [в сомах]: 1500 [НУ")
+    assert visible == "Цены [в сомах]: 1500 "
+    # Поток оборвался на начале тега — придержанный текст отдаётся в конце
+    assert tag_filter.flush() == "[НУ"
+
+
+def test_tags_only_response_gets_fallback_text():
+    assert clean_response(" [НУЖЕН_МЕНЕДЖЕР] ") == HANDOFF_RESPONSE
+    assert clean_response("[ЗАВЕРШЕНО]") == COMPLETED_RESPONSE
+    assert clean_response("Ждём вас! [ЗАВЕРШЕНО]") == "Ждём вас!"
+
+
+async def test_edits_are_throttled(monkeypatch):
+    monkeypatch.setattr(settings, "ai_stream_edit_interval", 60.0)
+    fake_stream(monkeypatch, ["Здравствуйте", "! Мастер-класс", " стоит 1500 сом."])
+    message = FakeMessage()
+
+    sent, response_text = await telegram.stream_ai_reply(message, [])
+
+    # Первый текст сразу, затем только итоговая правка
+    assert sent.edits == ["Здравствуйте", "Здравствуйте! Мастер-класс стоит 1500 сом."]
+    assert response_text == "Здравствуйте! Мастер-класс стоит 1500 сом."
+
+
+async def test_every_change_is_shown_without_throttling(monkeypatch):
+    monkeypatch.setattr(settings, "ai_stream_edit_interval", 0.0)
+    fake_stream(monkeypatch, ["Да", ", есть", " [ЗАВЕР", "ШЕНО]"])
+    message = FakeMessage()
+
+    sent, response_text = await telegram.stream_ai_reply(message, [])
+
+    assert sent.edits == ["Да", "Да, есть"]
+    assert sent.text == "Да, есть"
+    assert response_text == "Да, есть [ЗАВЕРШЕНО]"
+
+
+async def test_placeholder_is_replaced_when_only_tags_arrive(monkeypatch):
+    fake_stream(monkeypatch, ["[НУЖЕН_", "МЕНЕДЖЕР]"])
+    message = FakeMessage()
+
+    sent, response_text = await telegram.stream_ai_reply(message, [])
+
+    assert sent.text == HANDOFF_RESPONSE
+    assert sent.text != settings.ai_stream_placeholder
+    assert clean_response(response_text) == HANDOFF_RESPONSE
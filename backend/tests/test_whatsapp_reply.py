@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+from sqlalchemy import select
+
+from app.bot.channels import whatsapp
+from app.core.config import settings
+from app.db.models.models import Message, MessageSender
+
+pytestmark = pytest.mark.anyio
+
+PHONE = "996700000001"
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    monkeypatch.setattr(settings, "reply_debounce_seconds", 0.3)
+    sent = []
+
+    async def send_whatsapp_message(phone, text):
+        sent.append((phone, text))
+        return True
+
+    monkeypatch.setattr(whatsapp, "send_whatsapp_message", send_whatsapp_message)
+    return sent
+
+
+async def receive(text: str, delay: float = 0):
+    """Как webhook: сохранить сообщение, затем ответить после окна ожидания."""
+    await asyncio.sleep(delay)
+    conversation_id = await whatsapp.handle_whatsapp_message(PHONE, text, "Гость")
+    if conversation_id is not None:
+        await whatsapp.reply_to_whatsapp(conversation_id, PHONE, text)
+
+
+async def bot_messages(session) -> list[str]:
+    result = await session.execute(select(Message.text).where(Message.sender == MessageSender.bot))
+    return list(result.scalars().all())
+
+
+async def test_burst_gets_one_reply(session, sent, monkeypatch):
+    histories = []
+
+    async def generate_response(history):
+        histories.append([m.text for m in history])
+        return "Ждём вас в субботу!"
+
+    monkeypatch.setattr(whatsapp, "generate_response", generate_response)
+
+    await asyncio.gather(receive("Здравствуйте"), receive("хотим на МК", 0.1), receive("в субботу", 0.2))
+
+    assert len(histories) == 1
+    assert {"Здравствуйте", "хотим на МК", "в субботу"} <= set(histories[0])
+    assert sent == [(PHONE, "Ждём вас в субботу!")]
+    assert await bot_messages(session) == ["Ждём вас в субботу!"]
+
+
+async def test_message_during_generation_discards_old_reply(session, sent, monkeypatch):
+    started = asyncio.Event()
+    calls = []
+
+    async def generate_response(history):
+        calls.append(history[-1].text)
+        if len(calls) == 1:
+            started.set()
+            await asyncio.sleep(10)  # отменится новым сообщением
+        return f"ответ на: {history[-1].text}"
+
+    monkeypatch.setattr(whatsapp, "generate_response", generate_response)
+
+    first = asyncio.create_task(receive("Сколько стоит?"))
+    await asyncio.wait_for(started.wait(), 1)
+    await receive("для двоих")
+    await first
+
+    assert calls == ["Сколько стоит?", "для двоих"]
+    assert sent == [(PHONE, "ответ на: для двоих")]
+    assert await bot_messages(session) == ["ответ на: для двоих"]
+
+
+async def test_webhook_returns_before_reply(session, sent, monkeypatch):
+    monkeypatch.setattr(settings, "reply_debounce_seconds", 10.0)
+    monkeypatch.setattr(whatsapp, "is_whatsapp_configured", lambda: True)
+    monkeypatch.setattr(
+        whatsapp,
+        "parse_webhook_message",
+        lambda data: {"phone": PHONE, "text": "Здравствуйте", "name": "Гость"},
+    )
+
+    class FakeRequest:
+        async def json(self):
+            return {}
+
+    response = await asyncio.wait_for(whatsapp.whatsapp_webhook(FakeRequest()), 1)
+    assert response.body == b"OK"
+    assert sent == []
+
+    # Ответ ждёт конца серии в фоне
+    tasks = list(whatsapp._reply_tasks)
+    assert len(tasks) == 1
+    tasks[0].cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)